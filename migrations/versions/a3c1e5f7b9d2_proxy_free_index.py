@@ -0,0 +1,36 @@
+"""proxy free index
+
+Revision ID: a3c1e5f7b9d2
+Revises: 9c454ae11185
+Create Date: 2025-06-02 12:10:41.518274
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c1e5f7b9d2"
+down_revision: Union[str, None] = "9c454ae11185"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # свободный прокси не должен ссылаться на аккаунт (раньше change_proxy
+    # оставлял account_id у освобождённого прокси)
+    op.execute("UPDATE proxies SET account_id = NULL WHERE NOT in_use")
+    op.create_index(
+        "ix_proxies_free_country",
+        "proxies",
+        ["country"],
+        unique=False,
+        postgresql_where=sa.text("NOT in_use"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_proxies_free_country", table_name="proxies")
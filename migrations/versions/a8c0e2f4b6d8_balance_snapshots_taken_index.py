@@ -0,0 +1,29 @@
+"""balance snapshots taken_at index
+
+Revision ID: a8c0e2f4b6d8
+Revises: f7a9b1c3d5e7
+Create Date: 2025-06-10 09:12:31.604217
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c0e2f4b6d8"
+down_revision: Union[str, None] = "f7a9b1c3d5e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_balance_snapshots_taken", "balance_snapshots", ["taken_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_balance_snapshots_taken", table_name="balance_snapshots")
@@ -0,0 +1,36 @@
+"""proxy health
+
+Revision ID: c4d2f6a8e0b1
+Revises: a3c1e5f7b9d2
+Create Date: 2025-06-04 18:32:07.904113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d2f6a8e0b1"
+down_revision: Union[str, None] = "a3c1e5f7b9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("proxies", sa.Column("latency_ms", sa.Float(), nullable=True))
+    op.add_column(
+        "proxies",
+        sa.Column("error_rate", sa.Float(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "proxies", sa.Column("checked_at", sa.DateTime(timezone=True), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("proxies", "checked_at")
+    op.drop_column("proxies", "error_rate")
+    op.drop_column("proxies", "latency_ms")
@@ -0,0 +1,74 @@
+"""pool change notify
+
+Revision ID: d5e7f9a1b3c4
+Revises: c4d2f6a8e0b1
+Create Date: 2025-06-06 11:14:52.318207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5e7f9a1b3c4"
+down_revision: Union[str, None] = "c4d2f6a8e0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pools: id пула — NEW.id/OLD.id; pool_account_link — pool_id
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_pool_change() RETURNS trigger AS $$
+        DECLARE
+            changed record;
+            changed_pool_id integer;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := OLD;
+            ELSE
+                changed := NEW;
+            END IF;
+            IF TG_TABLE_NAME = 'pools' THEN
+                changed_pool_id := changed.id;
+            ELSE
+                changed_pool_id := changed.pool_id;
+            END IF;
+            PERFORM pg_notify(
+                'pool_changes',
+                json_build_object(
+                    'table', TG_TABLE_NAME, 'op', TG_OP, 'pool_id', changed_pool_id
+                )::text
+            );
+            -- перенос аккаунта между пулами меняет оба пула
+            IF TG_OP = 'UPDATE' AND TG_TABLE_NAME = 'pool_account_link'
+               AND OLD.pool_id <> NEW.pool_id THEN
+                PERFORM pg_notify(
+                    'pool_changes',
+                    json_build_object(
+                        'table', TG_TABLE_NAME, 'op', TG_OP, 'pool_id', OLD.pool_id
+                    )::text
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table in ("pools", "pool_account_link"):
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_pool_change();
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in ("pools", "pool_account_link"):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_pool_change()")
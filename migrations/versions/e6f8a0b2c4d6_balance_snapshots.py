@@ -0,0 +1,43 @@
+"""balance snapshots
+
+Revision ID: e6f8a0b2c4d6
+Revises: d5e7f9a1b3c4
+Create Date: 2025-06-07 16:41:23.570914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e6f8a0b2c4d6"
+down_revision: Union[str, None] = "d5e7f9a1b3c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "balance_snapshots",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("symbol", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Numeric(), nullable=False),
+        sa.Column("usd_value", sa.Float(), nullable=False),
+        sa.Column("taken_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["account_id"], ["accounts.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_balance_snapshots_account_taken",
+        "balance_snapshots",
+        ["account_id", "taken_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_balance_snapshots_account_taken", table_name="balance_snapshots")
+    op.drop_table("balance_snapshots")
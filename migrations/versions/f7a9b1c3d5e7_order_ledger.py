@@ -0,0 +1,54 @@
+"""order ledger
+
+Revision ID: f7a9b1c3d5e7
+Revises: e6f8a0b2c4d6
+Create Date: 2025-06-09 10:27:45.118360
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f7a9b1c3d5e7"
+down_revision: Union[str, None] = "e6f8a0b2c4d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "order_ledger",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("pool_id", sa.Integer(), nullable=True),
+        sa.Column("client_id", sa.BigInteger(), nullable=False),
+        sa.Column("intent", sa.String(), nullable=False),
+        sa.Column("symbol", sa.String(), nullable=False),
+        sa.Column("side", sa.String(), nullable=False),
+        sa.Column("order_type", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Numeric(), nullable=False),
+        sa.Column("price", sa.Numeric(), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("executed_quantity", sa.Numeric(), nullable=True),
+        sa.Column("executed_quote_quantity", sa.Numeric(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["account_id"], ["accounts.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["pool_id"], ["pools.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("account_id", "client_id", name="uq_order_ledger_client"),
+    )
+    op.create_index(
+        "ix_order_ledger_pool_created", "order_ledger", ["pool_id", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_order_ledger_pool_created", table_name="order_ledger")
+    op.drop_table("order_ledger")
@@ -2,6 +2,9 @@ from src.bot.features.accounts.handlers.home import router as accounts_home_rout
 from src.bot.features.accounts.handlers.find import router as accounts_find_router
 from src.bot.features.accounts.handlers.balance import router as accounts_balance_router
 from src.bot.features.accounts.handlers.stats import router as accounts_stats_router
+from src.bot.features.accounts.handlers.fleet_balance import (
+    router as accounts_fleet_balance_router,
+)
 from src.bot.features.accounts.handlers.add import router as accounts_add_router
 from src.bot.features.accounts.handlers.add_csv import router as accounts_add_csv_router
 from src.bot.features.accounts.handlers.delete import router as accounts_delete_router
@@ -11,10 +11,7 @@ from loguru import logger
 from src.bot.features.accounts.keyboards import accounts_keyboard
 from src.bot.features.accounts.states import AccountsStates
 from src.bot.triggers import Texts
-from src.core.models import Account, FakeHeader, DepositAddress, Chain
 from src.core.repositories import accounts as accounts_repo
-from src.exceptions import NoFreeProxy
-from src.core.repositories.accounts import ParentAccountNotFound
 
 router = Router()
 _fake = Faker()
@@ -62,8 +59,8 @@ async def import_csv(message: Message, state: FSMContext) -> None:
     path = f"/tmp/{file.file_unique_id}.csv"
     await message.bot.download(file, destination=path)
 
-    successes: list[str] = []
-    failures: list[str] = []
+    rows: list[accounts_repo.AccountImportRow] = []
+    results: list[accounts_repo.AccountImportResult] = []
 
     try:
         with open(path, encoding="utf-8") as f:
@@ -71,56 +68,60 @@ async def import_csv(message: Message, state: FSMContext) -> None:
             reader.fieldnames = [h.strip().upper() for h in reader.fieldnames]
 
             for idx, row in enumerate(reader, 1):
-                name = row.get("NAME", "").strip()
+                name = (row.get("NAME") or "").strip()
                 try:
-                    api_key = row["API_KEY"].strip()
-                    api_secret = row["API_SECRET"].strip()
-                    country = row["COUNTRY"].strip().upper()
-                    deposit_address = row["SOL_DEPOSIT_ADDRESS"].strip()
-                    parent_ident = row.get("PARENT", "").strip() or None
-
-                    parent_id = None
-                    if parent_ident:
-                        parent_id = await accounts_repo.get_parent_id(parent_ident)
-
-                    # формируем объекты
-                    account = Account(
-                        name=name,
-                        api_key=api_key,
-                        api_secret=api_secret,
-                        exchange=exchange,
-                        country=country,
-                        parent_id=parent_id,
-                        owner_tid=message.from_user.id,
+                    if not name:
+                        raise ValueError("empty NAME")
+                    rows.append(
+                        accounts_repo.AccountImportRow(
+                            line=idx,
+                            name=name,
+                            api_key=row["API_KEY"].strip(),
+                            api_secret=row["API_SECRET"].strip(),
+                            country=row["COUNTRY"].strip().upper(),
+                            deposit_address=row["SOL_DEPOSIT_ADDRESS"].strip(),
+                            parent=(row.get("PARENT") or "").strip() or None,
+                            headers=_gen_headers(),
+                            cookies=_gen_cookies(),
+                        )
                     )
-                    fake_header = FakeHeader(
-                        headers=_gen_headers(), cookies=_gen_cookies()
-                    )
-                    deposit = DepositAddress(
-                        chain=Chain.SOLANA, address=deposit_address
-                    )
-
-                    await accounts_repo.add_account_full(
-                        account=account,
-                        fake_header=fake_header,
-                        deposit=deposit,
-                    )
-                    successes.append(name)
-                except (NoFreeProxy, ParentAccountNotFound, KeyError, ValueError) as e:
+                except (KeyError, AttributeError, ValueError) as e:
                     logger.warning(f"row {idx} failed: {e}")
-                    failures.append(name or f"row#{idx}")
-                except Exception as e:
-                    failures.append(name or f"row#{idx}")
+                    results.append(
+                        accounts_repo.AccountImportResult(
+                            line=idx, name=name, ok=False, error="неполная строка"
+                        )
+                    )
     finally:
         os.remove(path)
 
+    if rows:
+        try:
+            results += await accounts_repo.import_accounts_bulk(
+                rows, owner_tid=message.from_user.id, exchange=exchange
+            )
+        except Exception as e:
+            logger.exception(f"bulk import failed: {e}")
+            results += [
+                accounts_repo.AccountImportResult(
+                    line=r.line, name=r.name, ok=False, error="ошибка БД"
+                )
+                for r in rows
+            ]
+    results.sort(key=lambda r: r.line)
+
+    successes = [r for r in results if r.ok]
+    failures = [r for r in results if not r.ok]
+
     report = (
         f"Импорт завершён.\n"
         f"✅ Успешно: {len(successes)}\n"
         f"❌ Ошибок: {len(failures)}"
     )
     if failures:
-        report += "\nНе удалось загрузить:\n" + "\n".join(f"`{n}`" for n in failures)
+        report += "\nНе удалось загрузить:\n" + "\n".join(
+            f"`{r.name or f'row#{r.line}'}` — {r.error}" for r in failures
+        )
 
     await message.answer(
         report, reply_markup=accounts_keyboard(), parse_mode="Markdown"
@@ -1,20 +1,91 @@
+import asyncio
+from datetime import datetime, timezone
+
 from aiogram import F, Router
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
 from loguru import logger
 from decimal import Decimal
 
 from aiogram.exceptions import TelegramBadRequest
 from src.bot.features.accounts.keyboards import accounts_actions_keyboard
 from src.bot.features.accounts.states import AccountsStates
-from src.bot.triggers import Texts
+from src.bot.triggers import Callbacks, Texts
 from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.clients.exchanges.backpack.valuation import usd_prices, value_portfolios
 from src.core.repositories import accounts as accounts_repo
+from src.core.repositories import balances as balances_repo
 
 router = Router()
 
 
+def _refresh_keyboard(account_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔄 Обновить",
+                    callback_data=f"{Callbacks.Accounts.REFRESH_BALANCE}:{account_id}",
+                )
+            ]
+        ]
+    )
+
+
+def _balance_text(
+    portfolio: list[tuple[str, Decimal, float]], taken_at: datetime | None = None
+) -> str:
+    if not portfolio:
+        text = "Нет активных токенов для отображения."
+    else:
+        lines = [
+            f"{idx}. <b>{symbol}</b>: {amount} (~{value_usd:.2f} $)"
+            for idx, (symbol, amount, value_usd) in enumerate(portfolio, start=1)
+        ]
+        total = sum(value_usd for _, _, value_usd in portfolio)
+        text = (
+            "<b>Баланс и оценка в USD:</b>\n"
+            + "\n".join(lines)
+            + f"\n<b>Итого:</b> ~{total:.2f} $"
+        )
+    if taken_at is not None:
+        age_min = int((datetime.now(timezone.utc) - taken_at).total_seconds() // 60)
+        text += f"\n\n🕒 Снимок от {taken_at:%d.%m %H:%M} UTC ({age_min} мин назад)"
+    return text
+
+
+async def _live_portfolio(
+    account_id: int, client: BackpackExchangeClient
+) -> list[tuple[str, Decimal, float]]:
+    """Запросить баланс у биржи, оценить и сохранить как свежий снимок."""
+    totals_resp, tickers_resp = await asyncio.gather(
+        client.get_total_token_quantities(), client.get_tickers()
+    )
+    # Оцениваем портфель по одному снимку тикеров (symbol, amount, value_usd)
+    valuation = value_portfolios(
+        {account_id: totals_resp.totals}, usd_prices(tickers_resp)
+    )
+    portfolio = [
+        (symbol, totals_resp.totals[symbol], value_usd)
+        for symbol, _, value_usd in valuation.positions(
+            account_id, include_negative=True
+        )
+    ]
+    try:
+        await balances_repo.save_snapshots(
+            balances_repo.snapshot_rows(account_id, portfolio)
+        )
+    except Exception as e:
+        logger.warning(f"Saving balance snapshot failed: {e}")
+    return portfolio
+
+
 @router.message(
     F.text == Texts.Accounts.BALANCE, StateFilter(AccountsStates.account_selected)
 )
@@ -27,6 +98,17 @@ async def show_balance(message: Message, state: FSMContext) -> None:
             reply_markup=accounts_actions_keyboard(),
         )
 
+    # Последний снимок из БД — мгновенно, без запроса к бирже
+    snapshot = await balances_repo.latest_snapshot(account_id)
+    if snapshot is not None:
+        taken_at, rows = snapshot
+        portfolio = [(r.symbol, r.quantity, r.usd_value) for r in rows]
+        return await message.answer(
+            _balance_text(portfolio, taken_at),
+            parse_mode="HTML",
+            reply_markup=_refresh_keyboard(account_id),
+        )
+
     client = await accounts_repo.get_backpack_client_by_account_id(account_id)
     if not client:
         return await message.answer(
@@ -40,10 +122,8 @@ async def show_balance(message: Message, state: FSMContext) -> None:
         reply_markup=accounts_actions_keyboard(),
     )
 
-    # Параллельные запросы
     try:
-        totals_resp = await client.get_total_token_quantities()
-        tickers_resp = await client.get_tickers()
+        portfolio = await _live_portfolio(account_id, client)
     except Exception as e:
         logger.warning(f"Backpack data error: {e}")
         return await message.answer(
@@ -51,40 +131,35 @@ async def show_balance(message: Message, state: FSMContext) -> None:
             reply_markup=accounts_actions_keyboard(),
         )
 
-    # Собираем цены только для *_USDC пар
-    price_map: dict[str, Decimal] = {
-        t.symbol: Decimal(t.lastPrice)
-        for t in tickers_resp.tickers
-        if t.symbol.endswith("_USDC")
-    }
-    price_map["USDC_USDC"] = Decimal("1")
-
-    # Собираем портфель (symbol, amount, value_usd)
-    portfolio: list[tuple[str, Decimal, Decimal]] = []
-    for symbol, amount in totals_resp.totals.items():
-        pair = f"{symbol}_USDC"
-        price = price_map.get(pair)
-        if price is None:
-            continue
-        value_usd = amount * price
-        portfolio.append((symbol, amount, value_usd))
-
-    # Сортируем по убыванию USD
-    portfolio.sort(key=lambda x: x[2], reverse=True)
-
-    # Формируем итоговый текст
-    if not portfolio:
-        text = "Нет активных токенов для отображения."
-    else:
-        lines = [
-            f"{idx}. <b>{symbol}</b>: {amount} (~{value_usd:.2f} $)"
-            for idx, (symbol, amount, value_usd) in enumerate(portfolio, start=1)
-        ]
-        text = "<b>Баланс и оценка в USD:</b>\n" + "\n".join(lines)
-
     # Отправляем результат
     await message.answer(
-        text,
+        _balance_text(portfolio),
         parse_mode="HTML",
-        reply_markup=accounts_actions_keyboard(),
+        reply_markup=_refresh_keyboard(account_id),
     )
+
+
+@router.callback_query(F.data.startswith(f"{Callbacks.Accounts.REFRESH_BALANCE}:"))
+async def refresh_balance(cb: CallbackQuery) -> None:
+    account_id = int(cb.data.split(":", 1)[1])
+    client = await accounts_repo.get_backpack_client_by_account_id(account_id)
+    if not client:
+        await cb.answer("Аккаунт не найден.", show_alert=True)
+        return
+
+    await cb.answer("🕐 Делаю запрос в биржу…")
+    try:
+        portfolio = await _live_portfolio(account_id, client)
+    except Exception as e:
+        logger.warning(f"Backpack data error: {e}")
+        await cb.message.answer("⚠️ Ошибка при запросе к бирже, попробуйте позже.")
+        return
+
+    try:
+        await cb.message.edit_text(
+            _balance_text(portfolio),
+            parse_mode="HTML",
+            reply_markup=_refresh_keyboard(account_id),
+        )
+    except TelegramBadRequest:
+        pass
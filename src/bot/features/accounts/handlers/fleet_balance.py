@@ -0,0 +1,222 @@
+import asyncio
+import csv
+import io
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
+from loguru import logger
+
+from src.bot.features.accounts.keyboards import accounts_keyboard
+from src.bot.triggers import Callbacks, Texts
+from src.core.clients.exchanges.backpack.valuation import (
+    Valuation,
+    usd_prices,
+    value_portfolios,
+)
+from src.core.models import Account
+from src.core.repositories import accounts as acc_repo
+from src.core.repositories import balances as balances_repo
+
+router = Router()
+
+CONCURRENCY = 20  # одновременных запросов балансов
+PROGRESS_EVERY_SEC = 2.0  # не чаще — лимит Telegram на edit
+TABLE_ROWS = 30
+TOKEN_ROWS = 10
+
+
+def _table_text(
+    accounts: list[Account], valuation: Valuation, failed: dict[int, str]
+) -> str:
+    totals = valuation.totals()
+    ranked = sorted(
+        (a for a in accounts if a.id in totals), key=lambda a: -totals[a.id]
+    )
+    lines = [f"{'Аккаунт':<18} {'USD':>12}"]
+    for account in ranked[:TABLE_ROWS]:
+        lines.append(f"{account.name[:18]:<18} {totals[account.id]:>12.2f}")
+    if len(ranked) > TABLE_ROWS:
+        lines.append(f"… ещё {len(ranked) - TABLE_ROWS}")
+
+    tokens = sorted(valuation.token_totals().items(), key=lambda x: -x[1])
+    token_lines = [f"{token:<10} {usd:>14.2f}" for token, usd in tokens[:TOKEN_ROWS]]
+
+    text = [
+        "<b>💼 Баланс всех аккаунтов</b>",
+        "<pre>" + "\n".join(lines) + "</pre>",
+        "<b>По токенам:</b>",
+        "<pre>" + ("\n".join(token_lines) or "—") + "</pre>",
+        f"<b>Итого:</b> {sum(totals.values()):.2f} $ по {len(ranked)} аккаунтам",
+    ]
+    if failed:
+        text.append(f"⚠️ Не удалось получить баланс: {len(failed)}")
+    return "\n".join(text)
+
+
+def _csv_text(
+    accounts: list[Account],
+    valuation: Valuation,
+    quantities: dict[int, dict[str, Decimal]],
+    failed: dict[int, str],
+) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(
+        ["account_id", "name", "owner_tid", "token", "quantity", "usd", "error"]
+    )
+    for account in accounts:
+        if account.id in failed:
+            row = [account.id, account.name, account.owner_tid, "", "", ""]
+            writer.writerow(row + [failed[account.id]])
+            continue
+        if account.id not in quantities:
+            continue
+        for token, _, usd in valuation.positions(account.id, include_negative=True):
+            writer.writerow(
+                [
+                    account.id,
+                    account.name,
+                    account.owner_tid,
+                    token,
+                    quantities[account.id][token],
+                    f"{usd:.2f}",
+                ]
+            )
+    return buf.getvalue()
+
+
+async def _fetch_totals(clients: dict, progress) -> tuple[dict, dict[int, str]]:
+    """
+    get_total_token_quantities по всем клиентам с лимитом параллельности.
+    При отмене или ошибке оставшиеся запросы отменяются.
+    """
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def fetch(account_id: int, client):
+        async with semaphore:
+            try:
+                return account_id, (await client.get_total_token_quantities()).totals
+            except Exception as e:
+                return account_id, e
+
+    quantities: dict[int, dict[str, Decimal]] = {}
+    failed: dict[int, str] = {}
+    tasks = [asyncio.create_task(fetch(aid, c)) for aid, c in clients.items()]
+    try:
+        for done, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            account_id, result = await next_done
+            if isinstance(result, Exception):
+                failed[account_id] = str(result)
+            else:
+                quantities[account_id] = result
+            await progress(done, len(failed))
+    finally:
+        for task in tasks:
+            task.cancel()
+    return quantities, failed
+
+
+@router.message(F.text == Texts.Accounts.FLEET_BALANCE)
+async def fleet_balance(message: Message, state: FSMContext) -> None:
+    accounts = await acc_repo.fetch_accounts(
+        [message.from_user.id], with_friends=True
+    )
+    clients = await acc_repo.get_backpack_clients(a.id for a in accounts)
+    if not clients:
+        await message.answer("Нет аккаунтов.", reply_markup=accounts_keyboard())
+        return
+
+    total = len(clients)
+    status = await message.answer(f"⏳ Запрашиваю балансы: 0/{total}")
+    last_edit = time.monotonic()
+
+    async def progress(done: int, errors: int) -> None:
+        nonlocal last_edit
+        now = time.monotonic()
+        if done < total and now - last_edit < PROGRESS_EVERY_SEC:
+            return
+        last_edit = now
+        suffix = f", ошибок: {errors}" if errors else ""
+        try:
+            await status.edit_text(f"⏳ Запрашиваю балансы: {done}/{total}{suffix}")
+        except TelegramBadRequest:
+            pass
+
+    # тикеры — один раз на весь флот, параллельно с балансами
+    tickers_task = asyncio.create_task(next(iter(clients.values())).get_tickers())
+    try:
+        quantities, failed = await _fetch_totals(clients, progress)
+        try:
+            prices = usd_prices(await tickers_task)
+        except Exception as e:
+            logger.warning(f"Backpack tickers error: {e}")
+            await message.answer(
+                "⚠️ Ошибка при запросе к бирже, попробуйте позже.",
+                reply_markup=accounts_keyboard(),
+            )
+            return
+    finally:
+        # обработчик отменён или балансы упали — тикеры больше не нужны
+        tickers_task.cancel()
+
+    valuation = value_portfolios(quantities, prices)
+    # заодно обновляем снимки балансов всех аккаунтов одной вставкой
+    taken_at = datetime.now(timezone.utc)
+    rows = [
+        row
+        for account_id, tokens in quantities.items()
+        for row in balances_repo.snapshot_rows(
+            account_id,
+            (
+                (token, tokens[token], usd)
+                for token, _, usd in valuation.positions(
+                    account_id, include_negative=True
+                )
+            ),
+            taken_at,
+        )
+    ]
+    try:
+        await balances_repo.save_snapshots(rows)
+    except Exception as e:
+        logger.warning(f"Saving balance snapshots failed: {e}")
+    await state.update_data(
+        fleet_balance_csv=_csv_text(accounts, valuation, quantities, failed)
+    )
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="📎 CSV", callback_data=Callbacks.Accounts.FLEET_BALANCE_CSV
+                )
+            ]
+        ]
+    )
+    await message.answer(
+        _table_text(accounts, valuation, failed), parse_mode="HTML", reply_markup=kb
+    )
+
+
+@router.callback_query(F.data == Callbacks.Accounts.FLEET_BALANCE_CSV)
+async def fleet_balance_csv(cb: CallbackQuery, state: FSMContext) -> None:
+    data = await state.get_data()
+    content = data.get("fleet_balance_csv")
+    if not content:
+        await cb.answer("Данные устарели, запросите баланс заново.", show_alert=True)
+        return
+    filename = f"fleet_balance_{datetime.now(timezone.utc):%Y%m%d_%H%M}.csv"
+    await cb.message.answer_document(
+        BufferedInputFile(content.encode(), filename=filename)
+    )
+    await cb.answer()
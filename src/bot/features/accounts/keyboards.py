@@ -11,6 +11,7 @@ def accounts_keyboard() -> ReplyKeyboardMarkup:
             [KeyboardButton(text=Texts.Accounts.ADD_CSV)],
             [KeyboardButton(text=Texts.Accounts.DELETE)],
             [KeyboardButton(text=Texts.Accounts.STATS)],
+            [KeyboardButton(text=Texts.Accounts.FLEET_BALANCE)],
         ],
         resize_keyboard=True,
         one_time_keyboard=True,
@@ -8,6 +8,7 @@ from aiogram.fsm.storage.redis import RedisStorage
 
 import src.settings as settings
 from src.dev import dev
+from src.core.log import setup_logging
 from src.bot.common.middlewares import AccessMiddleware, MetricsMiddleware
 from src.bot.features.home import router as home_router
 from src.bot.features.exchange import router as exchange_router
@@ -16,6 +17,7 @@ from src.bot.features.accounts.handlers import (
     accounts_find_router,
     accounts_balance_router,
     accounts_stats_router,
+    accounts_fleet_balance_router,
     accounts_add_router,
     accounts_add_csv_router,
     accounts_delete_router,
@@ -35,6 +37,7 @@ load_dotenv()
 
 
 async def main():
+    setup_logging("bot")
     if settings.DEV_MODE:
         await dev()
         return
@@ -56,6 +59,7 @@ async def main():
     dp.include_router(accounts_find_router)
     dp.include_router(accounts_balance_router)
     dp.include_router(accounts_stats_router)
+    dp.include_router(accounts_fleet_balance_router)
     dp.include_router(accounts_add_router)
     dp.include_router(accounts_add_csv_router)
     dp.include_router(accounts_delete_router)
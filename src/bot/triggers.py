@@ -13,6 +13,8 @@ class Callbacks:
         SHOW_ONE = "accounts_show_one"
         BALANCE = "accounts_balance"
         GET_BALANCE = "accounts_get_balance"
+        FLEET_BALANCE_CSV = "accounts_fleet_balance_csv"
+        REFRESH_BALANCE = "accounts_refresh_balance"
         EXECUTE_ORDER = "accounts_execute_order"
         DELETE = "accounts_delete"
 
@@ -46,6 +48,7 @@ class Texts:
         ADD_CSV = "Добавить аккаунты через csv"
         DELETE = "Удалить аккаунт"
         STATS = "Статистика по аккаунтам"
+        FLEET_BALANCE = "Баланс всех аккаунтов"
         BALANCE = "Получить баланс"
         ORDER = "Выполнить ордер"
         MARKET_ORDER = "Маркет-ордер"
@@ -14,11 +14,27 @@ from aiohttp_socks import ProxyConnector
 from aiohttp import ClientTimeout, ClientSession
 from aiohttp.client_exceptions import ServerDisconnectedError, ClientConnectorError
 from loguru import logger
+from pydantic import ValidationError
 from sqlalchemy import select, update
 from src.core.clients.metrics import REQUEST_COUNT, REQUEST_LATENCY, metrics
+from src.core.clients.exchanges.backpack.cache import clients
+from src.core.clients.exchanges.backpack.market_data import market_data
+from src.core.clients.exchanges.backpack.sessions import sessions
+from src.core.clients.exchanges.backpack.signing import RequestSigner
+from src.core.log import request_id
+from src.core.clients.exchanges.backpack.ratelimit import (
+    RateLimitedError,
+    ORDER,
+    PUBLIC,
+    endpoint_class,
+    limiter,
+    parse_retry_after,
+)
 from src.core.clients.exchanges.backpack.schemas import (
     AccountInfoResponse,
     BalancesResponse,
+    BatchOrderResult,
+    BatchOrdersResponse,
     BorrowLendPositionsResponse,
     ConvertAllToUsdcResponse,
     LimitOrderResponse,
@@ -33,6 +49,7 @@ from src.core.clients.exchanges.backpack.schemas import (
 )
 from src.core.models import Account, Proxy
 from src.core.clients.databases.postgres import pg
+from src.core.repositories import proxy_allocator
 from prometheus_client import Summary
 import aiohttp
 from cryptography.hazmat.primitives.asymmetric import ed25519
@@ -42,17 +59,63 @@ from aiohttp.client_exceptions import ServerDisconnectedError, ClientConnectorEr
 from loguru import logger
 from tenacity import (
     AsyncRetrying,
-    RetryError,
     stop_after_attempt,
     wait_fixed,
     retry_if_exception_type,
 )
+from tenacity.wait import wait_base
 from sqlalchemy import select, update
 
 from src.core.models import Account, Proxy
 from decimal import Decimal, ROUND_DOWN
 
 
+MAX_BATCH_ORDERS = 20
+
+
+def order_params(
+    symbol: str,
+    side: str,  # Ask (=sell) | Bid (=buy)
+    quantity: str,
+    order_type: str = "Market",
+    price: Optional[str] = None,
+    **extra: Any,
+) -> dict:
+    """Тело orderExecute для create_order / create_orders_batch."""
+    params: dict[str, Any] = {
+        "symbol": symbol,
+        "side": side,
+        "orderType": order_type,
+        "quantity": quantity,
+    }
+    if order_type == "Limit":
+        params.update(
+            price=price, timeInForce="GTC", postOnly=False, reduceOnly=False
+        )
+    else:
+        params.update(
+            autoLend=True, autoLendRedeem=True, autoBorrow=True, autoBorrowRepay=True
+        )
+    params.update(extra)
+    return params
+
+
+# обрыв после отправки (ServerDisconnectedError) мог прийти уже после того,
+# как биржа приняла запрос: повтор допустим только для чтения. Изменяющие
+# запросы повторяются, лишь если запрос точно не дошёл (нет соединения, 429),
+# а решение о переотправке ордера принимает журнал ордеров.
+RETRY_ALWAYS = (ServerDisconnectedError, ClientConnectorError, RateLimitedError)
+RETRY_NOT_SENT = (ClientConnectorError, RateLimitedError)
+
+
+class _RetryWait(wait_base):
+    """1 с между попытками после сетевых ошибок; после 429 ждёт rate limiter."""
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        return 0 if isinstance(exc, RateLimitedError) else 1
+
+
 class BackpackExchangeClient:
     def __init__(
         self,
@@ -70,30 +133,17 @@ class BackpackExchangeClient:
         self.fake_headers = fake_headers or {}
         self.cookies = cookies or {}
 
-        self.private_key_obj = ed25519.Ed25519PrivateKey.from_private_bytes(
-            base64.b64decode(api_secret)
-        )
+        self.signer = RequestSigner(api_key, api_secret, self.fake_headers)
+        self.private_key_obj = self.signer.key
+        self._public_headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            **self.fake_headers,
+        }
 
     def _generate_signature(
         self, instruction: str, timestamp: int, params: Optional[dict] = None
-    ) -> dict:
-        sorted_params = (
-            {
-                k: (str(v).lower() if isinstance(v, bool) else v)
-                for k, v in sorted(params.items())
-            }
-            if params
-            else {}
-        )
-
-        param_str = "&".join(f"{k}={v}" for k, v in sorted_params.items())
-        sign_str = f"instruction={instruction}"
-        if param_str:
-            sign_str += f"&{param_str}"
-        sign_str += f"&timestamp={timestamp}&window=60000"
-
-        logger.info(f"sign_str: {sign_str}")
-        return base64.b64encode(self.private_key_obj.sign(sign_str.encode())).decode()
+    ) -> str:
+        return self.signer.sign(instruction, timestamp, params)
 
     async def _request_with_retry(
         self,
@@ -102,37 +152,46 @@ class BackpackExchangeClient:
         instruction: Optional[str] = None,
         method: Optional[str] = None,
         endpoint: Optional[str] = None,
-        retries: int = 2,
+        retries: int = 3,
+        retry_on: tuple[type[Exception], ...] = RETRY_ALWAYS,
     ) -> Any:
         """
         Утилита для исполнения запроса с retry через tenacity.
+        После 429 пауза уже выставлена в rate limiter, поэтому tenacity
+        сам не ждёт, а следующая попытка блокируется на limiter.acquire.
         """
-        async for attempt in AsyncRetrying(
-            stop=stop_after_attempt(retries),
-            wait=wait_fixed(1),
-            retry=retry_if_exception_type(
-                (ServerDisconnectedError, ClientConnectorError)
-            ),
-            reraise=True,
-        ):
-            REQUEST_COUNT.labels(
-                instruction=instruction or "", method=(method or "").upper()
-            ).inc()
-            with REQUEST_LATENCY.labels(
-                instruction=instruction or "", method=(method or "").upper()
-            ).time():
-                try:
-                    resp_json = await send_func(*args)
-                    if isinstance(resp_json, dict) and resp_json.get("error"):
-                        raise RuntimeError(f"API error: {resp_json.get('message')}")
-                    return resp_json
-                except (ServerDisconnectedError, ClientConnectorError) as ex:
-                    logger.error("Proxy failure on {} {}: {}", method, endpoint, ex)
-                    await self.change_proxy()
-                    raise
-                except Exception as ex:
-                    logger.error("Unknown failure on {} {}: {}", method, endpoint, ex)
-                    raise
+        # один request_id на все попытки запроса — для склейки записей лога
+        with logger.contextualize(request_id=request_id()):
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(retries),
+                wait=_RetryWait(),
+                retry=retry_if_exception_type(retry_on),
+                reraise=True,
+            ):
+                REQUEST_COUNT.labels(
+                    instruction=instruction or "", method=(method or "").upper()
+                ).inc()
+                with attempt, REQUEST_LATENCY.labels(
+                    instruction=instruction or "", method=(method or "").upper()
+                ).time():
+                    try:
+                        resp_json = await send_func(*args)
+                        if isinstance(resp_json, dict) and resp_json.get("error"):
+                            raise RuntimeError(
+                                f"API error: {resp_json.get('message')}"
+                            )
+                        return resp_json
+                    except (ServerDisconnectedError, ClientConnectorError) as ex:
+                        logger.error("Proxy failure on {} {}: {}", method, endpoint, ex)
+                        await self.change_proxy()
+                        raise
+                    except RateLimitedError:
+                        raise
+                    except Exception as ex:
+                        logger.error(
+                            "Unknown failure on {} {}: {}", method, endpoint, ex
+                        )
+                        raise
 
     async def _send_request(
         self,
@@ -144,42 +203,41 @@ class BackpackExchangeClient:
     ) -> Any:
         url = f"{self.base_url}{endpoint}"
         data = json.dumps(params) if method.upper() in ("POST", "PATCH") else None
+        cls = endpoint_class(method, instruction)
 
         async def _inner():
-            _time = int(datetime.now(timezone.utc).timestamp() * 1000)
-            headers = {
-                "X-API-Key": self.api_key,
-                "X-Signature": self._generate_signature(instruction, _time, params),
-                "X-Timestamp": str(_time),
-                "X-Window": "60000",
-                "Content-Type": "application/json; charset=utf-8",
-                **self.fake_headers,
-            }
-            connector = (
-                ProxyConnector.from_url(self.proxy_url) if self.proxy_url else None
-            )
-            timeout = ClientTimeout(total=20)
-            async with ClientSession(connector=connector, timeout=timeout) as session:
-                async with session.request(
-                    method=method.upper(),
-                    url=url,
-                    headers=headers,
-                    params=None if data else params,
-                    data=data,
-                    cookies=self.cookies,
-                ) as resp:
-                    text = await resp.text()
-                    if not need_response:
-                        return None
-                    return json.loads(text)
+            await limiter.acquire(self.api_key, cls)
+            headers = self.signer.headers(instruction, params)
+            session = await sessions.get(self.proxy_url)
+            async with session.request(
+                method=method.upper(),
+                url=url,
+                headers=headers,
+                params=None if data else params,
+                data=data,
+                cookies=self.cookies,
+                timeout=ClientTimeout(total=20),
+            ) as resp:
+                self._check_rate_limit(resp, cls)
+                text = await resp.text()
+                if not need_response:
+                    return None
+                return json.loads(text)
 
         try:
             return await self._request_with_retry(
-                _inner, instruction=instruction, method=method, endpoint=endpoint
+                _inner,
+                instruction=instruction,
+                method=method,
+                endpoint=endpoint,
+                retry_on=RETRY_NOT_SENT if cls == ORDER else RETRY_ALWAYS,
             )
-        except RetryError as e:
-            logger.error("Max retries reached for {} {}: {}", method, endpoint, e)
+        except (ServerDisconnectedError, ClientConnectorError) as e:
+            logger.error("Proxy failure on {} {}: {}", method, endpoint, e)
             return {"error": "proxy_failure", "message": str(e)}
+        except RateLimitedError as e:
+            logger.error("Rate limited on {} {}: {}", method, endpoint, e)
+            return {"error": "rate_limited", "message": str(e)}
         except json.JSONDecodeError as e:
             logger.error("Invalid JSON from {}: {}", url, e)
             return {"error": "invalid_json"}
@@ -194,36 +252,39 @@ class BackpackExchangeClient:
         params: Optional[dict] = None,
     ) -> Any:
         url = f"{self.base_url}{endpoint}"
-        headers = {
-            "Content-Type": "application/json; charset=utf-8",
-            **self.fake_headers,
-        }
+        headers = self._public_headers
 
         async def _inner_public():
-            connector = (
-                ProxyConnector.from_url(self.proxy_url) if self.proxy_url else None
-            )
-            timeout = ClientTimeout(total=30)
-            async with ClientSession(connector=connector, timeout=timeout) as session:
-                async with session.request(
-                    method=method.upper(),
-                    url=url,
-                    headers=headers,
-                    params=params,
-                    cookies=self.cookies,
-                ) as resp:
-                    text = await resp.text()
-                    return json.loads(text)
+            await limiter.acquire(self.api_key, PUBLIC)
+            session = await sessions.get(self.proxy_url)
+            async with session.request(
+                method=method.upper(),
+                url=url,
+                headers=headers,
+                params=params,
+                cookies=self.cookies,
+                timeout=ClientTimeout(total=30),
+            ) as resp:
+                self._check_rate_limit(resp, PUBLIC)
+                text = await resp.text()
+                return json.loads(text)
 
         try:
             return await self._request_with_retry(
                 _inner_public, instruction="public", method=method, endpoint=endpoint
             )
-        except RetryError as e:
-            logger.error(
-                "Max retries reached for public {} {}: {}", method, endpoint, e
-            )
+        except (ServerDisconnectedError, ClientConnectorError) as e:
+            logger.error("Proxy failure on public {} {}: {}", method, endpoint, e)
             return {"error": "proxy_failure", "message": str(e)}
+        except RateLimitedError as e:
+            logger.error("Rate limited on public {} {}: {}", method, endpoint, e)
+            return {"error": "rate_limited", "message": str(e)}
+
+    def _check_rate_limit(self, resp, cls: str) -> None:
+        if resp.status == 429:
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            limiter.penalize(self.api_key, cls, retry_after)
+            raise RateLimitedError(retry_after)
 
     @metrics.track("backpack")
     async def get_balance(self) -> BalancesResponse:
@@ -293,7 +354,7 @@ class BackpackExchangeClient:
             instruction="withdraw",
             params=params,
         )
-        logger.info(f"data: {data}")
+        logger.debug("Withdrawal response: {}", data)
 
         return WithdrawalResponse(**data)
 
@@ -305,21 +366,12 @@ class BackpackExchangeClient:
         quantity: str,
         price: str,
     ) -> LimitOrderResponse:
-        params = {
-            "symbol": symbol,
-            "side": side,
-            "orderType": "Limit",
-            "quantity": quantity,
-            "price": price,
-            "timeInForce": "GTC",
-            "postOnly": False,
-            "reduceOnly": False,
-        }
-        data = await self._send_request(
-            method="POST",
-            endpoint="api/v1/order",
-            instruction="orderExecute",
-            params=params,
+        data = await self.create_order(
+            symbol=symbol,
+            side=side,
+            quantity=quantity,
+            order_type="Limit",
+            price=price,
         )
         return LimitOrderResponse(**data)
 
@@ -330,24 +382,60 @@ class BackpackExchangeClient:
         side: str,  # Ask (=sell) | Bid (=buy)
         quantity: str,
     ) -> MarketOrderResponse:
-        params = {
-            "symbol": symbol,
-            "side": side,
-            "orderType": "Market",
-            "quantity": quantity,
-            "autoLend": True,
-            "autoLendRedeem": True,
-            "autoBorrow": True,
-            "autoBorrowRepay": True,
-            # "reduceOnly": False,
-        }
-        data = await self._send_request(
+        data = await self.create_order(symbol=symbol, side=side, quantity=quantity)
+        return MarketOrderResponse(**data)
+
+    @metrics.track("backpack")
+    async def create_order(
+        self,
+        symbol: str,
+        side: str,  # Ask (=sell) | Bid (=buy)
+        quantity: str,
+        order_type: str = "Market",
+        price: Optional[str] = None,
+        **extra: Any,
+    ) -> dict:
+        return await self._send_request(
             method="POST",
             endpoint="api/v1/order",
             instruction="orderExecute",
-            params=params,
+            params=order_params(symbol, side, quantity, order_type, price, **extra),
         )
-        return MarketOrderResponse(**data)
+
+    @metrics.track("backpack")
+    async def create_orders_batch(self, orders: list[dict]) -> BatchOrdersResponse:
+        """
+        Отправить несколько ордеров одним подписанным запросом
+        (POST api/v1/orders). orders — параметры, собранные order_params;
+        результаты возвращаются в том же порядке. Списки длиннее
+        MAX_BATCH_ORDERS отправляются несколькими запросами.
+        """
+        results: list[BatchOrderResult] = []
+        for start in range(0, len(orders), MAX_BATCH_ORDERS):
+            chunk = orders[start : start + MAX_BATCH_ORDERS]
+            data = await self._send_request(
+                method="POST",
+                endpoint="api/v1/orders",
+                instruction="orderExecute",
+                params=chunk,
+            )
+            if not isinstance(data, list):
+                error = str(data.get("message") or data.get("error") or data)
+                results.extend(
+                    BatchOrderResult(success=False, order=None, error=error)
+                    for _ in chunk
+                )
+                continue
+            for item in data:
+                if isinstance(item, dict) and item.get("id"):
+                    results.append(
+                        BatchOrderResult(success=True, order=item, error=None)
+                    )
+                else:
+                    results.append(
+                        BatchOrderResult(success=False, order=None, error=str(item))
+                    )
+        return BatchOrdersResponse(results=results)
 
     @metrics.track("backpack")
     async def convert_all_to_usdc(
@@ -363,7 +451,7 @@ class BackpackExchangeClient:
         totals = (await self.get_total_token_quantities()).totals
 
         symbols = []
-        tasks = []
+        orders = []
         for symbol, amount in totals.items():
             if symbol == "USDC" or amount <= 0:
                 continue
@@ -373,29 +461,22 @@ class BackpackExchangeClient:
             if quantized <= 0:
                 continue
             symbols.append(symbol)
+            orders.append(order_params(f"{symbol}_USDC", "Ask", str(quantized)))
 
-            async def sell(sym: str, qty: Decimal) -> MarketOrderResponse:
-                await asyncio.sleep(random.uniform(0, 5))
-                return await self.create_market_order(
-                    symbol=f"{sym}_USDC", side="Ask", quantity=str(qty)
-                )
-
-            tasks.append(sell(symbol, quantized))
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        batch = await self.create_orders_batch(orders)
 
         sale_results: list[MarketSaleResult] = []
-        for sym, res in zip(symbols, results):
-            if isinstance(res, MarketOrderResponse):
-                sale_results.append(
-                    MarketSaleResult(symbol=sym, success=True, order=res, error=None)
-                )
-            else:
-                sale_results.append(
-                    MarketSaleResult(
-                        symbol=sym, success=False, order=None, error=str(res)
-                    )
+        for sym, res in zip(symbols, batch.results):
+            try:
+                order = MarketOrderResponse(**res.order) if res.success else None
+                error = res.error
+            except ValidationError as e:
+                order, error = None, str(e)
+            sale_results.append(
+                MarketSaleResult(
+                    symbol=sym, success=order is not None, order=order, error=error
                 )
+            )
         return ConvertAllToUsdcResponse(results=sale_results)
 
     @metrics.track("backpack")
@@ -417,6 +498,22 @@ class BackpackExchangeClient:
         orders = [OrderResponseBase(**o) for o in data]
         return OpenOrdersResponse(orders=orders)
 
+    @metrics.track("backpack")
+    async def get_order_history(
+        self, symbol: str | None = None, limit: int = 100
+    ) -> Optional[list[dict]]:
+        """Последние ордера; None — запрос не удался (история неизвестна)."""
+        params: dict[str, Any] = {"limit": limit}
+        if symbol:
+            params["symbol"] = symbol
+        data = await self._send_request(
+            method="GET",
+            endpoint="wapi/v1/history/orders",
+            instruction="orderHistoryQueryAll",
+            params=params,
+        )
+        return data if isinstance(data, list) else None
+
     async def get_open_positions(self) -> list[dict]:
         return await self._send_request(
             method="GET", endpoint="api/v1/position", instruction="positionQuery"
@@ -493,67 +590,68 @@ class BackpackExchangeClient:
                 logger.warning("Не найден аккаунт для api_key=%s", self.api_key)
                 return
 
-            # Освободить старый прокси
-            old_proxy = await session.scalar(
-                select(Proxy).where(
-                    Proxy.account_id == account.id, Proxy.in_use.is_(True)
+            # Атомарно занять другой свободный прокси, затем освободить старый
+            current = list(
+                await session.scalars(
+                    select(Proxy.id).where(Proxy.account_id == account.id)
                 )
             )
-            if old_proxy:
-                await session.execute(
-                    update(Proxy).where(Proxy.id == old_proxy.id).values(in_use=False)
-                )
-                logger.info(
-                    "Освобождён старый прокси id=%s для аккаунта %s",
-                    old_proxy.id,
-                    account.id,
-                )
-
-            # Назначить новый прокси
-            new_proxy = await session.scalar(
-                select(Proxy)
-                .where(
-                    Proxy.in_use.is_(False),
-                    Proxy.account_id.is_(None),
-                    Proxy.country == account.country,  # при необходимости
-                )
-                .limit(1)
+            new_proxy = await proxy_allocator.claim_proxy(
+                session, account.id, account.country, exclude=current
             )
             if not new_proxy:
                 logger.error(
                     "Нет свободных прокси для назначения аккаунту %s", account.id
                 )
-                await session.commit()  # фиксируем освобождение старого, если было
                 return
-
-            await session.execute(
-                update(Proxy)
-                .where(Proxy.id == new_proxy.id)
-                .values(account_id=account.id, in_use=True)
+            released = await proxy_allocator.release_proxy(
+                session, account.id, keep=[new_proxy.id]
             )
             await session.commit()
-            logger.info(
-                "Назначен новый прокси id=%s для аккаунта %s", new_proxy.id, account.id
-            )
+        await proxy_allocator.publish_released(released)
+
+        # старая keep-alive сессия привязана к прежнему прокси
+        clients.invalidate(account.id)
+        old_url = self.proxy_url
+        self.proxy_url = new_proxy.url
+        await sessions.discard(old_url)
+        logger.info(
+            "Назначен новый прокси id=%s для аккаунта %s", new_proxy.id, account.id
+        )
 
     async def get_order_book_depth(self, symbol: str) -> dict:
-        return await self.send_public_request(
-            method="GET",
-            endpoint="api/v1/depth",
-            params={"symbol": symbol},
+        return await market_data.get(
+            "depth",
+            symbol,
+            lambda: self.send_public_request(
+                method="GET",
+                endpoint="api/v1/depth",
+                params={"symbol": symbol},
+            ),
         )
 
     async def get_tickers(self) -> TickersResponse:
-        data = await self.send_public_request(
-            method="GET",
-            endpoint="api/v1/tickers",
+        data = await market_data.get(
+            "tickers",
+            None,
+            lambda: self.send_public_request(
+                method="GET",
+                endpoint="api/v1/tickers",
+            ),
         )
+        if market_data.stream is not None:
+            data = market_data.stream.merge_tickers(data)
         return TickersResponse(tickers=[Ticker(**item) for item in data])
 
     async def get_ticker(self, symbol) -> Ticker:
-        data = await self.send_public_request(
-            method="GET",
-            endpoint=f"api/v1/ticker?symbol={symbol.upper()}",
+        symbol = symbol.upper()
+        data = await market_data.get(
+            "ticker",
+            symbol,
+            lambda: self.send_public_request(
+                method="GET",
+                endpoint=f"api/v1/ticker?symbol={symbol}",
+            ),
         )
         return Ticker(**data)
 
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import event, inspect
+
+from src.core.clients.metrics import CLIENT_CACHE_REQUESTS
+from src.core.models import Account, FakeHeader, Proxy
+
+if TYPE_CHECKING:
+    from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+
+CLIENT_CACHE_SIZE = 1024
+CLIENT_CACHE_TTL_SEC = 600
+
+
+class ClientCache:
+    """
+    LRU+TTL кэш готовых BackpackExchangeClient по account_id, чтобы не
+    ходить в БД и не разбирать ed25519-ключ на каждое действие в боте.
+    Кэш локален для процесса: при смене прокси, удалении аккаунта или
+    правке заголовков запись сбрасывается через invalidate(), а изменения
+    из других процессов видны не позже чем через ttl.
+    """
+
+    def __init__(
+        self, maxsize: int = CLIENT_CACHE_SIZE, ttl: float = CLIENT_CACHE_TTL_SEC
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict[int, tuple[float, "BackpackExchangeClient"]] = (
+            OrderedDict()
+        )
+
+    def get(self, account_id: int) -> Optional["BackpackExchangeClient"]:
+        item = self._items.get(account_id)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[account_id]
+            CLIENT_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+        self._items.move_to_end(account_id)
+        CLIENT_CACHE_REQUESTS.labels(result="hit").inc()
+        return item[1]
+
+    def put(self, account_id: int, client: "BackpackExchangeClient") -> None:
+        self._items[account_id] = (time.monotonic() + self.ttl, client)
+        self._items.move_to_end(account_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, account_id: int) -> None:
+        self._items.pop(account_id, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+clients = ClientCache()
+
+
+# ORM-правки аккаунта, заголовков и прокси (через session.add/flush)
+# сбрасывают клиента аккаунта; массовые update() нужно сопровождать явным
+# clients.invalidate().
+@event.listens_for(FakeHeader, "after_update")
+@event.listens_for(FakeHeader, "after_delete")
+@event.listens_for(Proxy, "after_update")
+def _invalidate_account_client(mapper, connection, target) -> None:
+    history = inspect(target).attrs.account_id.history
+    for account_id in (target.account_id, *history.deleted):
+        if account_id is not None:
+            clients.invalidate(account_id)
+
+
+@event.listens_for(Account, "after_update")
+@event.listens_for(Account, "after_delete")
+def _invalidate_own_client(mapper, connection, target) -> None:
+    clients.invalidate(target.id)
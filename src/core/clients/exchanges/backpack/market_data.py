@@ -0,0 +1,87 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from src.core.clients.metrics import MARKET_DATA_FETCH_LATENCY, MARKET_DATA_REQUESTS
+
+DEPTH_TTL_SEC = 2.0
+TICKERS_TTL_SEC = 5.0
+
+
+def _is_valid(value: Any) -> bool:
+    # ошибки send_public_request приходят словарём {"error": ...} — их не кэшируем
+    return not (isinstance(value, dict) and value.get("error"))
+
+
+class MarketDataCache:
+    """
+    Процессный кэш публичных рыночных данных (стакан, тикеры).
+    Данные не зависят от аккаунта, поэтому N аккаунтов в цикле воркера
+    получают один и тот же ответ:
+      • если подключён стрим (BackpackMarketStream) и у него есть свежие
+        данные — они отдаются сразу из памяти;
+      • значение живёт ttl секунд;
+      • одновременные промахи по одному ключу объединяются в один запрос
+        (single-flight), остальные ждут его результата.
+    """
+
+    def __init__(self, ttls: dict[str, float] | None = None, default_ttl: float = 2.0):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self._values: dict[Hashable, tuple[float, Any]] = {}
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.stream = None
+
+    def attach_stream(self, stream) -> None:
+        self.stream = stream
+
+    async def get(
+        self, kind: str, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if self.stream is not None:
+            streamed = self.stream.lookup(kind, key)
+            if streamed is not None:
+                MARKET_DATA_REQUESTS.labels(kind=kind, result="stream").inc()
+                return streamed
+
+        cache_key = (kind, key)
+        now = time.monotonic()
+
+        cached = self._values.get(cache_key)
+        if cached is not None and cached[0] > now:
+            MARKET_DATA_REQUESTS.labels(kind=kind, result="hit").inc()
+            return cached[1]
+
+        future = self._inflight.get(cache_key)
+        if future is not None:
+            MARKET_DATA_REQUESTS.labels(kind=kind, result="coalesced").inc()
+            return await asyncio.shield(future)
+
+        MARKET_DATA_REQUESTS.labels(kind=kind, result="miss").inc()
+        future = asyncio.ensure_future(self._load(kind, cache_key, fetch))
+        self._inflight[cache_key] = future
+        return await asyncio.shield(future)
+
+    async def _load(
+        self, kind: str, cache_key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        try:
+            with MARKET_DATA_FETCH_LATENCY.labels(kind=kind).time():
+                value = await fetch()
+            if _is_valid(value):
+                ttl = self.ttls.get(kind, self.default_ttl)
+                self._values[cache_key] = (time.monotonic() + ttl, value)
+            return value
+        finally:
+            self._inflight.pop(cache_key, None)
+
+    def invalidate(self, kind: str | None = None) -> None:
+        if kind is None:
+            self._values.clear()
+            return
+        for cache_key in [k for k in self._values if k[0] == kind]:
+            del self._values[cache_key]
+
+
+market_data = MarketDataCache(ttls={"depth": DEPTH_TTL_SEC, "tickers": TICKERS_TTL_SEC})
@@ -0,0 +1,173 @@
+"""
+Идемпотентная отправка ордеров через журнал (order_ledger).
+
+Каждому намерению (аккаунт + строка intent, например
+"pool:3:window:1717:buy:SOL_USDC") соответствует детерминированный
+uint32 clientId. Перед отправкой журнал проверяется: принятое биржей
+намерение повторно не отправляется, а после таймаута (статус pending)
+сначала ищем ордер с этим clientId в истории биржи и только если его там
+нет — отправляем снова с тем же clientId. Если историю получить не удалось,
+намерение остаётся pending и не отправляется до следующей попытки.
+clientId — 32-битный хеш, поэтому может совпасть с clientId другого,
+старого намерения того же аккаунта: тогда берётся хеш с солью 1, 2, …,
+пока не найдётся свободный id или запись этого же намерения.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Optional
+
+from loguru import logger
+
+from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.models import OrderStatus
+from src.core.repositories.orders import ledger
+
+# ответы _send_request, после которых неизвестно, дошёл ли ордер до биржи
+UNKNOWN_OUTCOME_ERRORS = {"proxy_failure", "unexpected", "invalid_json"}
+# _find_on_exchange: история биржи недоступна, есть ли там ордер — неизвестно
+LOOKUP_FAILED = object()
+
+
+def outcome_unknown(resp: Any) -> bool:
+    """Ответ submit_order, после которого неизвестно, размещён ли ордер."""
+    return isinstance(resp, dict) and resp.get("error") in (
+        UNKNOWN_OUTCOME_ERRORS | {"order_status_unknown"}
+    )
+
+
+def client_id_for(account_id: int, intent: str, salt: int = 0) -> int:
+    """Детерминированный uint32 clientId намерения (salt — при коллизии)."""
+    key = f"{account_id}:{intent}" + (f":{salt}" if salt else "")
+    digest = hashlib.blake2b(key.encode(), digest_size=4)
+    return int.from_bytes(digest.digest(), "big")
+
+
+async def _ledger_slot(account_id: int, intent: str) -> tuple[int, Optional[dict]]:
+    """clientId намерения и его запись журнала, в обход чужих записей."""
+    salt = 0
+    while True:
+        client_id = client_id_for(account_id, intent, salt)
+        entry = await ledger.find(account_id, client_id)
+        if entry is None or entry["intent"] == intent:
+            return client_id, entry
+        logger.warning(
+            "clientId {} of {} is taken by {}, rehashing",
+            client_id,
+            intent,
+            entry["intent"],
+        )
+        salt += 1
+
+
+def _apply_response(entry: dict, resp: Any) -> None:
+    entry["updated_at"] = datetime.now(timezone.utc)
+    if isinstance(resp, dict) and resp.get("id"):
+        entry.update(
+            status=resp.get("status") or "New",
+            order_id=str(resp["id"]),
+            executed_quantity=resp.get("executedQuantity"),
+            executed_quote_quantity=resp.get("executedQuoteQuantity"),
+            error=None,
+        )
+    elif isinstance(resp, dict) and resp.get("error") in UNKNOWN_OUTCOME_ERRORS:
+        entry.update(status=OrderStatus.PENDING.value, error=str(resp))
+    else:
+        entry.update(status=OrderStatus.REJECTED.value, error=str(resp))
+
+
+async def _find_on_exchange(
+    client: BackpackExchangeClient, symbol: str, client_id: int
+) -> Any:
+    """Ордер с clientId из истории, None — его нет, LOOKUP_FAILED — неизвестно."""
+    history = await client.get_order_history(symbol=symbol)
+    if history is None:
+        return LOOKUP_FAILED
+    for order in history:
+        if str(order.get("clientId")) == str(client_id):
+            return order
+    return None
+
+
+async def submit_order(
+    client: BackpackExchangeClient,
+    *,
+    account_id: int,
+    intent: str,
+    symbol: str,
+    side: str,
+    quantity: str,
+    order_type: str = "Market",
+    price: Optional[str] = None,
+    pool_id: Optional[int] = None,
+) -> dict:
+    """
+    Отправить ордер не более одного раза на намерение.
+    Возвращает ответ биржи (или найденный ордер) как create_order;
+    для уже исполненного намерения — {"duplicate": True, ...} из журнала.
+    """
+    client_id, entry = await _ledger_slot(account_id, intent)
+
+    if entry is not None and entry["status"] != OrderStatus.PENDING:
+        if entry["status"] != OrderStatus.REJECTED:
+            logger.info(
+                "Order intent {} for acc {} already placed ({}), skipping",
+                intent,
+                account_id,
+                entry["order_id"],
+            )
+            return {
+                "id": entry["order_id"],
+                "clientId": client_id,
+                "status": entry["status"],
+                "duplicate": True,
+            }
+    elif entry is not None:
+        found = await _find_on_exchange(client, symbol, client_id)
+        if found is LOOKUP_FAILED:
+            logger.warning(
+                "Pending order {} not checked: order history unavailable", client_id
+            )
+            return {
+                "error": "order_status_unknown",
+                "message": "order history unavailable, order left pending",
+                "clientId": client_id,
+            }
+        if found is not None:
+            logger.info("Pending order {} found on exchange", client_id)
+            _apply_response(entry, found)
+            ledger.record(entry)
+            return found
+
+    now = datetime.now(timezone.utc)
+    entry = entry or {
+        "account_id": account_id,
+        "pool_id": pool_id,
+        "client_id": client_id,
+        "intent": intent,
+        "symbol": symbol,
+        "side": side,
+        "order_type": order_type,
+        "quantity": Decimal(quantity),
+        "price": Decimal(price) if price is not None else None,
+        "order_id": None,
+        "executed_quantity": None,
+        "executed_quote_quantity": None,
+        "error": None,
+        "created_at": now,
+    }
+    entry.update(status=OrderStatus.PENDING.value, updated_at=now)
+    ledger.record(entry)
+
+    resp = await client.create_order(
+        symbol=symbol,
+        side=side,
+        quantity=quantity,
+        order_type=order_type,
+        price=price,
+        clientId=client_id,
+    )
+    _apply_response(entry, resp)
+    ledger.record(entry)
+    return resp
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from loguru import logger
+
+import src.settings as settings
+from src.core.clients.metrics import RATE_LIMIT_WAIT, RATE_LIMITED_RESPONSES
+
+PUBLIC = "public"
+PRIVATE_READ = "private_read"
+ORDER = "order"
+
+DEFAULT_RETRY_AFTER_SEC = 1.0
+MAX_RETRY_AFTER_SEC = 60.0
+
+
+class RateLimitedError(Exception):
+    """Backpack ответил 429; retry_after — сколько ждать перед повтором."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+def endpoint_class(method: str, instruction: Optional[str]) -> str:
+    """Класс эндпоинта: публичный, приватное чтение или изменяющий запрос."""
+    if not instruction or instruction == PUBLIC:
+        return PUBLIC
+    if method.upper() == "GET":
+        return PRIVATE_READ
+    return ORDER
+
+
+def parse_retry_after(
+    value: Optional[str], default: float = DEFAULT_RETRY_AFTER_SEC
+) -> float:
+    """Retry-After в секундах или HTTP-дате; мусор/отсутствие → default."""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SEC)
+
+
+class TokenBucket:
+    """
+    Token bucket: rate токенов в секунду, не больше burst в запасе.
+    Ожидающие обслуживаются по очереди (lock удерживается на время сна),
+    block() после 429 обнуляет запас и запрещает выдачу до указанного момента.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Взять токен; возвращает время ожидания в секундах."""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return now - started
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+
+    def block(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """
+    Процессный rate limiter Backpack: отдельный token bucket на пару
+    (api_key, класс эндпоинта), общий для всех корутин и клиентов процесса.
+    """
+
+    def __init__(self, limits: dict[str, float]):
+        self.limits = limits
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    def bucket(self, api_key: str, cls: str) -> TokenBucket:
+        key = (api_key, cls)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = self.limits[cls]
+            bucket = self._buckets[key] = TokenBucket(rate, rate)
+        return bucket
+
+    async def acquire(self, api_key: str, cls: str) -> None:
+        waited = await self.bucket(api_key, cls).acquire()
+        RATE_LIMIT_WAIT.labels(endpoint_class=cls).observe(waited)
+
+    def penalize(self, api_key: str, cls: str, retry_after: float) -> None:
+        """Учесть 429: до истечения retry_after запросы этого класса ждут."""
+        RATE_LIMITED_RESPONSES.labels(endpoint_class=cls).inc()
+        logger.warning(
+            "Backpack 429 for {} ({}), pausing {:.2f}s", cls, api_key[:6], retry_after
+        )
+        self.bucket(api_key, cls).block(retry_after)
+
+
+limiter = RateLimiter(
+    {
+        PUBLIC: settings.BACKPACK_RPS_PUBLIC,
+        PRIVATE_READ: settings.BACKPACK_RPS_PRIVATE_READ,
+        ORDER: settings.BACKPACK_RPS_ORDER,
+    }
+)
@@ -1,3 +1,5 @@
+from typing import Any
+
 from pydantic import BaseModel
 from decimal import Decimal
 from datetime import datetime
@@ -101,6 +103,18 @@ class ConvertAllToUsdcResponse(BaseModel):
     results: list[MarketSaleResult]
 
 
+class BatchOrderResult(BaseModel):
+    """Результат одного ордера из batch-запроса (в порядке отправки)."""
+
+    success: bool
+    order: dict[str, Any] | None
+    error: str | None
+
+
+class BatchOrdersResponse(BaseModel):
+    results: list[BatchOrderResult]
+
+
 class AccountInfoResponse(BaseModel):
     """
     Модель ответа метода get_account_info.
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from typing import Optional
+
+from aiohttp import ClientSession, DummyCookieJar, TCPConnector
+from aiohttp_socks import ProxyConnector
+from loguru import logger
+
+from src.core.clients.metrics import (
+    SESSION_POOL_HITS,
+    SESSION_POOL_MISSES,
+    SESSION_POOL_SIZE,
+)
+
+IDLE_TTL_SEC = 300
+KEEPALIVE_SEC = 60
+CONNECTIONS_PER_PROXY = 20
+
+
+class SessionPool:
+    """
+    Реестр долгоживущих keep-alive сессий aiohttp, по одной на proxy_url.
+    Все клиенты с одним и тем же прокси переиспользуют соединения
+    (SOCKS-хендшейк и TLS делаются один раз, а не на каждый запрос).
+    Сессии, не использовавшиеся дольше idle_ttl, закрываются. Сессию
+    делят разные аккаунты, поэтому куки ответов не сохраняются
+    (DummyCookieJar) — каждый клиент шлёт только свои cookies запроса.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = IDLE_TTL_SEC,
+        keepalive: float = KEEPALIVE_SEC,
+        limit: int = CONNECTIONS_PER_PROXY,
+    ):
+        self.idle_ttl = idle_ttl
+        self.keepalive = keepalive
+        self.limit = limit
+        self._sessions: dict[Optional[str], ClientSession] = {}
+        self._last_used: dict[Optional[str], float] = {}
+        self._lock = asyncio.Lock()
+
+    def _make_connector(self, proxy_url: Optional[str]):
+        if proxy_url:
+            return ProxyConnector.from_url(
+                proxy_url, limit=self.limit, keepalive_timeout=self.keepalive
+            )
+        return TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive)
+
+    async def get(self, proxy_url: Optional[str]) -> ClientSession:
+        """Вернуть живую сессию для proxy_url, создав её при необходимости."""
+        now = time.monotonic()
+        session = self._sessions.get(proxy_url)
+        if session is not None and not session.closed:
+            SESSION_POOL_HITS.inc()
+            self._last_used[proxy_url] = now
+            return session
+
+        async with self._lock:
+            session = self._sessions.get(proxy_url)
+            if session is None or session.closed:
+                SESSION_POOL_MISSES.inc()
+                session = ClientSession(
+                    connector=self._make_connector(proxy_url),
+                    cookie_jar=DummyCookieJar(),
+                )
+                self._sessions[proxy_url] = session
+            else:
+                SESSION_POOL_HITS.inc()
+            self._last_used[proxy_url] = now
+            await self._close_idle(now)
+            SESSION_POOL_SIZE.set(len(self._sessions))
+            return session
+
+    async def discard(self, proxy_url: Optional[str]) -> None:
+        """Закрыть сессию прокси (например, после change_proxy)."""
+        async with self._lock:
+            session = self._sessions.pop(proxy_url, None)
+            self._last_used.pop(proxy_url, None)
+            SESSION_POOL_SIZE.set(len(self._sessions))
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def _close_idle(self, now: float) -> None:
+        stale = [
+            key
+            for key, ts in self._last_used.items()
+            if now - ts > self.idle_ttl and key in self._sessions
+        ]
+        for key in stale:
+            session = self._sessions.pop(key)
+            self._last_used.pop(key, None)
+            if not session.closed:
+                await session.close()
+        if stale:
+            logger.debug("Closed {} idle sessions", len(stale))
+
+    async def close(self) -> None:
+        async with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._last_used.clear()
+            SESSION_POOL_SIZE.set(0)
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+
+sessions = SessionPool()
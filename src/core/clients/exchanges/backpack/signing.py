@@ -0,0 +1,122 @@
+import base64
+import random
+import time
+import timeit
+from typing import Any, Optional
+
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from loguru import logger
+
+import src.settings as settings
+
+WINDOW = "60000"
+
+_keys: dict[str, tuple[str, ed25519.Ed25519PrivateKey]] = {}
+
+
+def private_key(api_key: str, api_secret: str) -> ed25519.Ed25519PrivateKey:
+    """Ed25519-ключ по api_key; base64-секрет разбирается один раз на процесс."""
+    cached = _keys.get(api_key)
+    if cached is not None and cached[0] == api_secret:
+        return cached[1]
+    key = ed25519.Ed25519PrivateKey.from_private_bytes(base64.b64decode(api_secret))
+    _keys[api_key] = (api_secret, key)
+    return key
+
+
+def _value(v: Any) -> Any:
+    return str(v).lower() if isinstance(v, bool) else v
+
+
+def sign_string(
+    instruction: str, timestamp: int, params: Optional[dict | list[dict]] = None
+) -> str:
+    """
+    instruction=...&<params по алфавиту>&timestamp=...&window=... за один проход.
+    Для batch-запроса (params — список) сегмент instruction=...&<params>
+    повторяется для каждого элемента.
+    """
+    parts = []
+    for item in params if isinstance(params, list) else [params]:
+        parts.append(f"instruction={instruction}")
+        if item:
+            parts.extend(f"{k}={_value(item[k])}" for k in sorted(item))
+    parts.append(f"timestamp={timestamp}&window={WINDOW}")
+    return "&".join(parts)
+
+
+class RequestSigner:
+    """
+    Подпись запросов одного api_key: ключ берётся из процессного кэша,
+    статическая часть заголовков собирается один раз в конструкторе.
+    """
+
+    def __init__(
+        self, api_key: str, api_secret: str, fake_headers: Optional[dict] = None
+    ):
+        self.key = private_key(api_key, api_secret)
+        self._static_headers = {
+            "X-API-Key": api_key,
+            "X-Window": WINDOW,
+            "Content-Type": "application/json; charset=utf-8",
+            **(fake_headers or {}),
+        }
+
+    def sign(
+        self,
+        instruction: str,
+        timestamp: int,
+        params: Optional[dict | list[dict]] = None,
+    ) -> str:
+        payload = sign_string(instruction, timestamp, params)
+        if (
+            settings.BACKPACK_SIGN_LOG_SAMPLE
+            and random.random() < settings.BACKPACK_SIGN_LOG_SAMPLE
+        ):
+            logger.debug("sign_str: {}", payload)
+        return base64.b64encode(self.key.sign(payload.encode())).decode()
+
+    def headers(
+        self, instruction: str, params: Optional[dict | list[dict]] = None
+    ) -> dict:
+        timestamp = int(time.time() * 1000)
+        return {
+            **self._static_headers,
+            "X-Signature": self.sign(instruction, timestamp, params),
+            "X-Timestamp": str(timestamp),
+        }
+
+
+def benchmark(number: int = 10_000) -> dict[str, float]:
+    """Микробенчмарк: мкс на подпись для нового клиента и для горячего пути."""
+    secret = base64.b64encode(bytes(range(32))).decode()
+    params = {
+        "symbol": "SOL_USDC",
+        "side": "Bid",
+        "quantity": "1.5",
+        "postOnly": False,
+    }
+
+    def cold():
+        ed25519.Ed25519PrivateKey.from_private_bytes(base64.b64decode(secret))
+        RequestSigner("bench", secret).headers("orderExecute", params)
+
+    signer = RequestSigner("bench", secret)
+
+    def hot():
+        signer.headers("orderExecute", params)
+
+    return {
+        "cold_us": timeit.timeit(cold, number=number) / number * 1e6,
+        "hot_us": timeit.timeit(hot, number=number) / number * 1e6,
+        "sign_string_us": timeit.timeit(
+            lambda: sign_string("orderExecute", 1, params), number=number
+        )
+        / number
+        * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f"{name}: {value:.2f}")
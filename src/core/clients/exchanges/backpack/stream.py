@@ -0,0 +1,275 @@
+import asyncio
+import json
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable
+from decimal import Decimal
+from typing import Any, Optional
+
+from aiohttp import ClientSession, ClientTimeout, WSMsgType
+from loguru import logger
+
+from src.core.clients.metrics import STREAM_EVENTS, STREAM_RESYNCS
+
+WS_URL = "wss://ws.backpack.exchange"
+REST_URL = "https://api.backpack.exchange/"
+MAX_AGE_SEC = 5.0
+TRADES_KEPT = 100
+BUFFERED_DIFFS = 1000
+
+
+class OrderBook:
+    """
+    Локальный стакан символа: REST-снапшот + инкрементальные diff'ы из
+    depth-стрима. Diff'ы, пришедшие до снапшота, буферизуются; разрыв
+    последовательности (U != u_prev + 1) помечает стакан рассинхронизированным.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.asks: dict[str, str] = {}
+        self.bids: dict[str, str] = {}
+        self.last_update_id: Optional[int] = None
+        self.synced = False
+        self._buffer: deque = deque(maxlen=BUFFERED_DIFFS)
+        self._view: Optional[dict] = None
+
+    def reset(self) -> None:
+        self.asks.clear()
+        self.bids.clear()
+        self.last_update_id = None
+        self.synced = False
+        self._buffer.clear()
+        self._view = None
+
+    def load_snapshot(self, snapshot: dict) -> bool:
+        self.asks = {p: q for p, q in snapshot.get("asks", []) if Decimal(q) != 0}
+        self.bids = {p: q for p, q in snapshot.get("bids", []) if Decimal(q) != 0}
+        self.last_update_id = int(snapshot["lastUpdateId"])
+        self.synced = True
+        self._view = None
+
+        buffered, self._buffer = self._buffer, deque(maxlen=BUFFERED_DIFFS)
+        for event in buffered:
+            if int(event["u"]) <= self.last_update_id:
+                continue
+            if not self.apply(event):
+                return False
+        return True
+
+    def apply(self, event: dict) -> bool:
+        """Применить diff. Возвращает False, если обнаружен разрыв."""
+        if not self.synced:
+            self._buffer.append(event)
+            return True
+
+        first, last = int(event["U"]), int(event["u"])
+        if last <= self.last_update_id:
+            return True
+        if first > self.last_update_id + 1:
+            self.synced = False
+            return False
+
+        for side, levels in (
+            (self.asks, event.get("a", [])),
+            (self.bids, event.get("b", [])),
+        ):
+            for price, qty in levels:
+                if Decimal(qty) == 0:
+                    side.pop(price, None)
+                else:
+                    side[price] = qty
+        self.last_update_id = last
+        self._view = None
+        return True
+
+    def depth(self) -> dict:
+        """Стакан в формате REST api/v1/depth (обе стороны по возрастанию цены)."""
+        if self._view is None:
+            self._view = {
+                "asks": [[p, self.asks[p]] for p in sorted(self.asks, key=Decimal)],
+                "bids": [[p, self.bids[p]] for p in sorted(self.bids, key=Decimal)],
+                "lastUpdateId": str(self.last_update_id),
+            }
+        return self._view
+
+
+def _ticker_from_event(event: dict) -> dict:
+    first, last = Decimal(event["o"]), Decimal(event["c"])
+    change = last - first
+    percent = (change / first * 100) if first else Decimal(0)
+    return {
+        "symbol": event["s"],
+        "firstPrice": event["o"],
+        "lastPrice": event["c"],
+        "high": event["h"],
+        "low": event["l"],
+        "volume": event["v"],
+        "quoteVolume": event["V"],
+        "trades": str(event["n"]),
+        "priceChange": str(change),
+        "priceChangePercent": str(percent.quantize(Decimal("0.01"))),
+    }
+
+
+class BackpackMarketStream:
+    """
+    Стриминговый источник рыночных данных Backpack: подписывается на
+    depth/ticker/trade-стримы по символам и держит состояние в памяти,
+    так что стакан и тикеры читаются без сетевого запроса.
+    Данные считаются актуальными, пока соединение живо и стакан
+    синхронизирован; иначе lookup возвращает None и клиент идёт в REST.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        ws_url: str = WS_URL,
+        rest_url: str = REST_URL,
+        fetch_snapshot: Optional[Callable[[str], Awaitable[dict]]] = None,
+        max_age: float = MAX_AGE_SEC,
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.ws_url = ws_url
+        self.rest_url = rest_url
+        self.max_age = max_age
+        self._fetch_snapshot = fetch_snapshot or self._fetch_rest_snapshot
+        self.books = {s: OrderBook(s) for s in self.symbols}
+        self.tickers: dict[str, dict] = {}
+        self.trades: dict[str, deque] = {
+            s: deque(maxlen=TRADES_KEPT) for s in self.symbols
+        }
+        self._last_message = 0.0
+        self._session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._resyncs: dict[str, asyncio.Task] = {}
+
+    # ───────── чтение состояния ─────────
+    @property
+    def alive(self) -> bool:
+        return time.monotonic() - self._last_message < self.max_age
+
+    def get_order_book_depth(self, symbol: str) -> Optional[dict]:
+        book = self.books.get(symbol.upper())
+        if book is None or not book.synced or not self.alive:
+            return None
+        return book.depth()
+
+    def get_ticker(self, symbol: str) -> Optional[dict]:
+        if not self.alive:
+            return None
+        return self.tickers.get(symbol.upper())
+
+    def lookup(self, kind: str, key: Any) -> Optional[Any]:
+        """Точка входа для MarketDataCache: вернуть данные или None."""
+        if kind == "depth":
+            return self.get_order_book_depth(key)
+        if kind == "ticker":
+            return self.get_ticker(key)
+        return None
+
+    def merge_tickers(self, tickers: list[dict]) -> list[dict]:
+        """Подменить в REST-снимке тикеры подписанных символов свежими из стрима."""
+        if not self.alive or not self.tickers:
+            return tickers
+        return [self.tickers.get(t["symbol"], t) for t in tickers]
+
+    # ───────── жизненный цикл ─────────
+    async def start(self) -> None:
+        self._session = ClientSession(timeout=ClientTimeout(total=None, sock_read=30))
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        for task in [self._task, *self._resyncs.values()]:
+            if task is not None:
+                task.cancel()
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._session is not None:
+            await self._session.close()
+
+    async def run(self) -> None:
+        backoff = 1
+        while True:
+            try:
+                await self._consume()
+                backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Backpack stream disconnected: {}", e)
+            for book in self.books.values():
+                book.reset()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _consume(self) -> None:
+        streams = [
+            f"{kind}.{symbol}"
+            for symbol in self.symbols
+            for kind in ("depth", "ticker", "trade")
+        ]
+        async with self._session.ws_connect(self.ws_url, heartbeat=20) as ws:
+            await ws.send_json({"method": "SUBSCRIBE", "params": streams})
+            for symbol in self.symbols:
+                self._schedule_resync(symbol)
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    if msg.type in (WSMsgType.CLOSED, WSMsgType.ERROR):
+                        break
+                    continue
+                self.handle_message(json.loads(msg.data))
+
+    # ───────── обработка сообщений ─────────
+    def handle_message(self, message: dict) -> None:
+        self._last_message = time.monotonic()
+        event = message.get("data")
+        if not event:
+            return
+        kind = event.get("e")
+        symbol = event.get("s")
+        STREAM_EVENTS.labels(kind=kind or "unknown").inc()
+
+        if kind == "depth" and symbol in self.books:
+            if not self.books[symbol].apply(event):
+                logger.info("Depth gap for {}, resyncing", symbol)
+                self._schedule_resync(symbol)
+        elif kind == "ticker":
+            self.tickers[symbol] = _ticker_from_event(event)
+        elif kind == "trade" and symbol in self.trades:
+            self.trades[symbol].append(
+                {"price": event["p"], "quantity": event["q"], "timestamp": event["T"]}
+            )
+
+    def _schedule_resync(self, symbol: str) -> None:
+        task = self._resyncs.get(symbol)
+        if task is not None and not task.done():
+            return
+        self._resyncs[symbol] = asyncio.create_task(self._resync(symbol))
+
+    async def _resync(self, symbol: str) -> None:
+        STREAM_RESYNCS.labels(symbol=symbol).inc()
+        book = self.books[symbol]
+        book.reset()
+        try:
+            snapshot = await self._fetch_snapshot(symbol)
+        except Exception as e:
+            logger.warning("Depth snapshot for {} failed: {}", symbol, e)
+            await asyncio.sleep(1)
+            snapshot = None
+        if snapshot is None or not book.load_snapshot(snapshot):
+            # снапшот не получен или старше буфера diff'ов — пробуем ещё раз
+            self._resyncs.pop(symbol, None)
+            self._schedule_resync(symbol)
+
+    async def _fetch_rest_snapshot(self, symbol: str) -> dict[str, Any]:
+        async with self._session.get(
+            f"{self.rest_url}api/v1/depth",
+            params={"symbol": symbol},
+            timeout=ClientTimeout(total=10),
+        ) as resp:
+            resp.raise_for_status()
+            return await resp.json()
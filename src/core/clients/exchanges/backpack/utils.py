@@ -1,3 +1,4 @@
+import asyncio
 import random
 from decimal import Decimal, ROUND_DOWN
 
@@ -5,7 +6,15 @@ from loguru import logger
 from sqlalchemy import select
 
 from src.core.clients.databases.postgres import pg
-from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.clients.exchanges.backpack.backpack import (
+    BackpackExchangeClient,
+    order_params,
+)
+from src.core.clients.exchanges.backpack.valuation import (
+    exact_prices,
+    exact_total,
+    holdings,
+)
 from src.core.models import Account, Chain, Proxy, FakeHeader
 
 MIN_DEPOSIT_USD = Decimal("0.1")
@@ -41,7 +50,7 @@ async def _load_proxy_and_fake(account_id: int) -> tuple[str | None, dict, dict]
     proxy_url = None
     if proxy_obj:
         proxy_url = f"socks5://{proxy_obj.login}:{proxy_obj.password}@{proxy_obj.ip}:{proxy_obj.port}"
-        logger.info("Constructed proxy_url: {}", proxy_url)
+        logger.debug("Account {} uses proxy id={}", account_id, proxy_obj.id)
     headers = fake_obj.headers if fake_obj and fake_obj.headers else {}
     cookies = fake_obj.cookies if fake_obj and fake_obj.cookies else {}
     return proxy_url, headers, cookies
@@ -51,30 +60,13 @@ async def _compute_total_usd_balance(client: BackpackExchangeClient) -> Decimal:
     """
     Считаем общий USD-эквивалент баланса по всем активам на суб-акке.
     """
-    balance = await client.get_balance()
-    lend = await client.get_borrow_lend_positions()
-    tickers = await client.get_all_tickers()
-    prices = {t["symbol"]: Decimal(t["lastPrice"]) for t in tickers}
-
-    net_qty = {
-        p["symbol"].replace("_USDC", ""): Decimal(p.get("netQuantity", "0"))
-        for p in lend
-        if isinstance(p.get("netQuantity"), str)
-    }
-
-    total_usd = Decimal("0")
-    for token, data in balance.items():
-        available = Decimal(data.get("available", "0"))
-        qty = available + net_qty.get(token, Decimal("0"))
-        if qty <= 0:
-            continue
-        if token == "USDC":
-            total_usd += qty
-        else:
-            pair = f"{token}_USDC"
-            price = prices.get(pair) or prices.get(f"{pair}_PERP")
-            if price:
-                total_usd += qty * price
+    balance, lend, tickers = await asyncio.gather(
+        client.get_balance(),
+        client.get_borrow_lend_positions(),
+        client.get_tickers(),  # общий кэш тикеров, без запроса на аккаунт
+    )
+    # от суммы зависит объём ордеров — считаем в Decimal, не во float
+    total_usd = exact_total(holdings(balance, lend), exact_prices(tickers))
 
     logger.debug("Computed total USD balance = {}", total_usd)
     return total_usd
@@ -105,22 +97,22 @@ async def _top_up_sol(
     logger.info("Sub {}: withdrawal response: {}", sub_id, resp)
 
 
-async def _open_market_order(
+async def _market_order_params(
     client: BackpackExchangeClient,
     symbol: str,
     side: str,
     amount_usd: Decimal,
     pool_id: int,
     sub_id: int,
-) -> dict:
+) -> dict | None:
     """
-    Открывает маркет-фьючерс (symbol_PERP) по объему amount_usd.
+    Параметры маркет-ордера (symbol_PERP) на объём amount_usd по текущему стакану.
     """
     depth = await client.get_order_book_depth(symbol)
     book = depth.get("bids" if side == "Bid" else "asks", [])
     if not book:
         logger.error("Pool {} Sub {}: no book for {}", pool_id, sub_id, symbol)
-        return
+        return None
     price = Decimal(book[-1][0] if side == "Bid" else book[0][0])
     precision = abs(Decimal(book[0][1]).as_tuple().exponent)
     step = Decimal(f"1e-{precision}")
@@ -135,14 +127,34 @@ async def _open_market_order(
         qty,
         amount_usd,
     )
-    resp = await client.create_order(
-        symbol=symbol,
-        side=side,
-        quantity=str(qty),
-        order_type="Market",
+    return order_params(symbol, side, str(qty))
+
+
+async def _open_market_orders(
+    client: BackpackExchangeClient,
+    legs: dict[str, tuple[str, Decimal]],
+    pool_id: int,
+    sub_id: int,
+) -> dict[str, dict]:
+    """
+    Открывает несколько маркет-фьючерсов одним batch-запросом.
+    legs — {symbol: (side, amount_usd)}; возвращает {symbol: ответ по ордеру}.
+    """
+    params = await asyncio.gather(
+        *(
+            _market_order_params(client, symbol, side, amount, pool_id, sub_id)
+            for symbol, (side, amount) in legs.items()
+        )
     )
+    orders = [p for p in params if p is not None]
+    batch = await client.create_orders_batch(orders)
+
+    responses: dict[str, dict] = {}
+    for order, res in zip(orders, batch.results):
+        responses[order["symbol"]] = (
+            res.order if res.success else {"error": res.error}
+        )
     logger.info(
-        "Pool {} Sub {}: order response for {} -> {}", pool_id, sub_id, symbol, resp
+        "Pool {} Sub {}: batch order responses -> {}", pool_id, sub_id, responses
     )
-
-    return resp
+    return responses
@@ -0,0 +1,163 @@
+"""
+Оценка портфелей в USD: одна реализация для воркера пулов, стратегии и бота.
+
+Количества всех аккаунтов раскладываются в плоский array('d')
+(аккаунт × токен), цены — в массив по токенам из одного снимка тикеров,
+и стоимость считается одним проходом без запросов к бирже на токен.
+Значения во float: они нужны для ранжирования и отображения, а не для
+расчёта объёма ордеров. Там, где от суммы зависит объём ордера, — точная
+оценка в Decimal (exact_total по exact_prices).
+"""
+
+from array import array
+from collections.abc import Iterable, Mapping
+from decimal import Decimal
+from typing import Optional
+
+from src.core.clients.exchanges.backpack.schemas import (
+    BalancesResponse,
+    BorrowLendPositionsResponse,
+    TickersResponse,
+)
+
+QUOTE = "USDC"
+
+
+def holdings(
+    balances: BalancesResponse,
+    lend: Optional[BorrowLendPositionsResponse] = None,
+    include_locked: bool = False,
+) -> dict[str, Decimal]:
+    """Количество по токенам: available (+ locked/staked) + net borrow/lend."""
+    quantities: dict[str, Decimal] = {}
+    for token, balance in balances.balances.items():
+        qty = balance.available
+        if include_locked:
+            qty += balance.locked + balance.staked
+        quantities[token] = qty
+    for pos in lend.positions if lend else []:
+        token = pos.symbol.replace(f"_{QUOTE}", "")
+        quantities[token] = (
+            quantities.get(token, Decimal(0)) + pos.netExposureQuantity
+        )
+    return quantities
+
+
+def _ticker_prices(tickers: TickersResponse, convert) -> dict:
+    """Цена токена в USD из снимка тикеров: спот X_USDC, иначе X_USDC_PERP."""
+    spot, perp = {}, {}
+    for ticker in tickers.tickers:
+        base, _, rest = ticker.symbol.partition("_")
+        if rest == QUOTE:
+            spot[base] = convert(ticker.lastPrice)
+        elif rest == f"{QUOTE}_PERP":
+            perp[base] = convert(ticker.lastPrice)
+    return {**perp, **spot, QUOTE: convert("1")}
+
+
+def usd_prices(tickers: TickersResponse) -> dict[str, float]:
+    return _ticker_prices(tickers, float)
+
+
+def exact_prices(tickers: TickersResponse) -> dict[str, Decimal]:
+    return _ticker_prices(tickers, Decimal)
+
+
+def exact_total(
+    quantities: Mapping[str, Decimal], prices: Mapping[str, Decimal]
+) -> Decimal:
+    """
+    Точная стоимость портфеля для расчёта объёма ордеров: сумма
+    положительных позиций с известной ценой (заёмные не вычитаются).
+    """
+    return sum(
+        (
+            qty * prices[token]
+            for token, qty in quantities.items()
+            if qty > 0 and token in prices
+        ),
+        Decimal(0),
+    )
+
+
+class Valuation:
+    """
+    Результат оценки: quantities и values — row-major матрицы
+    len(account_ids) × len(tokens); токены без цены имеют стоимость 0.
+    """
+
+    def __init__(
+        self,
+        account_ids: list[int],
+        tokens: list[str],
+        quantities: array,
+        values: array,
+        priced: array,
+    ):
+        self.account_ids = account_ids
+        self.tokens = tokens
+        self.quantities = quantities
+        self.values = values
+        self.priced = priced  # 1 — у токена есть цена
+        self._rows = {aid: i for i, aid in enumerate(account_ids)}
+
+    def _row(self, account_id: int) -> range:
+        start = self._rows[account_id] * len(self.tokens)
+        return range(start, start + len(self.tokens))
+
+    def account_total(self, account_id: int) -> float:
+        return sum(self.values[i] for i in self._row(account_id))
+
+    def totals(self) -> dict[int, float]:
+        return {aid: self.account_total(aid) for aid in self.account_ids}
+
+    def positions(
+        self,
+        account_id: int,
+        exclude: Iterable[str] = (),
+        include_negative: bool = False,
+    ) -> list[tuple[str, float, float]]:
+        """
+        (token, quantity, usd) с известной ценой и положительным (или, при
+        include_negative, любым ненулевым) количеством, по убыванию стоимости.
+        """
+        skip = set(exclude)
+        result = [
+            (token, self.quantities[i], self.values[i])
+            for j, (token, i) in enumerate(zip(self.tokens, self._row(account_id)))
+            if token not in skip
+            and self.priced[j]
+            and (self.quantities[i] > 0 or include_negative and self.quantities[i])
+        ]
+        result.sort(key=lambda x: x[2], reverse=True)
+        return result
+
+    def token_totals(self) -> dict[str, float]:
+        """Суммарная стоимость каждого токена по всем аккаунтам."""
+        width = len(self.tokens)
+        sums = array("d", bytes(8 * width))
+        for i, value in enumerate(self.values):
+            sums[i % width] += value
+        return dict(zip(self.tokens, sums))
+
+
+def value_portfolios(
+    portfolios: Mapping[int, Mapping[str, Decimal]],
+    prices: Mapping[str, float],
+) -> Valuation:
+    """Оценить {account_id: {token: qty}} по одному снимку цен."""
+    account_ids = list(portfolios)
+    tokens = sorted({token for p in portfolios.values() for token in p})
+    index = {token: j for j, token in enumerate(tokens)}
+    width = len(tokens)
+
+    price_row = array("d", (prices.get(token, 0.0) for token in tokens))
+    priced = array("b", (token in prices for token in tokens))
+    quantities = array("d", bytes(8 * width * len(account_ids)))
+    for row, aid in enumerate(account_ids):
+        base = row * width
+        for token, qty in portfolios[aid].items():
+            quantities[base + index[token]] = float(qty)
+
+    values = array("d", (q * price_row[i % width] for i, q in enumerate(quantities)))
+    return Valuation(account_ids, tokens, quantities, values, priced)
@@ -1,6 +1,6 @@
 import time
 from functools import wraps
-from prometheus_client import start_http_server, Counter, Histogram
+from prometheus_client import start_http_server, Counter, Histogram, Gauge
 from prometheus_client import Summary, Counter
 
 # TODO переделать
@@ -16,6 +16,64 @@ REQUEST_COUNT = Counter(
     ["instruction", "method"],
 )
 
+SESSION_POOL_HITS = Counter(
+    "backpack_session_pool_hits_total",
+    "Запросы, обслуженные уже открытой HTTP-сессией прокси",
+)
+
+SESSION_POOL_MISSES = Counter(
+    "backpack_session_pool_misses_total",
+    "Запросы, для которых пришлось открыть новую HTTP-сессию",
+)
+
+SESSION_POOL_SIZE = Gauge(
+    "backpack_session_pool_size",
+    "Количество открытых HTTP-сессий в пуле",
+)
+
+CLIENT_CACHE_REQUESTS = Counter(
+    "backpack_client_cache_requests_total",
+    "Обращения к кэшу клиентов Backpack по account_id",
+    ["result"],  # hit | miss
+)
+
+MARKET_DATA_REQUESTS = Counter(
+    "backpack_market_data_requests_total",
+    "Обращения к кэшу рыночных данных",
+    ["kind", "result"],  # result: stream | hit | miss | coalesced
+)
+
+STREAM_EVENTS = Counter(
+    "backpack_stream_events_total",
+    "События, полученные из WebSocket-стрима Backpack",
+    ["kind"],
+)
+
+STREAM_RESYNCS = Counter(
+    "backpack_stream_resyncs_total",
+    "Пересинхронизации локального стакана по REST-снапшоту",
+    ["symbol"],
+)
+
+MARKET_DATA_FETCH_LATENCY = Histogram(
+    "backpack_market_data_fetch_seconds",
+    "Время загрузки рыночных данных при промахе кэша",
+    ["kind"],
+)
+
+RATE_LIMIT_WAIT = Histogram(
+    "backpack_rate_limit_wait_seconds",
+    "Время ожидания токена в клиентском rate limiter",
+    ["endpoint_class"],
+    buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+RATE_LIMITED_RESPONSES = Counter(
+    "backpack_rate_limited_responses_total",
+    "Ответы 429 от Backpack",
+    ["endpoint_class"],
+)
+
 
 class PrometheusClient:
     def __init__(self):
@@ -0,0 +1,333 @@
+"""
+Общий отправщик уведомлений в Telegram (воркеры подарков и NFT).
+
+notify() только ставит сообщение в очередь чата и в spool на диске —
+сканирование рынка не ждёт Telegram. Отправку делает фоновая задача на
+каждый чат через одну keep-alive сессию:
+  • не чаще одного сообщения в chat_interval секунд на чат; ответ 429
+    сдвигает следующую отправку на parameters.retry_after;
+  • всё, что накопилось в очереди чата за время ожидания, уходит одним
+    дайджестом (до MAX_TEXT символов, остаток — следующим сообщением);
+    если Telegram отверг дайджест (4xx, например битый HTML в одном
+    уведомлении), его уведомления досылаются по одному — теряется только
+    битое;
+  • spool — JSONL (add/done), при старте неотправленное поднимается заново,
+    так что алерты переживают рестарт процесса.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout
+from loguru import logger
+from prometheus_client import Counter, Gauge
+
+API_URL = "https://api.telegram.org/bot{token}/{method}"
+SPOOL_DIR = os.getenv("TELEGRAM_SPOOL_DIR", "spool")
+# Telegram: ~20 сообщений в минуту в группу
+CHAT_INTERVAL_SEC = float(os.getenv("TELEGRAM_CHAT_INTERVAL_SEC", "3"))
+MAX_TEXT = 4096
+MAX_ATTEMPTS = 5
+RETRY_LATER_SEC = 30
+COMPACT_EVERY = 500  # done-записей до перезаписи spool
+
+NOTIFY_SENT = Counter(
+    "telegram_notifications_sent_total",
+    "Telegram messages delivered by the notifier",
+    ["kind"],
+)
+NOTIFY_FAILED = Counter(
+    "telegram_notifications_failed_total",
+    "Notifications dropped after a permanent error or too many attempts",
+)
+NOTIFY_RATE_LIMITED = Counter(
+    "telegram_notifications_rate_limited_total", "429 responses from Telegram"
+)
+NOTIFY_QUEUED = Gauge(
+    "telegram_notifications_queued", "Notifications waiting to be sent"
+)
+
+
+class _Spool:
+    """Журнал неотправленных уведомлений: строки {"op": "add"|"done", ...}."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+        self._done = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> list[dict]:
+        if self.path is None or not self.path.exists():
+            return []
+        pending: dict[str, dict] = {}
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # недописанная строка при падении процесса
+            if entry.get("op") == "add":
+                pending[entry["id"]] = entry["item"]
+            else:
+                pending.pop(entry.get("id"), None)
+        self.rewrite(pending.values())
+        return list(pending.values())
+
+    def _append(self, entry: dict) -> None:
+        if self.path is None:
+            return
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def add(self, item: dict) -> None:
+        self._append({"op": "add", "id": item["id"], "item": item})
+
+    def done(self, item_ids, pending) -> None:
+        for item_id in item_ids:
+            self._append({"op": "done", "id": item_id})
+        self._done += len(item_ids)
+        if self._done >= COMPACT_EVERY:
+            self.rewrite(pending)
+
+    def rewrite(self, items) -> None:
+        if self.path is None:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for item in items:
+                f.write(
+                    json.dumps(
+                        {"op": "add", "id": item["id"], "item": item},
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+        tmp.replace(self.path)
+        self._done = 0
+
+
+def compose_digest(batch: list[dict]) -> tuple[str, int]:
+    """
+    Текст дайджеста и число вошедших в него уведомлений (не меньше одного;
+    слишком длинное одиночное обрезается до MAX_TEXT).
+    """
+    header = f"🔔 {len(batch)} уведомлений\n\n"
+    parts, used, size = [], 0, len(header)
+    for item in batch:
+        text = item["text"]
+        if item.get("photo_url"):
+            text += f'\n📷 <a href="{item["photo_url"]}">[open image]</a>'
+        if parts and size + len(text) + 2 > MAX_TEXT:
+            break
+        parts.append(text)
+        size += len(text) + 2
+        used += 1
+    if used > 1:
+        header = f"🔔 {used} уведомлений\n\n"
+        return header + "\n\n".join(parts), used
+    return parts[0][:MAX_TEXT], 1
+
+
+class TelegramNotifier:
+    def __init__(
+        self,
+        token: str,
+        spool_path: Optional[str] = None,
+        chat_interval: float = CHAT_INTERVAL_SEC,
+        api_url: str = API_URL,
+    ):
+        self.token = token
+        self.chat_interval = chat_interval
+        self.api_url = api_url
+        self._spool = _Spool(spool_path)
+        self._queues: dict[int | str, deque] = {}
+        self._wakeups: dict[int | str, asyncio.Event] = {}
+        self._senders: dict[int | str, asyncio.Task] = {}
+        self._next_send: dict[int | str, float] = {}
+        self._session: Optional[ClientSession] = None
+
+    @classmethod
+    def for_service(cls, service: str, token: str, **kwargs) -> "TelegramNotifier":
+        return cls(token, spool_path=f"{SPOOL_DIR}/{service}.jsonl", **kwargs)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    # ───────── постановка в очередь ─────────
+    def notify(
+        self, chat_id: int | str, text: str, photo_url: Optional[str] = None
+    ) -> None:
+        item = {
+            "id": uuid.uuid4().hex,
+            "chat_id": chat_id,
+            "text": text,
+            "photo_url": photo_url,
+            "created": time.time(),
+        }
+        self._spool.add(item)
+        self._enqueue(item)
+
+    def _enqueue(self, item: dict) -> None:
+        chat_id = item["chat_id"]
+        self._queues.setdefault(chat_id, deque()).append(item)
+        self._wakeups.setdefault(chat_id, asyncio.Event()).set()
+        NOTIFY_QUEUED.set(self.queued)
+        if self._session is not None and chat_id not in self._senders:
+            self._senders[chat_id] = asyncio.create_task(self._sender(chat_id))
+
+    # ───────── жизненный цикл ─────────
+    async def start(self) -> None:
+        self._session = ClientSession(timeout=ClientTimeout(total=20))
+        queued = {item["id"] for q in self._queues.values() for item in q}
+        restored = [item for item in self._spool.load() if item["id"] not in queued]
+        if restored:
+            logger.info("Restored {} notifications from spool", len(restored))
+        for item in restored:
+            self._enqueue(item)
+        for chat_id in self._queues:
+            if chat_id not in self._senders:
+                self._senders[chat_id] = asyncio.create_task(self._sender(chat_id))
+
+    async def stop(self, drain_timeout: float = 5) -> None:
+        """Дать очередям досылаться drain_timeout секунд; остаток — в spool."""
+        deadline = time.monotonic() + drain_timeout
+        while self.queued and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._senders.values():
+            task.cancel()
+        await asyncio.gather(*self._senders.values(), return_exceptions=True)
+        self._senders.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ───────── отправка ─────────
+    async def _sender(self, chat_id: int | str) -> None:
+        queue, wakeup = self._queues[chat_id], self._wakeups[chat_id]
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            delay = self._next_send.get(chat_id, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)  # пока ждём — очередь копится
+            batch = list(queue)
+            try:
+                used = await self._deliver(chat_id, batch)
+            except Exception as e:
+                logger.exception("Notifier failed for chat {}: {}", chat_id, e)
+                used = 1
+                NOTIFY_FAILED.inc()
+            self._next_send[chat_id] = max(
+                self._next_send.get(chat_id, 0), time.monotonic() + self.chat_interval
+            )
+            if not used:
+                continue  # 429: повтор после retry_after
+            sent = [queue.popleft()["id"] for _ in range(used)]
+            self._spool.done(sent, [i for q in self._queues.values() for i in q])
+            NOTIFY_QUEUED.set(self.queued)
+
+    async def _deliver(self, chat_id: int | str, batch: list[dict]) -> int:
+        """
+        Отправить одиночное сообщение или дайджест; вернуть число
+        обработанных уведомлений с начала batch (доставленных или отброшенных).
+        """
+        first = batch[0]
+        if len(batch) == 1 and first.get("photo_url"):
+            status = await self._call(
+                "sendPhoto",
+                chat_id=chat_id,
+                photo=first["photo_url"],
+                caption=first["text"],
+                parse_mode="HTML",
+            )
+            if status is None:
+                return 0
+            if status:
+                NOTIFY_SENT.labels(kind="photo").inc()
+                return 1
+            logger.warning("Photo rejected for chat {}, sending text", chat_id)
+
+        text, used = compose_digest(batch)
+        status = await self._send_text(chat_id, text)
+        if status is None:
+            return 0
+        if status:
+            NOTIFY_SENT.labels(kind="digest" if used > 1 else "message").inc()
+            return used
+        if used == 1:
+            NOTIFY_FAILED.inc()
+            return 1
+        logger.warning(
+            "Digest rejected for chat {}, sending {} items one by one", chat_id, used
+        )
+        return await self._deliver_each(chat_id, batch[:used])
+
+    async def _deliver_each(self, chat_id: int | str, items: list[dict]) -> int:
+        """Отправить уведомления по одному; вернуть число обработанных подряд."""
+        for done, item in enumerate(items):
+            if done:
+                await asyncio.sleep(self.chat_interval)
+            status = await self._send_text(chat_id, compose_digest([item])[0])
+            if status is None:
+                return done  # 429/сеть: остаток — следующей попыткой
+            if status:
+                NOTIFY_SENT.labels(kind="message").inc()
+            else:
+                NOTIFY_FAILED.inc()
+        return len(items)
+
+    async def _send_text(self, chat_id: int | str, text: str) -> Optional[bool]:
+        return await self._call(
+            "sendMessage",
+            chat_id=chat_id,
+            text=text,
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+        )
+
+    async def _call(self, method: str, **payload) -> Optional[bool]:
+        """
+        True — доставлено, False — постоянная ошибка (4xx), None — отложено:
+        после 429 следующая попытка не раньше retry_after, после MAX_ATTEMPTS
+        сетевых ошибок/5xx — через RETRY_LATER_SEC (уведомление остаётся
+        в очереди и spool).
+        """
+        url = self.api_url.format(token=self.token, method=method)
+        chat_id = payload["chat_id"]
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                async with self._session.post(url, json=payload) as resp:
+                    data = await resp.json(content_type=None)
+            except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning("Telegram {} failed: {}", method, e)
+            else:
+                if resp.status == 200 and data.get("ok"):
+                    return True
+                if resp.status == 429:
+                    NOTIFY_RATE_LIMITED.inc()
+                    retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+                    self._next_send[chat_id] = time.monotonic() + float(retry_after)
+                    logger.warning(
+                        "Telegram rate limit for chat {}: retry in {}s",
+                        chat_id,
+                        retry_after,
+                    )
+                    return None
+                if resp.status < 500:
+                    logger.error(
+                        "Telegram {} error {}: {}", method, resp.status, data
+                    )
+                    return False
+                logger.warning("Telegram {} error {}", method, resp.status)
+            await asyncio.sleep(min(2**attempt, RETRY_LATER_SEC))
+        self._next_send[chat_id] = time.monotonic() + RETRY_LATER_SEC
+        return None
@@ -2,6 +2,8 @@ from .base import Base
 from .pool import Pool, PoolAccountLink
 from .account import Account, DepositAddress, FakeHeader, Proxy
 from .user import User, UserAccountLink, UserFriend
+from .balance import BalanceSnapshot
+from .order import OrderLedgerEntry, OrderStatus
 from .enums import Chain
 
 __all__ = (
@@ -16,4 +18,7 @@ __all__ = (
     "UserAccountLink",
     "Chain",
     "UserFriend",
+    "BalanceSnapshot",
+    "OrderLedgerEntry",
+    "OrderStatus",
 )
@@ -9,8 +9,11 @@ from sqlalchemy import (
     String,
     DateTime,
     Boolean,
+    Float,
     ForeignKey,
+    Index,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.dialects.postgresql import ENUM, JSONB, JSON
 from sqlalchemy.orm import relationship
@@ -62,6 +65,13 @@ class Account(Base):
 
 class Proxy(Base):
     __tablename__ = "proxies"
+    __table_args__ = (
+        Index(
+            "ix_proxies_free_country",
+            "country",
+            postgresql_where=text("NOT in_use"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     account_id = Column(Integer, ForeignKey("accounts.id", ondelete="SET NULL"))
@@ -72,10 +82,19 @@ class Proxy(Base):
     country = Column(String, nullable=False)
 
     in_use = Column(Boolean, default=False, nullable=False)
+    # подряд идущие неудачные проверки (сбрасывается успешной)
     fails = Column(Integer, default=0, nullable=False)
+    # EWMA задержки и доли ошибок по результатам проверок proxy-prober
+    latency_ms = Column(Float, nullable=True)
+    error_rate = Column(Float, default=0.0, server_default="0", nullable=False)
+    checked_at = Column(DateTime(timezone=True), nullable=True)
 
     account = relationship("Account", back_populates="proxy", uselist=False)
 
+    @property
+    def url(self) -> str:
+        return f"socks5://{self.login}:{self.password}@{self.ip}:{self.port}"
+
 
 class FakeHeader(Base):
     __tablename__ = "fake_headers"
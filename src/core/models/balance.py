@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+)
+
+from src.core.models.base import Base
+
+
+class BalanceSnapshot(Base):
+    """
+    Снимок баланса аккаунта: одна строка на токен, все строки одного
+    прохода воркера имеют общий taken_at.
+    """
+
+    __tablename__ = "balance_snapshots"
+    __table_args__ = (
+        Index("ix_balance_snapshots_account_taken", "account_id", "taken_at"),
+        Index("ix_balance_snapshots_taken", "taken_at"),  # для очистки
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    account_id = Column(
+        Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False
+    )
+    symbol = Column(String, nullable=False)
+    quantity = Column(Numeric, nullable=False)
+    usd_value = Column(Float, nullable=False)
+    taken_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from enum import StrEnum
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+)
+
+from src.core.models.base import Base
+
+
+class OrderStatus(StrEnum):
+    PENDING = "pending"  # отправлен, ответ не получен (таймаут/обрыв)
+    REJECTED = "rejected"  # биржа отказала — ордера нет
+    # остальные значения — статусы Backpack: New, Filled, Cancelled, ...
+
+
+class OrderLedgerEntry(Base):
+    """
+    Журнал ордеров: одна строка на намерение (account_id + clientId).
+    clientId детерминирован по намерению, поэтому повторная отправка
+    того же намерения находит уже существующую строку.
+    """
+
+    __tablename__ = "order_ledger"
+    __table_args__ = (
+        UniqueConstraint("account_id", "client_id", name="uq_order_ledger_client"),
+        Index("ix_order_ledger_pool_created", "pool_id", "created_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    account_id = Column(
+        Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False
+    )
+    pool_id = Column(Integer, ForeignKey("pools.id", ondelete="SET NULL"))
+    client_id = Column(BigInteger, nullable=False)
+    intent = Column(String, nullable=False)
+    symbol = Column(String, nullable=False)
+    side = Column(String, nullable=False)
+    order_type = Column(String, nullable=False)
+    quantity = Column(Numeric, nullable=False)
+    price = Column(Numeric)
+    status = Column(String, nullable=False, default=OrderStatus.PENDING.value)
+    order_id = Column(String)
+    executed_quantity = Column(Numeric)
+    executed_quote_quantity = Column(Numeric)
+    error = Column(String)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
@@ -1,12 +1,13 @@
 from collections.abc import Iterable
-from sqlalchemy import select, or_
+from pydantic import BaseModel, Field
+from sqlalchemy import insert, select, or_, update
 from sqlalchemy.orm import joinedload
 
 from src.exceptions import NoFreeProxy, ParentAccountNotFound
 from src.constants import METRICS_DB_PREFIX
 from src.core.clients.databases.postgres import pg
 from src.core.clients.metrics import metrics
-from src.core.models import Account, UserFriend, DepositAddress
+from src.core.models import Account, Chain, UserFriend, DepositAddress
 
 
 from sqlalchemy import select, or_
@@ -15,10 +16,12 @@ from src.core.clients.databases.postgres import pg
 from src.core.clients.metrics import metrics
 from src.core.models import Account
 from typing import Optional, Tuple, Dict
-from sqlalchemy import select
+from sqlalchemy import and_, select
 from src.core.models import Proxy, FakeHeader, Account
 from src.core.clients.databases.postgres import pg
 from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.clients.exchanges.backpack.cache import clients
+from src.core.repositories import proxy_allocator
 from loguru import logger
 
 
@@ -152,7 +155,8 @@ async def delete_by_api_or_name(ident: str) -> Account | None:
             return None
         await s.delete(acc)
         await s.commit()
-        return acc
+    clients.invalidate(acc.id)
+    return acc
 
 
 @metrics.track(prefix=METRICS_DB_PREFIX)
@@ -189,17 +193,10 @@ async def add_account_full(
         s.add_all([fake_header, deposit])
 
         # 3) взять proxy
-        proxy = await s.scalar(
-            select(Proxy)
-            .where(Proxy.country == account.country, Proxy.in_use.is_(False))
-            .limit(1)
-        )
+        proxy = await proxy_allocator.claim_proxy(s, account.id, account.country)
         if not proxy:
             raise NoFreeProxy(account.country)
 
-        proxy.account_id = account.id
-        proxy.in_use = True
-
         await s.commit()
         return proxy
 
@@ -218,45 +215,335 @@ async def get_backpack_client_by_account_id(
     account_id: int,
 ) -> Optional[BackpackExchangeClient]:
     """
-    Загружает аккаунт, активный прокси, fake headers и cookies для account_id и
-    возвращает настроенный клиент BackpackExchangeClient.
+    Возвращает настроенный BackpackExchangeClient для account_id
+    (активный прокси, fake headers и cookies) из кэша клиентов; при промахе
+    загружает аккаунт вместе с прокси и заголовками одним запросом.
     Если аккаунт не найден — возвращает None.
     """
-    # получаем аккаунт
-    async with pg.session_maker() as session:
-        account = await session.scalar(select(Account).where(Account.id == account_id))
-        if not account:
-            logger.warning("Account %s not found", account_id)
-            return None
+    client = clients.get(account_id)
+    if client is not None:
+        return client
 
-        # proxy
-        proxy_obj = await session.scalar(
-            select(Proxy).where(
-                Proxy.account_id == account_id,
-                Proxy.in_use.is_(True),
-            )
-        )
-        proxy_url = None
-        if proxy_obj:
-            proxy_url = (
-                f"socks5://{proxy_obj.login}:{proxy_obj.password}@"
-                f"{proxy_obj.ip}:{proxy_obj.port}"
+    async with pg.session_maker() as session:
+        row = (
+            await session.execute(
+                select(Account, Proxy, FakeHeader)
+                .outerjoin(
+                    Proxy,
+                    and_(Proxy.account_id == Account.id, Proxy.in_use.is_(True)),
+                )
+                .outerjoin(FakeHeader, FakeHeader.account_id == Account.id)
+                .where(Account.id == account_id)
+                .limit(1)
             )
-            logger.debug("Using proxy_url %s for account %s", proxy_url, account_id)
+        ).first()
+    if row is None:
+        logger.warning("Account {} not found", account_id)
+        return None
+
+    client = build_backpack_client(*row)
+    clients.put(account_id, client)
+    return client
 
-        # fake headers / cookies
-        fake_obj = await session.scalar(
-            select(FakeHeader).where(FakeHeader.account_id == account_id)
-        )
-        fake_headers = fake_obj.headers if fake_obj and fake_obj.headers else {}
-        cookies = fake_obj.cookies if fake_obj and fake_obj.cookies else {}
 
-    # создаём клиента
-    client = BackpackExchangeClient(
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def get_backpack_clients(
+    account_ids: Iterable[int],
+) -> dict[int, BackpackExchangeClient]:
+    """
+    Клиенты для набора аккаунтов: из кэша, а промахи — одним запросом
+    (аккаунт + активный прокси + заголовки). Ненайденные аккаунты пропускаются.
+    """
+    result: dict[int, BackpackExchangeClient] = {}
+    missing = []
+    for account_id in account_ids:
+        client = clients.get(account_id)
+        if client is not None:
+            result[account_id] = client
+        else:
+            missing.append(account_id)
+    if not missing:
+        return result
+
+    async with pg.session_maker() as session:
+        rows = await session.execute(
+            select(Account, Proxy, FakeHeader)
+            .outerjoin(
+                Proxy,
+                and_(Proxy.account_id == Account.id, Proxy.in_use.is_(True)),
+            )
+            .outerjoin(FakeHeader, FakeHeader.account_id == Account.id)
+            .where(Account.id.in_(missing))
+        )
+        for account, proxy_obj, fake_obj in rows:
+            if account.id in result:
+                continue
+            client = build_backpack_client(account, proxy_obj, fake_obj)
+            clients.put(account.id, client)
+            result[account.id] = client
+    return result
+
+
+def build_backpack_client(
+    account: Account, proxy_obj: Optional[Proxy], fake_obj: Optional[FakeHeader]
+) -> BackpackExchangeClient:
+    """Собрать клиента из уже загруженных аккаунта, прокси и заголовков."""
+    return BackpackExchangeClient(
         api_key=account.api_key,
         api_secret=account.api_secret,
-        proxy_url=proxy_url,
-        fake_headers=fake_headers,
-        cookies=cookies,
+        proxy_url=proxy_obj.url if proxy_obj else None,
+        fake_headers=fake_obj.headers if fake_obj and fake_obj.headers else {},
+        cookies=fake_obj.cookies if fake_obj and fake_obj.cookies else {},
     )
-    return client
+
+
+class AccountImportRow(BaseModel):
+    """Строка CSV-импорта (номер строки нужен для отчёта)."""
+
+    line: int
+    name: str
+    api_key: str
+    api_secret: str
+    country: str
+    deposit_address: str
+    parent: str | None = None
+    headers: dict = Field(default_factory=dict)
+    cookies: dict = Field(default_factory=dict)
+
+
+class AccountImportResult(BaseModel):
+    line: int
+    name: str
+    ok: bool
+    error: str | None = None
+
+
+def _ident_map(rows: list[AccountImportRow]) -> dict[str, AccountImportRow]:
+    """Имя и api_key -> строка; при повторе побеждает первая строка файла."""
+    by_ident: dict[str, AccountImportRow] = {}
+    for r in rows:
+        by_ident.setdefault(r.name, r)
+        by_ident.setdefault(r.api_key, r)
+    return by_ident
+
+
+def _duplicate_errors(rows: list[AccountImportRow]) -> dict[int, str]:
+    """
+    Повторы внутри файла: имя, API-ключ (они же ссылки на родителя — ищутся
+    в одном пространстве) и адрес депозита. Первая строка остаётся, все
+    следующие с тем же значением отклоняются.
+    """
+    errors: dict[int, str] = {}
+    idents: set[str] = set()
+    addresses: set[str] = set()
+    for r in rows:
+        if r.name in idents:
+            errors[r.line] = "имя повторяется в файле"
+        elif r.api_key in idents:
+            errors[r.line] = "API-ключ повторяется в файле"
+        elif r.deposit_address in addresses:
+            errors[r.line] = "адрес депозита повторяется в файле"
+        idents.update((r.name, r.api_key))
+        addresses.add(r.deposit_address)
+    return errors
+
+
+def _import_depths(rows: list[AccountImportRow]) -> dict[int, int]:
+    """
+    Глубина строки в дереве родителей внутри файла: 0 — родителя нет в файле,
+    1 — родитель тоже в файле и т.д. Строки в цикле получают -1. Ссылка на
+    повторяющееся имя/ключ ведёт на первую строку (как в _ident_map).
+    """
+    by_ident = _ident_map(rows)
+
+    depths: dict[int, int] = {}
+
+    def depth(r: AccountImportRow, visiting: frozenset[int]) -> int:
+        if r.line in depths:
+            return depths[r.line]
+        parent = by_ident.get(r.parent) if r.parent else None
+        visiting = visiting | {r.line}
+        if parent is None:
+            d = 0
+        elif parent.line in visiting:
+            d = -1
+        else:
+            parent_depth = depth(parent, visiting)
+            d = -1 if parent_depth < 0 else parent_depth + 1
+        depths[r.line] = d
+        return d
+
+    for r in rows:
+        depth(r, frozenset())
+    return depths
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def import_accounts_bulk(
+    rows: list[AccountImportRow],
+    *,
+    owner_tid: int,
+    exchange: str,
+) -> list[AccountImportResult]:
+    """
+    Пакетный импорт аккаунтов одной транзакцией:
+      • повторы внутри файла отклоняются построчно (первая строка остаётся),
+        занятые имена/ключи/адреса и родители проверяются IN-запросами;
+      • прокси выделяются одним запросом на страну (FOR UPDATE SKIP LOCKED);
+      • accounts, fake_headers и deposit_addresses вставляются multi-row
+        insert'ами (родители из того же файла — раньше детей).
+    Возвращает результат по каждой строке; строки с ошибками пропускаются,
+    остальные сохраняются атомарно.
+    """
+    errors = _duplicate_errors(rows)
+    depths = _import_depths(rows)
+    batch_idents = _ident_map(rows)
+    seen_names = {r.name for r in rows}
+    seen_keys = {r.api_key for r in rows}
+    seen_addresses = {r.deposit_address for r in rows}
+
+    async with pg.session_maker() as s:
+        existing_names = set(
+            await s.scalars(select(Account.name).where(Account.name.in_(seen_names)))
+        )
+        existing_keys = set(
+            await s.scalars(
+                select(Account.api_key).where(Account.api_key.in_(seen_keys))
+            )
+        )
+        existing_addresses = set(
+            await s.scalars(
+                select(DepositAddress.address).where(
+                    DepositAddress.chain == Chain.SOLANA,
+                    DepositAddress.address.in_(seen_addresses),
+                )
+            )
+        )
+        parent_idents = {r.parent for r in rows if r.parent}
+        parent_ids: dict[str, int] = {}
+        if parent_idents:
+            for acc_id, name, api_key in await s.execute(
+                select(Account.id, Account.name, Account.api_key).where(
+                    or_(
+                        Account.name.in_(parent_idents),
+                        Account.api_key.in_(parent_idents),
+                    )
+                )
+            ):
+                parent_ids[name] = parent_ids[api_key] = acc_id
+
+        ordered = sorted(rows, key=lambda r: depths[r.line])
+        for r in ordered:
+            if r.line in errors:
+                continue
+            if r.name in existing_names:
+                errors[r.line] = "аккаунт с таким именем уже есть"
+            elif r.api_key in existing_keys:
+                errors[r.line] = "аккаунт с таким API-ключом уже есть"
+            elif r.deposit_address in existing_addresses:
+                errors[r.line] = "адрес депозита уже используется"
+            elif depths[r.line] < 0:
+                errors[r.line] = "циклическая ссылка на родителя"
+            elif (
+                r.parent
+                and r.parent not in parent_ids
+                and r.parent not in batch_idents
+            ):
+                errors[r.line] = f"родитель {r.parent} не найден"
+
+        # прокси: один блокирующий запрос на страну
+        need: dict[str, int] = {}
+        for r in ordered:
+            if r.line not in errors:
+                need[r.country] = need.get(r.country, 0) + 1
+        free: dict[str, list[int]] = {}
+        for country, count in need.items():
+            free[country] = await proxy_allocator.lock_free_proxies(s, country, count)
+
+        def batch_parent(r: AccountImportRow) -> AccountImportRow | None:
+            if not r.parent or r.parent in parent_ids:
+                return None
+            return batch_idents[r.parent]
+
+        # по глубине: родитель из файла обработан раньше своих детей
+        proxy_for: dict[int, int] = {}
+        for r in ordered:
+            if r.line in errors:
+                continue
+            parent_row = batch_parent(r)
+            if parent_row is not None and parent_row.line in errors:
+                errors[r.line] = f"родитель {r.parent} не импортирован"
+            elif not free[r.country]:
+                errors[r.line] = f"нет свободных прокси ({r.country})"
+            else:
+                proxy_for[r.line] = free[r.country].pop(0)
+
+        to_insert = [r for r in ordered if r.line not in errors]
+        account_ids: dict[int, int] = {}
+        for depth in sorted({depths[r.line] for r in to_insert}):
+            level = [r for r in to_insert if depths[r.line] == depth]
+            inserted = await s.execute(
+                insert(Account).returning(Account.id, Account.name),
+                [
+                    {
+                        "name": r.name,
+                        "api_key": r.api_key,
+                        "api_secret": r.api_secret,
+                        "exchange": exchange,
+                        "country": r.country,
+                        "owner_tid": owner_tid,
+                        "parent_id": (
+                            account_ids[batch_parent(r).line]
+                            if batch_parent(r)
+                            else parent_ids.get(r.parent)
+                        ),
+                    }
+                    for r in level
+                ],
+            )
+            ids_by_name = {name: acc_id for acc_id, name in inserted}
+            for r in level:
+                account_ids[r.line] = ids_by_name[r.name]
+
+        if to_insert:
+            await s.execute(
+                insert(FakeHeader),
+                [
+                    {
+                        "account_id": account_ids[r.line],
+                        "headers": r.headers,
+                        "cookies": r.cookies,
+                    }
+                    for r in to_insert
+                ],
+            )
+            await s.execute(
+                insert(DepositAddress),
+                [
+                    {
+                        "account_id": account_ids[r.line],
+                        "chain": Chain.SOLANA,
+                        "address": r.deposit_address,
+                    }
+                    for r in to_insert
+                ],
+            )
+            await s.execute(
+                update(Proxy),
+                [
+                    {
+                        "id": proxy_for[r.line],
+                        "account_id": account_ids[r.line],
+                        "in_use": True,
+                    }
+                    for r in to_insert
+                ],
+            )
+        await s.commit()
+
+    return [
+        AccountImportResult(
+            line=r.line, name=r.name, ok=r.line not in errors, error=errors.get(r.line)
+        )
+        for r in rows
+    ]
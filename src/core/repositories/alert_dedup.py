@@ -0,0 +1,76 @@
+"""
+Дедупликация алертов маркетплейсов (Tonnel, Portals) между рестартами.
+
+Отправленный алерт — ключ `alerts:seen:<marketplace>:<item_id>` в Redis
+с TTL (SET NX EX, так что две реплики не отправят один алерт дважды).
+Перед Redis стоит локальный LRU ограниченного размера: повторные проверки
+уже виденных лотов на каждом проходе не ходят в сеть. Если Redis
+недоступен, дедупликация временно работает только по LRU.
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+from loguru import logger
+
+import src.settings as settings
+from src.core.clients.databases.redis import redis
+
+SEEN_KEY = "alerts:seen:{marketplace}:{item_id}"
+
+
+class AlertDedup:
+    def __init__(
+        self,
+        marketplace: str,
+        ttl: int = settings.ALERT_DEDUP_TTL_SEC,
+        lru_size: int = settings.ALERT_DEDUP_LRU_SIZE,
+        client=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.marketplace = marketplace
+        self.ttl = ttl
+        self.lru_size = lru_size
+        self.clock = clock
+        self._client = client
+        self._local: OrderedDict[str, float] = OrderedDict()  # item_id -> expires
+
+    @property
+    def client(self):
+        return self._client or redis.client
+
+    def _key(self, item_id: str) -> str:
+        return SEEN_KEY.format(marketplace=self.marketplace, item_id=item_id)
+
+    def _seen_locally(self, item_id: str) -> bool:
+        expires = self._local.get(item_id)
+        if expires is None:
+            return False
+        if expires <= self.clock():
+            del self._local[item_id]
+            return False
+        self._local.move_to_end(item_id)
+        return True
+
+    def _remember(self, item_id: str) -> None:
+        self._local[item_id] = self.clock() + self.ttl
+        self._local.move_to_end(item_id)
+        while len(self._local) > self.lru_size:
+            self._local.popitem(last=False)
+
+    async def claim(self, item_id) -> bool:
+        """
+        True — алерт по item_id ещё не отправлялся (и теперь помечен),
+        False — дубликат.
+        """
+        item_id = str(item_id)
+        if self._seen_locally(item_id):
+            return False
+        try:
+            fresh = await self.client.set(self._key(item_id), 1, ex=self.ttl, nx=True)
+        except Exception as e:
+            logger.warning("Alert dedup falls back to local LRU: {}", e)
+            fresh = True
+        self._remember(item_id)
+        return bool(fresh)
@@ -0,0 +1,255 @@
+"""
+Временной ряд балансов аккаунтов (таблица balance_snapshots).
+
+Воркер пулов пишет снимки через SnapshotWriter — строки копятся в памяти
+и вставляются пачками (executemany) по размеру или по таймеру; бот читает
+последний снимок мгновенно и обновляет его по кнопке. Пустой проход
+(токенов нет) пишется одной строкой-маркером с symbol="" и нулями, чтобы
+он тоже становился последним снимком. Тот же писатель раз в
+BALANCE_SNAPSHOT_PRUNE_INTERVAL_SEC удаляет снимки старше
+BALANCE_SNAPSHOT_RETENTION_DAYS (пачками, по индексу taken_at).
+"""
+
+import asyncio
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import delete, func, insert, select
+
+import src.settings as settings
+from src.constants import METRICS_DB_PREFIX
+from src.core.clients.databases.postgres import pg
+from src.core.clients.metrics import metrics
+from src.core.models import BalanceSnapshot
+
+FLUSH_ROWS = 500
+FLUSH_INTERVAL_SEC = 5.0
+MAX_PENDING_ROWS = 50_000
+PRUNE_BATCH_ROWS = 10_000
+HISTORY_BUCKETS = ("minute", "hour", "day", "week")
+EMPTY_SYMBOL = ""  # маркер снимка без токенов
+
+
+def snapshot_rows(
+    account_id: int,
+    positions: Iterable[tuple[str, object, float]],
+    taken_at: Optional[datetime] = None,
+) -> list[dict]:
+    """
+    Строки снимка из (symbol, quantity, usd) — формата Valuation.positions;
+    пустые позиции дают одну строку-маркер.
+    """
+    taken_at = taken_at or datetime.now(timezone.utc)
+    positions = list(positions) or [(EMPTY_SYMBOL, 0, 0.0)]
+    return [
+        {
+            "account_id": account_id,
+            "symbol": symbol,
+            "quantity": quantity,
+            "usd_value": usd,
+            "taken_at": taken_at,
+        }
+        for symbol, quantity, usd in positions
+    ]
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def save_snapshots(rows: list[dict]) -> None:
+    """Вставить строки снимков одной пачкой."""
+    if not rows:
+        return
+    async with pg.session_maker() as session:
+        await session.execute(insert(BalanceSnapshot), rows)
+        await session.commit()
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def prune_snapshots(before: datetime, batch: int = PRUNE_BATCH_ROWS) -> int:
+    """
+    Удалить строки снимков старше before пачками по batch (короткие
+    транзакции без долгих блокировок). Возвращает число удалённых строк.
+    """
+    removed = 0
+    while True:
+        async with pg.session_maker() as session:
+            result = await session.execute(
+                delete(BalanceSnapshot).where(
+                    BalanceSnapshot.id.in_(
+                        select(BalanceSnapshot.id)
+                        .where(BalanceSnapshot.taken_at < before)
+                        .limit(batch)
+                    )
+                )
+            )
+            await session.commit()
+        removed += result.rowcount
+        if result.rowcount < batch:
+            return removed
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def latest_snapshot(
+    account_id: int,
+) -> Optional[tuple[datetime, list[BalanceSnapshot]]]:
+    """
+    Время и строки последнего снимка аккаунта (по убыванию USD, без
+    маркера — у пустого снимка список пуст). None — снимков ещё не было.
+    """
+    latest = (
+        select(func.max(BalanceSnapshot.taken_at))
+        .where(BalanceSnapshot.account_id == account_id)
+        .scalar_subquery()
+    )
+    async with pg.session_maker() as session:
+        result = await session.scalars(
+            select(BalanceSnapshot)
+            .where(
+                BalanceSnapshot.account_id == account_id,
+                BalanceSnapshot.taken_at == latest,
+            )
+            .order_by(BalanceSnapshot.usd_value.desc())
+        )
+        rows = list(result)
+    if not rows:
+        return None
+    return rows[0].taken_at, [r for r in rows if r.symbol != EMPTY_SYMBOL]
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def usd_history(
+    account_id: int, since: datetime, bucket: str = "hour"
+) -> list[tuple[datetime, float]]:
+    """
+    Суммарная стоимость аккаунта во времени: итог каждого снимка,
+    усреднённый по интервалам bucket (minute/hour/day/week).
+    """
+    if bucket not in HISTORY_BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}")
+    per_snapshot = (
+        select(
+            BalanceSnapshot.taken_at,
+            func.sum(BalanceSnapshot.usd_value).label("total"),
+        )
+        .where(
+            BalanceSnapshot.account_id == account_id,
+            BalanceSnapshot.taken_at >= since,
+        )
+        .group_by(BalanceSnapshot.taken_at)
+        .subquery()
+    )
+    period = func.date_trunc(bucket, per_snapshot.c.taken_at).label("period")
+    async with pg.session_maker() as session:
+        rows = await session.execute(
+            select(period, func.avg(per_snapshot.c.total))
+            .group_by(period)
+            .order_by(period)
+        )
+        return [(ts, float(total)) for ts, total in rows]
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def pnl(account_id: int, since: datetime) -> Optional[float]:
+    """Изменение стоимости аккаунта с since: итог последнего снимка минус первого."""
+    in_range = (
+        BalanceSnapshot.account_id == account_id,
+        BalanceSnapshot.taken_at >= since,
+    )
+    bounds = [
+        select(bound(BalanceSnapshot.taken_at)).where(*in_range).scalar_subquery()
+        for bound in (func.min, func.max)
+    ]
+    async with pg.session_maker() as session:
+        rows = await session.execute(
+            select(BalanceSnapshot.taken_at, func.sum(BalanceSnapshot.usd_value))
+            .where(
+                BalanceSnapshot.account_id == account_id,
+                BalanceSnapshot.taken_at.in_(bounds),
+            )
+            .group_by(BalanceSnapshot.taken_at)
+            .order_by(BalanceSnapshot.taken_at)
+        )
+        totals = [float(total) for _, total in rows]
+    if len(totals) < 2:
+        return None
+    return totals[-1] - totals[0]
+
+
+class SnapshotWriter:
+    """
+    Буфер снимков с пакетной записью: flush при накоплении flush_rows
+    строк или раз в flush_interval. Если БД недоступна, строки остаются
+    в буфере (не больше MAX_PENDING_ROWS, старые отбрасываются).
+    Раз в prune_interval удаляет снимки старше retention_days (0 — не удалять).
+    """
+
+    def __init__(
+        self,
+        flush_rows: int = FLUSH_ROWS,
+        flush_interval: float = FLUSH_INTERVAL_SEC,
+        save=save_snapshots,
+        retention_days: int = settings.BALANCE_SNAPSHOT_RETENTION_DAYS,
+        prune_interval: float = settings.BALANCE_SNAPSHOT_PRUNE_INTERVAL_SEC,
+        prune=prune_snapshots,
+        clock=time.monotonic,
+    ):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._save = save
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self._prune = prune
+        self._clock = clock
+        self._next_prune = clock()
+        self._rows: list[dict] = []
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def add(
+        self,
+        account_id: int,
+        positions: Iterable[tuple[str, object, float]],
+        taken_at: Optional[datetime] = None,
+    ) -> None:
+        self._rows.extend(snapshot_rows(account_id, positions, taken_at))
+        if len(self._rows) >= self.flush_rows:
+            self._full.set()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                await self._save(rows)
+            except Exception as e:
+                logger.error("Saving {} balance snapshot rows failed: {}", len(rows), e)
+                self._rows = (rows + self._rows)[-MAX_PENDING_ROWS:]
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+            await self.prune_if_due()
+
+    async def prune_if_due(self) -> None:
+        if self.retention_days <= 0 or self._clock() < self._next_prune:
+            return
+        self._next_prune = self._clock() + self.prune_interval
+        before = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        try:
+            removed = await self._prune(before)
+        except Exception as e:
+            logger.error("Pruning balance snapshots failed: {}", e)
+            return
+        if removed:
+            logger.info("Pruned {} balance snapshot rows before {}", removed, before)
+
+
+snapshot_writer = SnapshotWriter()
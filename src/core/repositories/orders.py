@@ -0,0 +1,135 @@
+"""
+Журнал ордеров (таблица order_ledger).
+
+Записи идут через LedgerWriter: изменения копятся в памяти по ключу
+(account_id, client_id) и пишутся пачкой upsert'ов по размеру или по
+таймеру, не задерживая отправку ордеров. find() сначала смотрит в ещё
+не записанный буфер, так что проверка перед повторной отправкой видит
+и незаписанные намерения.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.constants import METRICS_DB_PREFIX
+from src.core.clients.databases.postgres import pg
+from src.core.clients.metrics import metrics
+from src.core.models import OrderLedgerEntry
+
+FLUSH_ROWS = 200
+FLUSH_INTERVAL_SEC = 2.0
+UPDATABLE = (
+    "status",
+    "order_id",
+    "executed_quantity",
+    "executed_quote_quantity",
+    "error",
+    "updated_at",
+)
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def upsert_entries(rows: list[dict]) -> None:
+    """Вставить/обновить записи журнала одной пачкой."""
+    if not rows:
+        return
+    stmt = pg_insert(OrderLedgerEntry)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_order_ledger_client",
+        set_={column: stmt.excluded[column] for column in UPDATABLE},
+    )
+    async with pg.session_maker() as session:
+        await session.execute(stmt, rows)
+        await session.commit()
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def get_entry(account_id: int, client_id: int) -> Optional[OrderLedgerEntry]:
+    async with pg.session_maker() as session:
+        return await session.scalar(
+            select(OrderLedgerEntry).where(
+                OrderLedgerEntry.account_id == account_id,
+                OrderLedgerEntry.client_id == client_id,
+            )
+        )
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def pool_orders(
+    pool_id: int, since: Optional[datetime] = None, limit: int = 100
+) -> list[OrderLedgerEntry]:
+    """История ордеров пула, новые сверху."""
+    query = select(OrderLedgerEntry).where(OrderLedgerEntry.pool_id == pool_id)
+    if since is not None:
+        query = query.where(OrderLedgerEntry.created_at >= since)
+    async with pg.session_maker() as session:
+        result = await session.scalars(
+            query.order_by(OrderLedgerEntry.created_at.desc()).limit(limit)
+        )
+        return list(result)
+
+
+def _as_row(entry: OrderLedgerEntry) -> dict:
+    return {c.name: getattr(entry, c.name) for c in OrderLedgerEntry.__table__.columns}
+
+
+class LedgerWriter:
+    """Буфер записей журнала с пакетным upsert."""
+
+    def __init__(
+        self,
+        flush_rows: int = FLUSH_ROWS,
+        flush_interval: float = FLUSH_INTERVAL_SEC,
+        save=upsert_entries,
+        load=get_entry,
+    ):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._save = save
+        self._load = load
+        self._pending: dict[tuple[int, int], dict] = {}
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def record(self, row: dict) -> None:
+        """row — полная строка журнала; более поздняя версия заменяет раннюю."""
+        self._pending[(row["account_id"], row["client_id"])] = dict(row)
+        if len(self._pending) >= self.flush_rows:
+            self._full.set()
+
+    async def find(self, account_id: int, client_id: int) -> Optional[dict]:
+        row = self._pending.get((account_id, client_id))
+        if row is not None:
+            return dict(row)
+        entry = await self._load(account_id, client_id)
+        return _as_row(entry) if entry is not None else None
+
+    async def flush(self) -> None:
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            try:
+                await self._save(list(pending.values()))
+            except Exception as e:
+                logger.error("Saving {} order ledger rows failed: {}", len(pending), e)
+                # более свежие версии, записанные во время save, важнее
+                for key, row in pending.items():
+                    self._pending.setdefault(key, row)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+
+ledger = LedgerWriter()
@@ -0,0 +1,165 @@
+"""
+In-memory реестр активных пулов для воркеров.
+
+Все активные пулы вместе с аккаунтами, прокси и fake headers загружаются
+одним запросом; клиенты аккаунтов сразу кладутся в кэш клиентов, так что
+запуск пула не делает ни одного запроса к БД. Изменения `pools` и
+`pool_account_link` приходят через LISTEN/NOTIFY (триггеры из миграции
+d5e7f9a1b3c4) и перезагружают только затронутые пулы; раз в resync_interval
+делается полная перезагрузка — на случай потерянных уведомлений и
+изменений прокси/заголовков, о которых триггеры не сообщают.
+"""
+
+import asyncio
+import json
+from collections.abc import Iterable
+from typing import Optional
+
+import asyncpg
+from loguru import logger
+from sqlalchemy import and_, select
+
+from src.constants import METRICS_DB_PREFIX
+from src.core.clients.databases.postgres import pg
+from src.core.clients.exchanges.backpack.cache import clients
+from src.core.clients.metrics import metrics
+from src.core.models import Account, FakeHeader, Proxy
+from src.core.models.pool import Pool, PoolAccountLink
+from src.core.repositories.accounts import build_backpack_client
+
+CHANNEL = "pool_changes"
+RESYNC_INTERVAL_SEC = 300
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def load_active_pools(
+    pool_ids: Optional[Iterable[int]] = None,
+) -> list[tuple[Pool, Account | None, Proxy | None, FakeHeader | None]]:
+    """
+    Активные пулы с аккаунтами, активными прокси и заголовками одним запросом.
+    pool_ids ограничивает выборку (частичная перезагрузка).
+    """
+    query = (
+        select(Pool, Account, Proxy, FakeHeader)
+        .outerjoin(PoolAccountLink, PoolAccountLink.pool_id == Pool.id)
+        .outerjoin(Account, Account.id == PoolAccountLink.account_id)
+        .outerjoin(
+            Proxy, and_(Proxy.account_id == Account.id, Proxy.in_use.is_(True))
+        )
+        .outerjoin(FakeHeader, FakeHeader.account_id == Account.id)
+        .where(Pool.is_active.is_(True))
+        .order_by(Pool.id, Account.id)
+    )
+    if pool_ids is not None:
+        query = query.where(Pool.id.in_(list(pool_ids)))
+    async with pg.session_maker() as session:
+        return [tuple(row) for row in await session.execute(query)]
+
+
+class PoolRegistry:
+    """
+    pools — активные пулы по id, accounts — их аккаунты.
+    version растёт при каждом изменении, чтобы потребители могли дешево
+    понять, что пора пересчитать производные данные (например, таймеры).
+    """
+
+    def __init__(self, resync_interval: float = RESYNC_INTERVAL_SEC):
+        self.resync_interval = resync_interval
+        self.pools: dict[int, Pool] = {}
+        self.accounts: dict[int, list[Account]] = {}
+        self.version = 0
+        self._dirty: set[int] = set()
+        self._changed = asyncio.Event()
+
+    def apply(self, rows, pool_ids: Optional[Iterable[int]] = None) -> None:
+        """Заменить пулы (все или только pool_ids) загруженными строками."""
+        if pool_ids is None:
+            self.pools.clear()
+            self.accounts.clear()
+        else:
+            for pool_id in pool_ids:
+                self.pools.pop(pool_id, None)
+                self.accounts.pop(pool_id, None)
+
+        for pool, account, proxy, header in rows:
+            self.pools[pool.id] = pool
+            members = self.accounts.setdefault(pool.id, [])
+            if account is not None:
+                members.append(account)
+                clients.put(account.id, build_backpack_client(account, proxy, header))
+        self.version += 1
+
+    async def load(self, pool_ids: Optional[Iterable[int]] = None) -> None:
+        pool_ids = None if pool_ids is None else set(pool_ids)
+        self.apply(await load_active_pools(pool_ids), pool_ids)
+        logger.info(
+            "Pool registry loaded {} ({} pools)",
+            "all" if pool_ids is None else sorted(pool_ids),
+            len(self.pools),
+        )
+
+    def handle_notification(self, payload: str) -> None:
+        """payload — JSON {"table", "op", "pool_id"} из триггера."""
+        try:
+            pool_id = int(json.loads(payload)["pool_id"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Bad pool change payload: {}", payload)
+            return
+        self._dirty.add(pool_id)
+        self._changed.set()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.handle_notification(payload)
+
+    async def _apply_changes(self) -> None:
+        """Перезагружать изменённые пулы пачками, пока есть уведомления."""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            dirty, self._dirty = self._dirty, set()
+            try:
+                await self.load(dirty)
+            except Exception as e:
+                logger.warning("Pool registry partial reload failed: {}", e)
+                self._dirty |= dirty
+                await asyncio.sleep(1)
+                self._changed.set()
+
+    async def _listen(self) -> None:
+        dsn = pg.dsn.replace("postgresql+asyncpg://", "postgresql://")
+        backoff = 1
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                try:
+                    await connection.add_listener(CHANNEL, self._on_notify)
+                    # изменения до LISTEN могли потеряться — догружаем всё
+                    await self.load()
+                    backoff = 1
+                    while not closed.is_set():
+                        try:
+                            await asyncio.wait_for(
+                                closed.wait(), self.resync_interval
+                            )
+                        except asyncio.TimeoutError:
+                            await self.load()
+                    logger.warning("Pool registry listener connection closed")
+                finally:
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Pool registry listener failed: {}", e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def run(self) -> None:
+        """LISTEN + периодическая полная пересинхронизация."""
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self._listen())
+            tg.create_task(self._apply_changes())
+
+
+pool_registry = PoolRegistry()
@@ -0,0 +1,201 @@
+"""
+Выделение прокси аккаунтам без гонок.
+
+Источник истины — Postgres: прокси захватывается атомарным
+UPDATE ... RETURNING по строке, выбранной с FOR UPDATE SKIP LOCKED, так что
+два конкурентных импорта/переключения никогда не получат один прокси.
+Из свободных выдаётся самый быстрый здоровый прокси: latency_ms и fails
+обновляет воркер src.workers.proxy.prober.
+Опционально (PROXY_FREELIST_REDIS=1) свободные id по странам лежат в Redis
+sorted set `proxies:free:<country>` (score — задержка) и захват начинается
+с ZPOPMIN; расхождения между Redis и Postgres исправляет reconcile().
+"""
+
+from collections.abc import Sequence
+
+from loguru import logger
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import src.settings as settings
+from src.constants import METRICS_DB_PREFIX
+from src.core.clients.databases.postgres import pg
+from src.core.clients.databases.redis import redis
+from src.core.clients.metrics import metrics
+from src.core.models import Proxy
+
+FREE_KEY = "proxies:free:{country}"
+
+
+UNKNOWN_LATENCY_MS = 1e9  # ещё не проверенные прокси — в конец очереди
+
+
+def _latency_score(proxy: Proxy) -> float:
+    return proxy.latency_ms if proxy.latency_ms is not None else UNKNOWN_LATENCY_MS
+
+
+def _healthy():
+    return Proxy.fails < settings.PROXY_MAX_FAILS
+
+
+class RedisFreeList:
+    """Свободные proxy.id по странам в Redis (sorted set, score — задержка)."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or redis.client
+
+    async def pop(self, country: str, exclude: Sequence[int] = ()) -> int | None:
+        """
+        Самый быстрый свободный прокси, кроме exclude. Снятые вместе с ним
+        исключённые id возвращаются в очередь с прежним score.
+        """
+        key = FREE_KEY.format(country=country)
+        popped = await self.client.zpopmin(key, len(exclude) + 1)
+        chosen, skipped = None, {}
+        for member, score in popped:
+            proxy_id = int(member)
+            if chosen is None and proxy_id not in exclude:
+                chosen = proxy_id
+            else:
+                skipped[proxy_id] = score
+        await self.push(country, skipped)
+        return chosen
+
+    async def push(self, country: str, scores: dict[int, float]) -> None:
+        if scores:
+            await self.client.zadd(FREE_KEY.format(country=country), scores)
+
+    async def replace(self, country: str, scores: dict[int, float]) -> None:
+        key = FREE_KEY.format(country=country)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if scores:
+                pipe.zadd(key, scores)
+            await pipe.execute()
+
+    async def countries(self) -> set[str]:
+        prefix = FREE_KEY.format(country="")
+        return {
+            key[len(prefix) :] async for key in self.client.scan_iter(f"{prefix}*")
+        }
+
+
+free_list = RedisFreeList()
+
+
+def _free_proxy_ids(country: str, limit: int, exclude: Sequence[int] = ()):
+    return (
+        select(Proxy.id)
+        .where(
+            Proxy.country == country,
+            ~Proxy.in_use,  # совпадает с предикатом ix_proxies_free_country
+            _healthy(),
+            Proxy.id.notin_(exclude),
+        )
+        .order_by(Proxy.latency_ms.asc().nullslast(), Proxy.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def lock_free_proxies(
+    session: AsyncSession, country: str, limit: int
+) -> list[int]:
+    """
+    Заблокировать до `limit` свободных прокси страны в текущей транзакции.
+    Строки, уже заблокированные другими транзакциями, пропускаются.
+    """
+    return list(await session.scalars(_free_proxy_ids(country, limit)))
+
+
+async def claim_proxy(
+    session: AsyncSession,
+    account_id: int,
+    country: str,
+    exclude: Sequence[int] = (),
+) -> Proxy | None:
+    """
+    Атомарно закрепить свободный прокси страны за аккаунтом.
+    exclude — id, которые нельзя выдавать (например, только что отказавший
+    прокси). Коммит — на стороне вызывающего.
+    """
+    if settings.PROXY_FREELIST_REDIS:
+        proxy_id = await free_list.pop(country, exclude)
+        if proxy_id is not None:
+            proxy = await session.scalar(
+                update(Proxy)
+                .where(Proxy.id == proxy_id, ~Proxy.in_use, _healthy())
+                .values(account_id=account_id, in_use=True)
+                .returning(Proxy)
+                .execution_options(synchronize_session=False)
+            )
+            if proxy is not None:
+                return proxy
+            logger.warning("Stale free-list entry proxy_id={}", proxy_id)
+
+    return await session.scalar(
+        update(Proxy)
+        .where(Proxy.id == _free_proxy_ids(country, 1, exclude).scalar_subquery())
+        .values(account_id=account_id, in_use=True)
+        .returning(Proxy)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def release_proxy(
+    session: AsyncSession, account_id: int, keep: Sequence[int] = ()
+) -> list[Proxy]:
+    """
+    Освободить прокси аккаунта, кроме id из keep.
+    Коммит и publish_released — на стороне вызывающего.
+    """
+    return list(
+        await session.scalars(
+            update(Proxy)
+            .where(Proxy.account_id == account_id, Proxy.id.notin_(keep))
+            .values(account_id=None, in_use=False)
+            .returning(Proxy)
+            .execution_options(synchronize_session=False)
+        )
+    )
+
+
+async def publish_released(proxies: Sequence[Proxy]) -> None:
+    """Вернуть освобождённые прокси в Redis free-list (после коммита)."""
+    if not settings.PROXY_FREELIST_REDIS:
+        return
+    by_country: dict[str, dict[int, float]] = {}
+    for proxy in proxies:
+        if proxy.fails < settings.PROXY_MAX_FAILS:
+            by_country.setdefault(proxy.country, {})[proxy.id] = _latency_score(proxy)
+    for country, scores in by_country.items():
+        await free_list.push(country, scores)
+
+
+@metrics.track(prefix=METRICS_DB_PREFIX)
+async def reconcile() -> dict[str, int]:
+    """
+    Пересобрать Redis free-list из Postgres (только здоровые прокси).
+    Возвращает {country: free_count}.
+    Возможная гонка с параллельным claim исправляется следующим запуском:
+    claim всё равно перепроверяет in_use в Postgres.
+    """
+    async with pg.session_maker() as session:
+        proxies = list(
+            await session.scalars(select(Proxy).where(~Proxy.in_use, _healthy()))
+        )
+
+    free: dict[str, dict[int, float]] = {}
+    for proxy in proxies:
+        free.setdefault(proxy.country, {})[proxy.id] = _latency_score(proxy)
+
+    for country in (await free_list.countries()) | set(free):
+        await free_list.replace(country, free.get(country, {}))
+
+    counts = {country: len(ids) for country, ids in free.items()}
+    logger.info("Proxy free-list reconciled: {}", counts)
+    return counts
@@ -7,7 +7,7 @@ from sqlalchemy import select
 from src.core.clients.exchanges.backpack.utils import (
     _top_up_sol,
     _compute_total_usd_balance,
-    _open_market_order,
+    _open_market_orders,
     _select_random_main_account,
     _load_proxy_and_fake,
     _get_sub_accounts,
@@ -94,16 +94,20 @@ async def run_subacc_trading_strategy(pool_id: int) -> None:
         opposite = "Ask" if primary == "Bid" else "Bid"
         odd = random.randrange(2)
 
-        for idx, sym in enumerate(SYMBOLS):
-            side = opposite if idx == odd else primary
-            for step in ["0.9", "0.8", "0.7", "0.6", "0.5"]:
-                res = await _open_market_order(
-                    sub_client,
-                    symbol=sym,
-                    side=side,
-                    amount_usd=alloc * LEVERAGE * Decimal(step),
-                    pool_id=pool_id,
-                    sub_id=sub.id,
-                )
+        sides = {
+            sym: opposite if idx == odd else primary for idx, sym in enumerate(SYMBOLS)
+        }
+        # все ноги — одним batch-запросом; не открывшиеся повторяем с меньшим объёмом
+        for step in ["0.9", "0.8", "0.7", "0.6", "0.5"]:
+            if not sides:
+                break
+            legs = {
+                sym: (side, alloc * LEVERAGE * Decimal(step))
+                for sym, side in sides.items()
+            }
+            responses = await _open_market_orders(
+                sub_client, legs, pool_id=pool_id, sub_id=sub.id
+            )
+            for sym, res in responses.items():
                 if res.get("createdAt"):
-                    break
+                    sides.pop(sym, None)
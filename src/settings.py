@@ -14,3 +14,44 @@ POSTGRES_DB = os.environ["POSTGRES_DB"]
 ALLOW = list(map(int, os.environ["ALLOW"].split()))
 
 DEV_MODE = int(os.getenv("DEV_MODE", ""))
+
+POOL_MAX_CONCURRENCY = int(os.getenv("POOL_MAX_CONCURRENCY", "50"))
+POOL_PER_PROXY_CONCURRENCY = int(os.getenv("POOL_PER_PROXY_CONCURRENCY", "2"))
+POOL_PER_API_KEY_CONCURRENCY = int(os.getenv("POOL_PER_API_KEY_CONCURRENCY", "1"))
+POOL_ACCOUNT_TIMEOUT_SEC = float(os.getenv("POOL_ACCOUNT_TIMEOUT_SEC", "60"))
+POOL_SCHEDULE_JITTER = float(os.getenv("POOL_SCHEDULE_JITTER", "0.1"))
+# полная пересинхронизация реестра пулов (изменения приходят по NOTIFY)
+POOL_REFRESH_SEC = int(os.getenv("POOL_REFRESH_SEC", "300"))
+POOL_LEASES = int(os.getenv("POOL_LEASES", "0"))
+POOL_LEASE_TTL_SEC = float(os.getenv("POOL_LEASE_TTL_SEC", "30"))
+
+BACKPACK_WS_SYMBOLS = os.getenv("BACKPACK_WS_SYMBOLS", "").split()
+
+# лимиты запросов на один api_key, req/s (burst = лимит за секунду)
+BACKPACK_RPS_PUBLIC = float(os.getenv("BACKPACK_RPS_PUBLIC", "20"))
+BACKPACK_RPS_PRIVATE_READ = float(os.getenv("BACKPACK_RPS_PRIVATE_READ", "10"))
+BACKPACK_RPS_ORDER = float(os.getenv("BACKPACK_RPS_ORDER", "5"))
+# доля запросов, для которых sign_str пишется в DEBUG-лог (0 — никогда)
+BACKPACK_SIGN_LOG_SAMPLE = float(os.getenv("BACKPACK_SIGN_LOG_SAMPLE", "0"))
+
+PROXY_FREELIST_REDIS = int(os.getenv("PROXY_FREELIST_REDIS", "0"))
+PROXY_RECONCILE_INTERVAL_SEC = int(os.getenv("PROXY_RECONCILE_INTERVAL_SEC", "300"))
+
+PROXY_PROBE_URL = os.getenv(
+    "PROXY_PROBE_URL", "https://api.backpack.exchange/api/v1/status"
+)
+PROXY_PROBE_INTERVAL_SEC = int(os.getenv("PROXY_PROBE_INTERVAL_SEC", "120"))
+PROXY_PROBE_CONCURRENCY = int(os.getenv("PROXY_PROBE_CONCURRENCY", "50"))
+PROXY_MAX_FAILS = int(os.getenv("PROXY_MAX_FAILS", "3"))
+
+# история балансов: снимки старше RETENTION_DAYS удаляются (0 — хранить всё)
+BALANCE_SNAPSHOT_RETENTION_DAYS = int(
+    os.getenv("BALANCE_SNAPSHOT_RETENTION_DAYS", "30")
+)
+BALANCE_SNAPSHOT_PRUNE_INTERVAL_SEC = int(
+    os.getenv("BALANCE_SNAPSHOT_PRUNE_INTERVAL_SEC", "3600")
+)
+
+# дедупликация алертов подарков/NFT (Redis + локальный LRU)
+ALERT_DEDUP_TTL_SEC = int(os.getenv("ALERT_DEDUP_TTL_SEC", str(7 * 24 * 3600)))
+ALERT_DEDUP_LRU_SIZE = int(os.getenv("ALERT_DEDUP_LRU_SIZE", "10000"))
@@ -1,29 +1,63 @@
 #!/usr/bin/env python3
 """
 Фоновый воркер для торговых пулов.
-Каждый цикл:
-  - Загружает все активные пулы.
-  - Для каждого пула валидирует настройки через Pydantic.
+  - Активные пулы с аккаунтами держатся в памяти (PoolRegistry): один
+    запрос на загрузку, точечные обновления по LISTEN/NOTIFY и полная
+    пересинхронизация раз в POOL_REFRESH_SEC; настройки пула валидируются
+    через Pydantic при каждом изменении реестра.
+  - При POOL_LEASES=1 реплики делят пулы через Redis-аренды (PoolLeases).
+  - Каждый пул запускается по своему interval (PoolTimers): с jitter,
+    без наложения запусков одного пула, с метриками отставания.
+  - Аккаунты пула обрабатываются параллельно через общий AccountScheduler
+    (общий лимит, лимиты на прокси и api_key, таймаут на аккаунт).
+  - Логи — через src.core.log (JSON, pool_id/account_id в каждой записи).
   - Для каждого аккаунта в пуле:
       • Получает балансы и позиции borrow/lend через отдельные методы,
         пропуская аккаунт при валидационных ошибках.
-      • Вычисляет net-баланс в USD.
+      • Вычисляет net-баланс в USD (valuation, один снимок тикеров)
+        и пишет снимок баланса в balance_snapshots (пакетно).
       • Если список пуст — выполняет BUY по market.
       • Иначе — продаёт самый дорогой токен.
-  - Ждёт минимальный interval среди всех пулов.
+      • Ордера идут через журнал order_ledger с детерминированным clientId
+        по плановому времени запуска (tick из PoolTimers): повтор после
+        таймаута в том же запуске не создаёт дубликат, а у следующего
+        запуска — своё намерение.
 """
 import asyncio
 from decimal import Decimal, InvalidOperation, ROUND_DOWN
+from functools import partial
+from loguru import logger
 from pydantic import BaseModel, Field, ValidationError
-from types import SimpleNamespace
 from prometheus_client import start_http_server, Summary, Counter
 
-from src.core.repositories.pools import get_active_pools, list_pool_accounts
+import src.settings as settings
+from src.core.repositories import accounts as accounts_repo
+from src.core.repositories import proxy_allocator
+from src.core.repositories.balances import snapshot_writer
+from src.core.repositories.orders import ledger
+from src.core.repositories.pool_registry import pool_registry
 from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.clients.exchanges.backpack.market_data import market_data
+from src.core.clients.exchanges.backpack.orders import outcome_unknown, submit_order
+from src.core.clients.exchanges.backpack.sessions import sessions
+from src.core.clients.exchanges.backpack.stream import BackpackMarketStream
+from src.core.clients.exchanges.backpack.valuation import (
+    QUOTE,
+    holdings,
+    usd_prices,
+    value_portfolios,
+)
+from src.core.log import setup_logging
+from src.workers.exchanges.leases import PoolLeases
+from src.workers.exchanges.scheduler import (
+    AccountJob,
+    AccountScheduler,
+    PoolTimers,
+)
 
 # Prometheus metrics
 CYCLE_LATENCY = Summary(
-    "pool_cycle_duration_seconds", "Duration of one full pool processing loop"
+    "pool_cycle_duration_seconds", "Duration of one pool run over all its accounts"
 )
 ORDER_COUNT = Counter(
     "pool_orders_executed_total",
@@ -35,6 +69,8 @@ ERROR_COUNT = Counter(
     "Total number of errors in pool processing",
     ["pool_id", "stage"],
 )
+# попыток отправить ордер в одном запуске, если исход предыдущей неизвестен
+ORDER_ATTEMPTS = 3
 
 
 class PoolSettings(BaseModel):
@@ -47,138 +83,262 @@ class PoolSettings(BaseModel):
     )
 
 
-async def process_pool(pool):
+def _pool_settings(pool) -> PoolSettings | None:
     try:
-        cfg = PoolSettings(**pool.settings)
+        return PoolSettings(**pool.settings)
     except ValidationError as e:
         ERROR_COUNT.labels(pool_id=str(pool.id), stage="validate_settings").inc()
-        print(f"[Pool {pool.id}] Invalid settings: {e}")
-        return
+        logger.error("[Pool {}] Invalid settings: {}", pool.id, e)
+        return None
+
+
+def _intent(pool, tick: int, action: str, symbol: str) -> str:
+    """
+    Намерение = пул + плановый запуск + действие: повтор в том же запуске
+    получает тот же clientId и не дублирует ордер.
+    """
+    return f"pool:{pool.id}:t{tick}:{action}:{symbol}"
+
 
-    accounts = await list_pool_accounts(pool.id)
-    for acc in accounts:
-        client = BackpackExchangeClient(api_key=acc.api_key, api_secret=acc.api_secret)
-        # 1. баланс
+async def _place_order(client, pool, action: str, **order) -> dict:
+    """
+    submit_order с повтором, пока исход неизвестен (таймаут, обрыв):
+    тот же intent — тот же clientId, журнал не даст отправить ордер дважды.
+    Размещённые ордера считаются в ORDER_COUNT, уже размещённые — нет.
+    """
+    for attempt in range(ORDER_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(attempt)
+        res = await submit_order(client, pool_id=pool.id, **order)
+        if not outcome_unknown(res):
+            break
+    symbol, qty = order["symbol"], order["quantity"]
+    if not isinstance(res, dict):
+        res = {"error": "unexpected", "message": str(res)}
+    if res.get("duplicate"):
+        logger.info("{} {} already placed: {}", action, symbol, res)
+    elif res.get("id"):
+        ORDER_COUNT.labels(pool_id=str(pool.id), action=action).inc()
+        logger.bind(sampled=False).info(
+            "{} {} qty={}: {}", action.upper(), symbol, qty, res
+        )
+    else:
+        ERROR_COUNT.labels(pool_id=str(pool.id), stage=f"execute_{action}").inc()
+        logger.error("{} {} failed: {}", action, symbol, res)
+    return res
+
+
+async def process_account(pool, cfg: PoolSettings, acc, client, tick: int) -> None:
+    # 1. баланс
+    try:
+        balance_resp = await client.get_balance()
+    except Exception as e:
+        ERROR_COUNT.labels(pool_id=str(pool.id), stage="get_balance").inc()
+        logger.error("Error fetching balance: {}", e)
+        return
+    # 2. lend/borrow позиции
+    try:
+        lend_resp = await client.get_borrow_lend_positions()
+    except Exception as e:
+        ERROR_COUNT.labels(pool_id=str(pool.id), stage="get_lend").inc()
+        logger.error("Error fetching lend positions: {}", e)
+        lend_resp = None
+    # вычисляем USD-балансы по общему снимку тикеров
+    try:
+        quantities = holdings(balance_resp, lend_resp)
+        prices = usd_prices(await client.get_tickers())
+    except Exception as e:
+        ERROR_COUNT.labels(pool_id=str(pool.id), stage="calculate_balances").inc()
+        logger.error("Error valuing balances: {}", e)
+        return
+    # одна оценка полного баланса (с locked/staked): снимок для истории и бота
+    full = holdings(balance_resp, lend_resp, include_locked=True)
+    positions = value_portfolios({acc.id: full}, prices).positions(
+        acc.id, include_negative=True
+    )
+    snapshot_writer.add(
+        acc.id, [(token, full[token], usd) for token, _, usd in positions]
+    )
+    # торговать можно только available: та же цена, своё количество
+    balances_usd = [
+        {
+            "token": token,
+            "quantity": quantities[token],
+            "usd": float(quantities[token]) * prices[token],
+        }
+        for token, _, _ in positions
+        if token != QUOTE and quantities.get(token, 0) > 0
+    ]
+    balances_usd.sort(key=lambda b: b["usd"], reverse=True)
+    # Торговля
+    if not balances_usd:
+        action = "buy"
+        usdc_data = getattr(balance_resp, "balances", {}).get("USDC")
         try:
-            balance_resp = await client.get_balance()
+            usdc_avail = Decimal(str(getattr(usdc_data, "available", 0)))
+        except:
+            usdc_avail = Decimal(0)
+        spend_amount = usdc_avail * Decimal(cfg.spend_percent) / Decimal(100)
+        if spend_amount <= 0:
+            return
+        try:
+            ob_buy = await client.get_order_book_depth(cfg.buy_symbol)
+            asks_buy = ob_buy.get("asks", [])
+            price_buy = Decimal(str(asks_buy[0][0])) if asks_buy else Decimal(0)
+            qty = (spend_amount / price_buy).quantize(
+                Decimal("0.001"), rounding=ROUND_DOWN
+            )
+            await _place_order(
+                client,
+                pool,
+                action,
+                account_id=acc.id,
+                intent=_intent(pool, tick, action, cfg.buy_symbol),
+                symbol=cfg.buy_symbol,
+                side="Bid",
+                quantity=str(qty),
+            )
         except Exception as e:
-            ERROR_COUNT.labels(pool_id=str(pool.id), stage="get_balance").inc()
-            print(f"[Pool {pool.id}][Acc {acc.id}] Error fetching balance: {e}")
-            continue
-        # 2. lend/borrow позиции
+            ERROR_COUNT.labels(pool_id=str(pool.id), stage="execute_buy").inc()
+            logger.error("Error on BUY: {}", e)
+    else:
+        action = "sell"
+        top = balances_usd[0]
+        symbol = top["token"] + "_USDC"
         try:
-            lend_resp = await client.get_borrow_lend_positions()
+            qty = Decimal(top["quantity"]).quantize(
+                Decimal("0.001"), rounding=ROUND_DOWN
+            )
+            await _place_order(
+                client,
+                pool,
+                action,
+                account_id=acc.id,
+                intent=_intent(pool, tick, action, symbol),
+                symbol=symbol,
+                side="Ask",
+                quantity=str(qty),
+            )
         except Exception as e:
-            ERROR_COUNT.labels(pool_id=str(pool.id), stage="get_lend").inc()
-            print(f"[Pool {pool.id}][Acc {acc.id}] Error fetching lend positions: {e}")
-            lend_resp = SimpleNamespace(positions=[])
-        # net-qty из lend
-        net_qty = {}
-        for pos in getattr(lend_resp, "positions", []):
-            try:
-                sym = (
-                    pos.get("symbol")
-                    if isinstance(pos, dict)
-                    else getattr(pos, "symbol", None)
-                )
-                raw = (
-                    pos.get("netExposureQuantity")
-                    if isinstance(pos, dict)
-                    else getattr(pos, "netExposureQuantity", None)
-                )
-                if sym and raw is not None:
-                    net_qty[sym.replace("_USDC", "")] = Decimal(str(raw))
-            except:
-                continue
-        # вычисляем USD-балансы
-        balances_usd = []
-        for token, data in getattr(balance_resp, "balances", {}).items():
-            if token == "USDC":
-                continue
-            try:
-                avail = Decimal(str(getattr(data, "available", 0)))
-                total = avail + net_qty.get(token, Decimal(0))
-                if total <= 0:
-                    continue
-                ob = await client.get_order_book_depth(f"{token}_USDC")
-                asks = ob.get("asks", [])
-                if not asks:
-                    continue
-                price = Decimal(str(asks[0][0]))
-            except Exception as e:
-                ERROR_COUNT.labels(
-                    pool_id=str(pool.id), stage="calculate_balances"
-                ).inc()
-                continue
-            balances_usd.append(
-                {"token": token, "quantity": total, "usd": float(total * price)}
+            ERROR_COUNT.labels(pool_id=str(pool.id), stage="execute_sell").inc()
+            logger.error("Error on SELL: {}", e)
+
+
+async def _pool_jobs(pool, tick: int) -> list[AccountJob]:
+    cfg = _pool_settings(pool)
+    if cfg is None:
+        return []
+
+    jobs = []
+    for acc in pool_registry.accounts.get(pool.id, []):
+        client = await accounts_repo.get_backpack_client_by_account_id(acc.id)
+        if client is None:
+            continue
+        jobs.append(
+            AccountJob(
+                pool_id=pool.id,
+                account_id=acc.id,
+                api_key=acc.api_key,
+                proxy_url=client.proxy_url,
+                tick=tick,
+                run=partial(process_account, pool, cfg, acc, client, tick),
             )
-        balances_usd.sort(key=lambda x: x["usd"], reverse=True)
-        # Торговля
-        if not balances_usd:
-            action = "buy"
-            usdc_data = getattr(balance_resp, "balances", {}).get("USDC")
-            try:
-                usdc_avail = Decimal(str(getattr(usdc_data, "available", 0)))
-            except:
-                usdc_avail = Decimal(0)
-            spend_amount = usdc_avail * Decimal(cfg.spend_percent) / Decimal(100)
-            if spend_amount <= 0:
-                continue
-            try:
-                ob_buy = await client.get_order_book_depth(cfg.buy_symbol)
-                asks_buy = ob_buy.get("asks", [])
-                price_buy = Decimal(str(asks_buy[0][0])) if asks_buy else Decimal(0)
-                qty = (spend_amount / price_buy).quantize(
-                    Decimal("0.001"), rounding=ROUND_DOWN
-                )
-                res = await client.create_order(
-                    symbol=cfg.buy_symbol,
-                    side="Bid",
-                    quantity=str(qty),
-                    order_type="Market",
-                )
-                ORDER_COUNT.labels(pool_id=str(pool.id), action=action).inc()
-                print(
-                    f"[Pool {pool.id}][Acc {acc.id}] BUY {cfg.buy_symbol} qty={qty}: {res}"
-                )
-            except Exception as e:
-                ERROR_COUNT.labels(pool_id=str(pool.id), stage="execute_buy").inc()
-                print(f"[Pool {pool.id}][Acc {acc.id}] Error on BUY: {e}")
-        else:
-            action = "sell"
-            top = balances_usd[0]
-            symbol = top["token"] + "_USDC"
-            try:
-                qty = Decimal(top["quantity"]).quantize(
-                    Decimal("0.001"), rounding=ROUND_DOWN
-                )
-                res = await client.create_order(
-                    symbol=symbol, side="Ask", quantity=str(qty), order_type="Market"
-                )
-                ORDER_COUNT.labels(pool_id=str(pool.id), action=action).inc()
-                print(f"[Pool {pool.id}][Acc {acc.id}] SELL {symbol} qty={qty}: {res}")
-            except Exception as e:
-                ERROR_COUNT.labels(pool_id=str(pool.id), stage="execute_sell").inc()
-                print(f"[Pool {pool.id}][Acc {acc.id}] Error on SELL: {e}")
+        )
+    return jobs
+
+
+async def reconcile_proxies_forever() -> None:
+    """Периодически выравнивает Redis free-list прокси по Postgres."""
+    while True:
+        try:
+            await proxy_allocator.reconcile()
+        except Exception as e:
+            logger.error("Proxy free-list reconcile failed: {}", e)
+        await asyncio.sleep(settings.PROXY_RECONCILE_INTERVAL_SEC)
 
 
 async def main():
+    setup_logging("pool-worker")
     # Запустим HTTP сервер для Prometheus метрик на порту 8000
     start_http_server(8001)
-    while True:
+    scheduler = AccountScheduler(
+        max_concurrency=settings.POOL_MAX_CONCURRENCY,
+        per_proxy=settings.POOL_PER_PROXY_CONCURRENCY,
+        per_api_key=settings.POOL_PER_API_KEY_CONCURRENCY,
+        timeout=settings.POOL_ACCOUNT_TIMEOUT_SEC,
+    )
+    pools = pool_registry.pools
+    leases = None
+    if settings.POOL_LEASES:
+        leases = PoolLeases(ttl=settings.POOL_LEASE_TTL_SEC)
+
+    async def run_pool(pool_id: int, tick: int) -> None:
+        pool = pools.get(pool_id)
+        if pool is None or (leases is not None and pool_id not in leases.owned):
+            return
         with CYCLE_LATENCY.time():
-            pools = await get_active_pools()
-            await asyncio.gather(*(process_pool(p) for p in pools))
-        # вычислить паузу
-        intervals = []
-        for p in pools:
+            await scheduler.run(await _pool_jobs(pool, tick))
+
+    timers = PoolTimers(run_pool, jitter=settings.POOL_SCHEDULE_JITTER)
+
+    stream = None
+    if settings.BACKPACK_WS_SYMBOLS:
+        stream = BackpackMarketStream(settings.BACKPACK_WS_SYMBOLS)
+        market_data.attach_stream(stream)
+        await stream.start()
+    reconciler = None
+    if settings.PROXY_FREELIST_REDIS:
+        reconciler = asyncio.create_task(reconcile_proxies_forever())
+    registry = asyncio.create_task(pool_registry.run())
+    writer = asyncio.create_task(snapshot_writer.run())
+    ledger_writer = asyncio.create_task(ledger.run())
+    runner = asyncio.create_task(timers.run_forever())
+    intervals: dict[int, int] = {}
+    seen_version = None
+    tick = settings.POOL_LEASE_TTL_SEC / 3 if leases else 1
+    try:
+        while True:
+            # реестр обновляется по NOTIFY; таймеры пересчитываются только
+            # когда он изменился (новые/выключенные пулы, новые интервалы)
+            if pool_registry.version != seen_version:
+                seen_version = pool_registry.version
+                intervals.clear()
+                for pool in pools.values():
+                    cfg = _pool_settings(pool)
+                    if cfg is not None:
+                        intervals[pool.id] = cfg.interval
+            owned = set(intervals)
+            if leases is not None:
+                # без Redis эксклюзивность не гарантирована — не торгуем
+                try:
+                    owned = await leases.maintain(intervals, busy=timers.running)
+                except Exception as e:
+                    ERROR_COUNT.labels(pool_id="", stage="leases").inc()
+                    logger.error("Error maintaining pool leases: {}", e)
+                    leases.forget()
+                    owned = set()
+                # запуски без аренды прерываются, а не дорабатывают до конца
+                for pool_id in leases.lost:
+                    timers.cancel(pool_id)
+            timers.sync({pool_id: intervals[pool_id] for pool_id in owned})
+            await asyncio.sleep(tick)
+    finally:
+        runner.cancel()
+        registry.cancel()
+        writer.cancel()
+        ledger_writer.cancel()
+        await snapshot_writer.flush()
+        await ledger.flush()
+        if leases is not None:
             try:
-                cfg = PoolSettings(**p.settings)
-                intervals.append(cfg.interval)
-            except:
-                continue
-        await asyncio.sleep(min(intervals) if intervals else 60)
+                await leases.release_all()
+            except Exception as e:
+                logger.error("Error releasing pool leases: {}", e)
+        if reconciler is not None:
+            reconciler.cancel()
+        if stream is not None:
+            await stream.stop()
+        await sessions.close()
 
 
 if __name__ == "__main__":
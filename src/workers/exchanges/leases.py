@@ -0,0 +1,164 @@
+"""
+Шардирование пулов между репликами backpack-воркера через Redis-аренды.
+
+Каждая реплика держит аренды `pool:lease:<pool_id>` (SET NX PX, значение —
+worker_id) и раз в ttl/3 продлевает их. Живые реплики отмечаются ключами
+`pool:workers:<worker_id>` с тем же TTL; каждая берёт не больше
+ceil(пулов / реплик) пулов и отдаёт лишние, так что нагрузка выравнивается,
+а пулы упавшей реплики подхватываются не позже чем через TTL аренды.
+Продление и освобождение — compare-and-set через WATCH/MULTI: чужую аренду
+реплика не трогает. Пул, который нужно отдать (выключен или лишний), пока
+по нему идёт запуск, остаётся в draining: аренда продлевается до конца
+запуска и отпускается на следующем heartbeat, новых запусков по нему нет.
+Пулы, аренду которых продлить не удалось, попадают в lost: их идущие
+запуски воркер отменяет, чтобы не торговать одновременно с новым владельцем.
+"""
+
+import math
+import os
+import random
+import socket
+import uuid
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+from loguru import logger
+from prometheus_client import Counter, Gauge
+from redis.exceptions import WatchError
+
+from src.core.clients.databases.redis import redis
+
+LEASE_KEY = "pool:lease:{pool_id}"
+WORKER_KEY = "pool:workers:{worker_id}"
+
+POOL_LEASES_OWNED = Gauge("pool_leases_owned", "Pools leased by this worker replica")
+POOL_LEASES_LOST = Counter(
+    "pool_leases_lost_total", "Pool leases that expired or were taken over"
+)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class PoolLeases:
+    """Аренды пулов одной реплики воркера."""
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        ttl: float = 30,
+        client=None,
+    ):
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl_ms = int(ttl * 1000)
+        self.owned: set[int] = set()
+        # отданные, но ещё занятые текущим запуском пулы: аренда держится
+        self.draining: set[int] = set()
+        # аренды, потерянные на последнем heartbeat
+        self.lost: set[int] = set()
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or redis.client
+
+    async def _acquire(self, pool_id: int) -> bool:
+        return bool(
+            await self.client.set(
+                LEASE_KEY.format(pool_id=pool_id),
+                self.worker_id,
+                nx=True,
+                px=self.ttl_ms,
+            )
+        )
+
+    async def _if_owner(self, pool_id: int, action: Callable) -> bool:
+        key = LEASE_KEY.format(pool_id=pool_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != self.worker_id:
+                    return False
+                pipe.multi()
+                action(pipe, key)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def _renew(self, pool_id: int) -> bool:
+        return await self._if_owner(
+            pool_id, lambda pipe, key: pipe.pexpire(key, self.ttl_ms)
+        )
+
+    async def _release(self, pool_id: int) -> bool:
+        return await self._if_owner(pool_id, lambda pipe, key: pipe.delete(key))
+
+    async def live_workers(self) -> int:
+        prefix = WORKER_KEY.format(worker_id="")
+        return len([key async for key in self.client.scan_iter(f"{prefix}*")])
+
+    async def maintain(
+        self, pool_ids: Iterable[int], busy: Iterable[int] = ()
+    ) -> set[int]:
+        """
+        Один heartbeat: продлить свои аренды, отдать лишние и неактивные,
+        добрать свободные пулы до справедливой доли. Возвращает owned —
+        пулы, которые можно запускать. busy — пулы с идущим запуском: их
+        аренда не отпускается, пока запуск не закончится. Не продлённые
+        аренды остаются в lost.
+        """
+        active, busy = set(pool_ids), set(busy)
+        await self.client.set(
+            WORKER_KEY.format(worker_id=self.worker_id), "1", px=self.ttl_ms
+        )
+
+        held, self.lost = set(), set()
+        for pool_id in self.owned | self.draining:
+            if await self._renew(pool_id):
+                held.add(pool_id)
+            else:
+                self.lost.add(pool_id)
+                POOL_LEASES_LOST.inc()
+                logger.warning("Lost lease on pool {}", pool_id)
+
+        # лишними становятся в первую очередь свободные от запуска пулы
+        share = math.ceil(len(active) / max(await self.live_workers(), 1))
+        ranked = sorted(held & active, key=lambda p: (p not in busy, p))
+        drop = (held - active) | set(ranked[share:])
+        for pool_id in drop - busy:
+            await self._release(pool_id)
+        self.draining = drop & busy
+        kept = held - drop
+
+        candidates = list(active - kept - self.draining)
+        random.shuffle(candidates)
+        for pool_id in candidates:
+            if len(kept) >= share:
+                break
+            if await self._acquire(pool_id):
+                kept.add(pool_id)
+
+        if kept != self.owned:
+            logger.info("Worker {} leases pools {}", self.worker_id, sorted(kept))
+        self.owned = kept
+        POOL_LEASES_OWNED.set(len(kept))
+        return kept
+
+    def forget(self) -> set[int]:
+        """
+        Считать все аренды потерянными (Redis недоступен, продлить их
+        нельзя): owned и draining очищаются, бывшие аренды — в lost.
+        """
+        self.lost = self.owned | self.draining
+        self.owned, self.draining = set(), set()
+        POOL_LEASES_OWNED.set(0)
+        return self.lost
+
+    async def release_all(self) -> None:
+        for pool_id in self.owned | self.draining:
+            await self._release(pool_id)
+        self.owned, self.draining = set(), set()
+        POOL_LEASES_OWNED.set(0)
+        await self.client.delete(WORKER_KEY.format(worker_id=self.worker_id))
@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import random
+import time
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from loguru import logger
+from prometheus_client import Counter, Gauge
+from pydantic import BaseModel, ConfigDict
+
+ACCOUNT_INFLIGHT = Gauge(
+    "pool_account_inflight",
+    "Number of accounts being processed right now",
+    ["pool_id"],
+)
+ACCOUNT_TIMEOUTS = Counter(
+    "pool_account_timeouts_total",
+    "Accounts whose processing exceeded the per-account timeout",
+    ["pool_id"],
+)
+POOL_RUN_LAG = Gauge(
+    "pool_run_lag_seconds",
+    "Delay between the scheduled and the actual start of the last pool run",
+    ["pool_id"],
+)
+POOL_MISSED_DEADLINES = Counter(
+    "pool_missed_deadlines_total",
+    "Pool runs skipped because the previous run was still in progress "
+    "or the scheduler fell behind by a whole interval",
+    ["pool_id"],
+)
+
+
+class AccountJob(BaseModel):
+    """Единица работы планировщика: обработка одного аккаунта пула."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    pool_id: int
+    account_id: int
+    api_key: str
+    proxy_url: Optional[str] = None
+    # плановое время запуска пула (мс UNIX), общее для всех аккаунтов запуска
+    tick: int = 0
+    run: Callable[[], Awaitable[None]]
+
+
+class _KeyedSemaphores:
+    """Семафоры по ключу; неиспользуемые ключи удаляются сразу после release."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._items: dict[Hashable, list] = {}  # key -> [semaphore, holders]
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        item = self._items.setdefault(key, [asyncio.Semaphore(self.limit), 0])
+        item[1] += 1
+        try:
+            async with item[0]:
+                yield
+        finally:
+            item[1] -= 1
+            if item[1] == 0:
+                self._items.pop(key, None)
+
+
+class AccountScheduler:
+    """
+    Параллельно обрабатывает аккаунты всех пулов с ограничениями:
+      • max_concurrency — общее число аккаунтов в работе;
+      • per_proxy — одновременных аккаунтов на один прокси;
+      • per_api_key — одновременных задач на один api_key;
+      • timeout — предельное время обработки одного аккаунта.
+    Лимиты по прокси/ключу берутся раньше глобального, чтобы ожидающий
+    своего прокси аккаунт не занимал общий слот.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 50,
+        per_proxy: int = 2,
+        per_api_key: int = 1,
+        timeout: float = 60,
+    ):
+        self.timeout = timeout
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._proxies = _KeyedSemaphores(per_proxy)
+        self._api_keys = _KeyedSemaphores(per_api_key)
+
+    async def _run_one(self, job: AccountJob) -> None:
+        pool_label = str(job.pool_id)
+        async with self._proxies.hold(job.proxy_url or ("direct", job.account_id)):
+            async with self._api_keys.hold(job.api_key), self._global:
+                ACCOUNT_INFLIGHT.labels(pool_id=pool_label).inc()
+                # pool_id/account_id попадают во все записи лога этого аккаунта
+                with logger.contextualize(
+                    pool_id=job.pool_id, account_id=job.account_id
+                ):
+                    try:
+                        await asyncio.wait_for(job.run(), self.timeout)
+                    except asyncio.TimeoutError:
+                        ACCOUNT_TIMEOUTS.labels(pool_id=pool_label).inc()
+                        logger.warning("Account timed out after {}s", self.timeout)
+                    except Exception as e:
+                        logger.exception("Account unhandled error: {}", e)
+                    finally:
+                        ACCOUNT_INFLIGHT.labels(pool_id=pool_label).dec()
+
+    async def run(self, jobs: Iterable[AccountJob]) -> None:
+        """
+        Выполняет все задачи и ждёт их завершения. При отмене внешней
+        корутины TaskGroup отменяет все ещё выполняющиеся аккаунты.
+        """
+        async with asyncio.TaskGroup() as tg:
+            for job in jobs:
+                tg.create_task(self._run_one(job))
+
+
+class PoolTimers:
+    """
+    Таймеры пулов на куче (heapq): каждый пул запускается по своему
+    interval, независимо от остальных.
+      • jitter — доля интервала, на которую случайно сдвигается каждый запуск
+        (базовое расписание при этом не дрейфует);
+      • если прошлый запуск пула ещё идёт, очередной пропускается;
+      • пропуски и отставание больше интервала считаются в
+        pool_missed_deadlines_total, задержка старта — в pool_run_lag_seconds;
+      • run_pool(pool_id, tick) получает tick — плановое время запуска
+        (без jitter) в мс по wall_clock: у разных запусков пула он разный,
+        так что по нему строятся намерения ордеров журнала.
+    """
+
+    def __init__(
+        self,
+        run_pool: Callable[[int, int], Awaitable[None]],
+        jitter: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.run_pool = run_pool
+        self.jitter = jitter
+        self.clock = clock
+        self.wall_clock = wall_clock
+        # (fire_at, generation, pool_id, due)
+        self._heap: list[tuple[float, int, int, float]] = []
+        self._intervals: dict[int, float] = {}
+        self._generations: dict[int, int] = {}
+        self._running: dict[int, asyncio.Task] = {}
+        self._changed = asyncio.Event()
+
+    def _push(self, pool_id: int, due: float) -> None:
+        offset = random.uniform(0, self.jitter * self._intervals[pool_id])
+        generation = self._generations[pool_id]
+        heapq.heappush(self._heap, (due + offset, generation, pool_id, due))
+
+    def schedule(self, pool_id: int, interval: float) -> None:
+        """Добавить пул или сменить его интервал (старые записи в куче гаснут)."""
+        if self._intervals.get(pool_id) == interval:
+            return
+        self._intervals[pool_id] = interval
+        self._generations[pool_id] = self._generations.get(pool_id, 0) + 1
+        self._push(pool_id, self.clock())
+        self._changed.set()
+
+    def remove(self, pool_id: int) -> None:
+        if self._intervals.pop(pool_id, None) is not None:
+            self._generations[pool_id] += 1
+            self._changed.set()
+
+    def cancel(self, pool_id: int) -> bool:
+        """
+        Отменить идущий запуск пула (аренда потеряна — пул уже может
+        запускать другая реплика). True, если было что отменять.
+        """
+        task = self._running.get(pool_id)
+        if task is None or task.done():
+            return False
+        logger.warning("[Pool {}] cancelling the running pool run", pool_id)
+        task.cancel()
+        return True
+
+    def sync(self, intervals: dict[int, float]) -> None:
+        """Привести набор таймеров к {pool_id: interval} активных пулов."""
+        for pool_id in set(self._intervals) - set(intervals):
+            self.remove(pool_id)
+        for pool_id, interval in intervals.items():
+            self.schedule(pool_id, interval)
+
+    @property
+    def pool_ids(self) -> set[int]:
+        return set(self._intervals)
+
+    @property
+    def running(self) -> set[int]:
+        """Пулы, запуск которых ещё идёт."""
+        return {pool_id for pool_id, task in self._running.items() if not task.done()}
+
+    async def _wait(self, timeout: Optional[float]) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._changed.clear()
+
+    def _fire(self, pool_id: int, due: float, fire_at: float, now: float) -> None:
+        label = str(pool_id)
+        POOL_RUN_LAG.labels(pool_id=label).set(max(now - fire_at, 0))
+
+        task = self._running.get(pool_id)
+        if task is not None and not task.done():
+            POOL_MISSED_DEADLINES.labels(pool_id=label).inc()
+            logger.warning(
+                "[Pool {}] previous run still in progress, skipping", pool_id
+            )
+        else:
+            tick = round((self.wall_clock() - now + due) * 1000)
+            self._running[pool_id] = asyncio.create_task(self._run(pool_id, tick))
+
+        interval = self._intervals[pool_id]
+        next_due = due + interval
+        if next_due <= now:
+            skipped = int((now - due) // interval)
+            POOL_MISSED_DEADLINES.labels(pool_id=label).inc(skipped)
+            next_due = due + (skipped + 1) * interval
+        self._push(pool_id, next_due)
+
+    async def _run(self, pool_id: int, tick: int) -> None:
+        with logger.contextualize(pool_id=pool_id):
+            try:
+                await self.run_pool(pool_id, tick)
+            except Exception as e:
+                logger.exception("Pool run failed: {}", e)
+
+    def fire_due(self) -> Optional[float]:
+        """
+        Запустить пулы, чьё время наступило; вернуть время следующего
+        срабатывания (None — таймеров нет).
+        """
+        now = self.clock()
+        while self._heap:
+            fire_at, generation, pool_id, due = self._heap[0]
+            # записи удалённых/перенастроенных пулов отбрасываются лениво
+            if (
+                self._generations.get(pool_id) != generation
+                or pool_id not in self._intervals
+            ):
+                heapq.heappop(self._heap)
+                continue
+            if fire_at > now:
+                return fire_at
+            heapq.heappop(self._heap)
+            self._fire(pool_id, due, fire_at, now)
+        return None
+
+    async def run_forever(self) -> None:
+        try:
+            while True:
+                fire_at = self.fire_due()
+                await self._wait(
+                    None if fire_at is None else max(fire_at - self.clock(), 0)
+                )
+        finally:
+            for task in self._running.values():
+                task.cancel()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Фоновый воркер проверки прокси.
+Каждый цикл:
+  - Загружает все прокси.
+  - Параллельно (PROXY_PROBE_CONCURRENCY) делает через каждый запрос
+    к PROXY_PROBE_URL и меряет время до ответа.
+  - Обновляет EWMA задержки (latency_ms), EWMA доли ошибок (error_rate)
+    и счётчик подряд идущих ошибок (fails) одним пакетным UPDATE.
+  - Экспонирует гистограммы задержки по странам.
+Аллокатор прокси выдаёт самый быстрый здоровый (fails < PROXY_MAX_FAILS).
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from aiohttp import ClientSession, ClientTimeout
+from aiohttp_socks import ProxyConnector
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from sqlalchemy import select, update
+
+import src.settings as settings
+from src.core.clients.databases.postgres import pg
+from src.core.log import setup_logging
+from src.core.models import Proxy
+
+ALPHA = 0.3
+PROBE_TIMEOUT_SEC = 10.0
+
+PROBE_LATENCY = Histogram(
+    "proxy_probe_latency_seconds",
+    "Latency of a request through the proxy to the probe target",
+    ["country"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8),
+)
+PROBE_FAILURES = Counter(
+    "proxy_probe_failures_total",
+    "Failed proxy probes",
+    ["country"],
+)
+HEALTHY_PROXIES = Gauge(
+    "proxy_healthy",
+    "Proxies with fails below PROXY_MAX_FAILS",
+    ["country"],
+)
+CYCLE_LATENCY = Histogram(
+    "proxy_probe_cycle_duration_seconds",
+    "Duration of one full probe cycle",
+)
+
+
+def ewma(prev: Optional[float], sample: float, alpha: float = ALPHA) -> float:
+    return sample if prev is None else alpha * sample + (1 - alpha) * prev
+
+
+def health_update(proxy: Proxy, latency: Optional[float]) -> dict:
+    """Новые значения полей здоровья прокси по результату одной проверки."""
+    failed = 1.0 if latency is None else 0.0
+    row = {
+        "id": proxy.id,
+        "error_rate": ewma(proxy.error_rate or 0.0, failed),
+        "checked_at": datetime.now(timezone.utc),
+    }
+    if latency is None:
+        row["fails"] = proxy.fails + 1
+    else:
+        row["fails"] = 0
+        row["latency_ms"] = ewma(proxy.latency_ms, latency * 1000)
+    return row
+
+
+async def probe(
+    proxy_url: Optional[str], target: str, timeout: float = PROBE_TIMEOUT_SEC
+) -> float:
+    """Время (сек) до ответа target через прокси; при ошибке — исключение."""
+    connector = ProxyConnector.from_url(proxy_url) if proxy_url else None
+    start = time.perf_counter()
+    async with ClientSession(
+        connector=connector, timeout=ClientTimeout(total=timeout)
+    ) as session:
+        async with session.get(target) as resp:
+            # любой HTTP-ответ означает, что прокси довёз запрос
+            elapsed = time.perf_counter() - start
+            await resp.release()
+            return elapsed
+
+
+async def probe_proxy(proxy: Proxy, sem: asyncio.Semaphore) -> dict:
+    async with sem:
+        try:
+            latency = await probe(proxy.url, settings.PROXY_PROBE_URL)
+        except Exception as e:
+            PROBE_FAILURES.labels(country=proxy.country).inc()
+            logger.debug("Proxy {} probe failed: {}", proxy.id, e)
+            return health_update(proxy, None)
+    PROBE_LATENCY.labels(country=proxy.country).observe(latency)
+    return health_update(proxy, latency)
+
+
+async def run_cycle() -> None:
+    async with pg.session_maker() as session:
+        proxies = list(await session.scalars(select(Proxy)))
+    if not proxies:
+        return
+
+    sem = asyncio.Semaphore(settings.PROXY_PROBE_CONCURRENCY)
+    rows = await asyncio.gather(*(probe_proxy(p, sem) for p in proxies))
+
+    async with pg.session_maker() as session:
+        await session.execute(update(Proxy), rows)
+        await session.commit()
+
+    healthy: dict[str, int] = {}
+    for proxy, row in zip(proxies, rows):
+        ok = row["fails"] < settings.PROXY_MAX_FAILS
+        healthy[proxy.country] = healthy.get(proxy.country, 0) + ok
+    for country, count in healthy.items():
+        HEALTHY_PROXIES.labels(country=country).set(count)
+    logger.info("Probed {} proxies, healthy: {}", len(proxies), healthy)
+
+
+async def main():
+    setup_logging("proxy-prober")
+    start_http_server(8004)
+    while True:
+        with CYCLE_LATENCY.time():
+            try:
+                await run_cycle()
+            except Exception as e:
+                logger.exception(f"Proxy probe cycle failed: {e}")
+        await asyncio.sleep(settings.PROXY_PROBE_INTERVAL_SEC)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,14 @@
 from __future__ import annotations
 import random
 import asyncio
+import html
 import os
-from typing import Dict, List, Set
+from typing import Dict, List
 from aiohttp import ClientResponseError
 import aiohttp
 from loguru import logger
 from pydantic import BaseModel, Field
-from prometheus_client import start_http_server, Gauge
-from tenacity import retry, stop_after_attempt, wait_fixed
+from prometheus_client import start_http_server, Counter, Gauge
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -17,6 +17,10 @@ from tenacity import (
     before_sleep_log,
 )
 
+from src.core.clients.telegram.notifier import TelegramNotifier
+from src.core.log import setup_logging
+from src.core.repositories.alert_dedup import AlertDedup
+
 # -----------------------------------------------------
 #  Configuration
 # -----------------------------------------------------
@@ -45,7 +49,11 @@ CHAT_ID_ENV = os.getenv("TELEGRAM_GIFTS_GROUP_ID", "0")
 CHAT_ID: int | None = int(CHAT_ID_ENV) if CHAT_ID_ENV != "0" else None
 
 THRESHOLD_PERCENT = 10.0
-INTERVAL_SEC = 0
+# опрос дешёвого /collections; коллекции перезапрашиваются только при смене
+# floor_price и полностью — раз в FULL_RESCAN_SEC (второй по цене лот может
+# уйти без смены floor)
+INTERVAL_SEC = float(os.getenv("PORTAL_INTERVAL_SEC", "5"))
+FULL_RESCAN_SEC = float(os.getenv("PORTAL_FULL_RESCAN_SEC", "300"))
 MAX_CONCURRENCY = 10
 
 if not HEADERS["Authorization"]:
@@ -72,6 +80,11 @@ PRICE_GAP_GAUGE = Gauge(
     "Price gap percent between 2nd and 1st cheapest NFT",
     ["collection"],
 )
+COLLECTION_SCANS = Counter(
+    "portals_collection_scans_total",
+    "NFT searches per collection, by reason (floor change or full rescan)",
+    ["reason"],
+)
 
 # -----------------------------------------------------
 #  Pydantic models
@@ -154,50 +167,12 @@ async def fetch_nfts_for_collection(
 ) -> NFTSearchResponse:
     url = f"{BASE_URL}/nfts/search?offset={offset}&limit={limit}&sort_by={sort_by}&collection_id={collection_id}"
     async with session.get(url, headers=HEADERS, timeout=30) as resp:
-        await asyncio.sleep(random.uniform(0.5, 3))
         logger.info(f"fetch: {collection_id}")
         resp.raise_for_status()
-        return NFTSearchResponse(**await resp.json())
-
-
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2), reraise=True)
-async def try_send_photo(session: aiohttp.ClientSession, text: str, photo_url: str):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto"
-    data = aiohttp.FormData()
-    data.add_field("chat_id", str(CHAT_ID))
-    data.add_field("caption", text)
-    data.add_field("parse_mode", "HTML")
-    data.add_field("photo", photo_url)
-    async with session.post(url, data=data, timeout=15) as resp:
-        if resp.status != 200:
-            raise RuntimeError(f"photo failed: {await resp.text()}")
-
-
-async def send_telegram_message(
-    session: aiohttp.ClientSession, text: str, photo_url: str | None = None
-):
-    if photo_url:
-        try:
-            await try_send_photo(session, text, photo_url)
-            logger.debug("Telegram photo sent")
-            return
-        except Exception as e:
-            logger.warning(f"Fallback to text, photo failed: {e}")
-            text += f'\n📷 <a href="{photo_url}">[open image]</a>'
-
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    params = {
-        "chat_id": CHAT_ID,
-        "text": text,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": "true",
-    }
-    async with session.post(url, params=params, timeout=15) as resp:
-        if resp.status != 200:
-            data = await resp.text()
-            logger.error(f"Telegram error {resp.status}: {data}")
-        else:
-            logger.debug("Telegram message sent")
+        data = await resp.json()
+    # пауза между запросами — уже после возврата соединения в пул
+    await asyncio.sleep(random.uniform(0.5, 3))
+    return NFTSearchResponse(**data)
 
 
 # -----------------------------------------------------
@@ -205,7 +180,12 @@ async def send_telegram_message(
 # -----------------------------------------------------
 
 SEM = asyncio.Semaphore(MAX_CONCURRENCY)
-NOTIFIED_NFTS: Set[str] = set()
+# алерты уходят в фоне и не тормозят скан: очередь, лимит на чат, spool
+NOTIFIER = TelegramNotifier.for_service("portal", BOT_TOKEN)
+# отправленные алерты: Redis с TTL + локальный LRU, переживает рестарты
+NOTIFIED_NFTS = AlertDedup("portals")
+# collection_id -> floor_price на момент последнего успешного скана
+FLOORS: Dict[str, str] = {}
 
 
 async def process_collection(session: aiohttp.ClientSession, coll: Collection):
@@ -215,6 +195,7 @@ async def process_collection(session: aiohttp.ClientSession, coll: Collection):
         except Exception as exc:
             logger.error(f"{coll.short_name}: NFT fetch failed — {exc}")
             return
+    FLOORS[coll.id] = coll.floor_price
 
     results = resp.results
     if len(results) < 2:
@@ -236,42 +217,63 @@ async def process_collection(session: aiohttp.ClientSession, coll: Collection):
 
     PRICE_GAP_GAUGE.labels(collection=coll.name).set(diff_pct)
 
-    if diff_pct > THRESHOLD_PERCENT and results[0].id not in NOTIFIED_NFTS:
+    if diff_pct > THRESHOLD_PERCENT and await NOTIFIED_NFTS.claim(results[0].id):
         nft = results[0]
         nft_link = f"https://t.me/portals/market?startapp=gift_{nft.id}"
         msg = (
-            f"<b>{coll.name}</b> — price gap {diff_pct:.2f}%\n"
+            f"<b>{html.escape(coll.name)}</b> — price gap {diff_pct:.2f}%\n"
             f"1️⃣ {p1} TON\n2️⃣ {p2} TON\n"
-            f'<a href="{nft_link}">Gift Link</a>'
+            f'<a href="{html.escape(nft_link)}">Gift Link</a>'
         )
-        await send_telegram_message(session, msg, nft.photo_url)
-        exit(0)
-        NOTIFIED_NFTS.add(nft.id)
+        NOTIFIER.notify(CHAT_ID, msg, nft.photo_url)
 
 
-async def run_cycle(session: aiohttp.ClientSession):
+def changed_collections(
+    collections: List[Collection], full_rescan: bool
+) -> List[Collection]:
+    """Коллекции, которые нужно перезапросить: новые или со сменившимся floor."""
+    if full_rescan:
+        return list(collections)
+    return [c for c in collections if FLOORS.get(c.id) != c.floor_price]
+
+
+async def run_cycle(session: aiohttp.ClientSession, full_rescan: bool = False):
     try:
         coll_resp = await fetch_collections(session)
     except Exception as exc:
         logger.error(f"Failed to fetch collections: {exc}")
         return
 
-    tasks = [process_collection(session, c) for c in coll_resp.collections]
+    changed = changed_collections(coll_resp.collections, full_rescan)
+    COLLECTION_SCANS.labels(reason="full" if full_rescan else "floor").inc(
+        len(changed)
+    )
+    tasks = [process_collection(session, c) for c in changed]
     await asyncio.gather(*tasks)
 
 
 async def scheduler():
-    async with aiohttp.ClientSession() as session:
-        while True:
-            try:
-                await run_cycle(session)
-            except Exception as e:
-                logger.error(f"error run_cycle: {e}")
-            finally:
-                await asyncio.sleep(INTERVAL_SEC)
+    last_full = float("-inf")
+    await NOTIFIER.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            while True:
+                now = asyncio.get_running_loop().time()
+                full_rescan = now - last_full >= FULL_RESCAN_SEC
+                if full_rescan:
+                    last_full = now
+                try:
+                    await run_cycle(session, full_rescan)
+                except Exception as e:
+                    logger.error(f"error run_cycle: {e}")
+                finally:
+                    await asyncio.sleep(INTERVAL_SEC)
+    finally:
+        await NOTIFIER.stop()
 
 
 if __name__ == "__main__":
+    setup_logging("portal")
     start_http_server(8003)
     try:
         asyncio.run(scheduler())
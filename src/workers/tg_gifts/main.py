@@ -1,36 +1,38 @@
 import cloudscraper
 import asyncio
-import aiohttp
+import html
 import json
 from loguru import logger
-import re
 import os
-import itertools
-from prometheus_client import start_http_server, Gauge
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from prometheus_client import start_http_server, Counter, Gauge, Histogram
+
+from src.core.clients.telegram.notifier import TelegramNotifier
+from src.core.log import setup_logging
+from src.core.repositories.alert_dedup import AlertDedup
+from src.workers.tg_gifts.rarity import RarityBook
+from src.workers.tg_gifts.snapshot import MarketSnapshot
 
 BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
 CHAT_ID = int(os.getenv("TELEGRAM_GIFTS_GROUP_ID"))
+# параллельных запросов к Tonnel за проход и пауза между проходами
+SWEEP_CONCURRENCY = int(os.getenv("TG_GIFTS_CONCURRENCY", "8"))
+SWEEP_PAUSE_SEC = float(os.getenv("TG_GIFTS_SWEEP_PAUSE_SEC", "5"))
+# снапшот всего рынка (глубокая пагинация); 0 — выключен
+SNAPSHOT_INTERVAL_SEC = float(os.getenv("TG_GIFTS_SNAPSHOT_INTERVAL_SEC", "0"))
+SNAPSHOT_BUDGET_MB = float(os.getenv("TG_GIFTS_SNAPSHOT_BUDGET_MB", "16"))
+SNAPSHOT_PAGE_SIZE = int(os.getenv("TG_GIFTS_SNAPSHOT_PAGE_SIZE", "30"))
 
 
-GIFTS_FOUND = set()
-
-
-def calc_top(l: list[float], value: float) -> float:
-    l.sort()
-    for i in range(len(l) - 1):
-        if l[i] == value and l[i] != l[i + 1]:
-            return round((i + 1) / len(l), 2)
-        elif value < l[i]:
-            return round((i) / len(l), 2)
-        elif value < l[i + 1]:
-            return round((i + 1) / len(l), 2)
-
-    return 1.0
-
-
-def parse_percentage(s: str) -> float | None:
-    m = re.search(r"\(([\d.]+)%\)", s)
-    return float(m.group(1)) if m else None
+# отправленные алерты: Redis с TTL + локальный LRU, переживает рестарты
+GIFTS_FOUND = AlertDedup("tonnel")
+# алерты уходят в фоне: очередь, лимит на чат, дайджесты, spool на диске
+NOTIFIER = TelegramNotifier.for_service("tg-gifts", BOT_TOKEN)
+# распределения атрибутов по всем увиденным лотам, а не по одной странице
+RARITY = RarityBook()
 
 
 GIFTS = [
@@ -115,13 +117,17 @@ GIFTS = [
 API_URL = "https://gifts2.tonnel.network/api/pageGifts"
 
 
-scraper = cloudscraper.create_scraper(
-    browser={
-        "platform": "linux",
-        "browser": "chrome",
-        "mobile": False,
-    }
+SCRAPER_BROWSER = {
+    "platform": "linux",
+    "browser": "chrome",
+    "mobile": False,
+}
+SWEEP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=SWEEP_CONCURRENCY, thread_name_prefix="tonnel"
 )
+_thread_local = threading.local()
+
+scraper = cloudscraper.create_scraper(browser=SCRAPER_BROWSER)
 scraper.get("https://gifts2.tonnel.network/")
 cookie_header = "; ".join(f"{c.name}={c.value}" for c in scraper.cookies)
 HEADERS = {
@@ -146,20 +152,17 @@ HEADERS = {
 }
 
 
-async def send_telegram_message(text: str):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    params = {"chat_id": CHAT_ID, "text": text, "parse_mode": "HTML"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            if resp.status != 200:
-                data = await resp.text()
-                logger.error(f"Ошибка отправки в Telegram: {resp.status}, {data}")
-            else:
-                logger.debug("Сообщение успешно отправлено в Telegram.")
+def _scraper():
+    """cloudscraper-сессия на поток пула: requests.Session не делим между потоками."""
+    local = getattr(_thread_local, "scraper", None)
+    if local is None:
+        local = _thread_local.scraper = cloudscraper.create_scraper(
+            browser=SCRAPER_BROWSER
+        )
+    return local
 
 
-async def fetch_page_gifts(
-    session: aiohttp.ClientSession,
+def fetch_page_gifts(
     *,
     page: int = 1,
     limit: int = 30,
@@ -170,6 +173,7 @@ async def fetch_page_gifts(
     price_range: None | dict = None,
     user_auth: str = "",
 ) -> dict | str:
+    """Блокирующий запрос pageGifts; вызывается в потоках SWEEP_EXECUTOR."""
     if gift_names is None:
         gift_names = []
     if sort_fields is None:
@@ -198,10 +202,7 @@ async def fetch_page_gifts(
         "user_auth": user_auth,
     }
 
-    def sync_post():
-        return scraper.post(API_URL, headers=HEADERS, json=payload)
-
-    response = await asyncio.to_thread(sync_post)
+    response = _scraper().post(API_URL, headers=HEADERS, json=payload, timeout=30)
 
     content_type = response.headers.get("Content-Type", "")
     if content_type.startswith("application/json"):
@@ -213,90 +214,211 @@ async def fetch_page_gifts(
 
 
 PRICE_GAUGE = Gauge("gifts_price", "Price of gift at specific rank", ["gift", "rank"])
+SWEEP_DURATION = Histogram(
+    "gifts_sweep_duration_seconds",
+    "Duration of one sweep over all gifts",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+GIFT_UPDATED = Gauge(
+    "gifts_last_update_timestamp_seconds",
+    "Unix time of the last successful price update of a gift "
+    "(freshness = time() - value)",
+    ["gift"],
+)
+GIFT_FETCH_ERRORS = Counter(
+    "gifts_fetch_errors_total", "Failed or unparsable gift page fetches", ["gift"]
+)
+GIFT_PRICE_PERCENTILE = Gauge(
+    "gifts_price_percentile",
+    "Listing price percentile of a gift over the full-market snapshot",
+    ["gift", "quantile"],
+)
+GIFT_LISTINGS = Gauge(
+    "gifts_snapshot_listings", "Listings of a gift in the last snapshot", ["gift"]
+)
+SNAPSHOT_BYTES = Gauge(
+    "gifts_snapshot_bytes",
+    "Memory held by the last snapshot: listing arrays and rarity columns",
+)
+SNAPSHOT_DURATION = Histogram(
+    "gifts_snapshot_duration_seconds",
+    "Duration of one full-market snapshot",
+    buckets=(10, 30, 60, 120, 300, 600, 1200),
+)
 
 
-async def main():
-    start_http_server(8002)
+async def fetch_gift(gift: str, page: int = 1, limit: int = 30) -> list[dict] | None:
+    """Страница лотов подарка по возрастанию цены или None при ошибке."""
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            SWEEP_EXECUTOR,
+            partial(
+                fetch_page_gifts,
+                page=page,
+                limit=limit,
+                gift_names=[gift],
+                asset="TON",
+                sort_fields={"price": 1, "gift_id": -1},
+            ),
+        )
+    except Exception as e:
+        GIFT_FETCH_ERRORS.labels(gift=gift).inc()
+        logger.error("{}: fetch failed: {}", gift, e)
+        return None
+
+    body = result["body"]
+    if result["status"] != 200 or not isinstance(body, list):
+        GIFT_FETCH_ERRORS.labels(gift=gift).inc()
+        logger.warning("{}: unexpected response {}: {}", gift, result["status"], body)
+        return None
+    return body
+
+
+def _escaped(item: dict) -> dict:
+    """Поля лота для текста алерта (parse_mode=HTML): данные маркета экранируются."""
+    return {
+        key: html.escape(str(item[key]))
+        for key in ("name", "gift_num", "model", "symbol", "backdrop")
+    }
+
 
-    for gift in itertools.cycle(GIFTS):
+async def process_gift(gift: str, body: list[dict]) -> None:
+    logger.info("parse gift: {}", gift)
+    GIFT_UPDATED.labels(gift=gift).set(time.time())
+    if len(body) == 0:
+        return
+
+    if len(body) >= 1:
+        PRICE_GAUGE.labels(gift=gift, rank="1").set(body[0]["price"])
+    if len(body) >= 3:
+        PRICE_GAUGE.labels(gift=gift, rank="3").set(body[2]["price"])
+    if len(body) >= 5:
+        PRICE_GAUGE.labels(gift=gift, rank="5").set(body[4]["price"])
+    if len(body) >= 10:
+        PRICE_GAUGE.labels(gift=gift, rank="10").set(body[9]["price"])
+
+    first = body[0]
+    floor = first["price"]
+    RARITY.observe(gift, body)
+    ranks = RARITY.ranks(gift, body)
+
+    for i, item in enumerate(body, start=1):
+        gift_id = item["gift_id"]
+
+        if (
+            all(x <= 0.01 for x in ranks[i - 1])
+            and item["price"] < floor * 1.1
+            and await GIFTS_FOUND.claim(gift_id)
+        ):
+            text = _escaped(item)
+            message = (
+                f"Редкий предмет"
+                f"Name: {text['name']} (gift_num: {text['gift_num']})\n"
+                f"price: {item['price']} (+{round(100 * (item['price'] / floor) - 100, 2)}%)\n"
+                f"Model {text['model']}%\n"
+                f"Symbol {text['symbol']}%\n"
+                f"Backdrop {text['backdrop']}%\n"
+                f"Buy: @Tonnel_Network_bot"
+            )
+            NOTIFIER.notify(CHAT_ID, message)
+
+        elif (
+            i == 2
+            and floor * 1.15 < item["price"]
+            and await GIFTS_FOUND.claim(first["gift_id"])
+        ):
+            text = _escaped(first)
+            message = (
+                f"Дешевый предмет (дешевле на {round(100 * (item['price'] / floor) - 100, 2)}%)\n"
+                f"Name: {text['name']} (gift_num: {text['gift_num']})\n"
+                f"price: {round(first['price'], 3)}\n"
+                f"Model {text['model']}\n"
+                f"Symbol {text['symbol']}\n"
+                f"Backdrop {text['backdrop']}\n"
+                f"Buy: @Tonnel_Network_bot"
+            )
+            NOTIFIER.notify(CHAT_ID, message)
+
+
+async def _sweep_one(gift: str) -> None:
+    body = await fetch_gift(gift)
+    if body is None:
+        return
+    try:
+        await process_gift(gift, body)
+    except Exception as e:
+        logger.error("{}: processing failed: {}", gift, e)
+
+
+async def sweep(gifts: list[str]) -> None:
+    """
+    Один проход по всем подаркам: запросы идут параллельно в
+    SWEEP_EXECUTOR (не больше SWEEP_CONCURRENCY одновременно), каждый
+    подарок обрабатывается сразу по приходу своей страницы.
+    """
+    with SWEEP_DURATION.time():
+        await asyncio.gather(*(_sweep_one(gift) for gift in gifts))
+
+
+def _report_snapshot(snapshot: MarketSnapshot) -> None:
+    for gift, listings in snapshot.gifts.items():
+        GIFT_LISTINGS.labels(gift=gift).set(len(listings))
+        for name, price in listings.price_percentiles().items():
+            GIFT_PRICE_PERCENTILE.labels(gift=gift, quantile=name).set(price)
+        RARITY.load_snapshot(gift, listings.attrs)
+    SNAPSHOT_BYTES.set(snapshot.nbytes + RARITY.nbytes)
+    logger.info(
+        "Snapshot: {} listings, {} bytes + {} bytes of rarity columns",
+        sum(len(listings) for listings in snapshot.gifts.values()),
+        snapshot.nbytes,
+        RARITY.nbytes,
+    )
+
+
+async def snapshot_forever() -> None:
+    """
+    Раз в SNAPSHOT_INTERVAL_SEC: все лоты всех подарков (в пределах
+    SNAPSHOT_BUDGET_MB), перцентили цены в метрики, атрибуты — в RARITY.
+    Снапшот держит только snapshot.gifts: ссылки на лоты не переживают
+    отчёт, иначе прошлый снапшот жил бы во время build() рядом с новым.
+    """
+    snapshot = MarketSnapshot(
+        fetch_gift,
+        budget_bytes=int(SNAPSHOT_BUDGET_MB * 2**20),
+        page_size=SNAPSHOT_PAGE_SIZE,
+        pages_in_flight=SWEEP_CONCURRENCY,
+    )
+    while True:
         try:
-            async with aiohttp.ClientSession() as session:
-                result1 = await fetch_page_gifts(
-                    session,
-                    page=1,
-                    limit=30,
-                    gift_names=[gift],
-                    asset="TON",
-                    sort_fields={"price": 1, "gift_id": -1},
-                    ref=0,
-                    price_range=None,
-                    user_auth="",
-                )
-                logger.info(f"parse gift: {gift}")
-                body = result1["body"]
-                if len(body) == 0:
-                    continue
-
-                if len(body) >= 1:
-                    PRICE_GAUGE.labels(gift=gift, rank="1").set(body[0]["price"])
-                if len(body) >= 3:
-                    PRICE_GAUGE.labels(gift=gift, rank="3").set(body[2]["price"])
-                if len(body) >= 5:
-                    PRICE_GAUGE.labels(gift=gift, rank="5").set(body[4]["price"])
-                if len(body) >= 10:
-                    PRICE_GAUGE.labels(gift=gift, rank="10").set(body[9]["price"])
-
-                model_perc, symbol_perc, backdrop_perc = [], [], []
-                first = body[0]
-                floor = first["price"]
-                for item in body:
-                    model_perc.append(parse_percentage(item["model"]))
-                    symbol_perc.append(parse_percentage(item["symbol"]))
-                    backdrop_perc.append(parse_percentage(item["backdrop"]))
-
-                for i, item in enumerate(body, start=1):
-                    gift_id = item["gift_id"]
-                    model_top = calc_top(model_perc, parse_percentage(item["model"]))
-                    symbol_top = calc_top(model_perc, parse_percentage(item["symbol"]))
-                    backdrop_top = calc_top(
-                        model_perc, parse_percentage(item["backdrop"])
-                    )
-
-                    if (
-                        all(x <= 0.01 for x in (model_top, symbol_top, backdrop_top))
-                        and item["price"] < floor * 1.1
-                        and gift_id not in GIFTS_FOUND
-                    ):
-                        message = (
-                            f"Редкий предмет"
-                            f"Name: {item['name']} (gift_num: {item['gift_num']})\n"
-                            f"price: {item['price']} (+{round(100 * (item['price'] / floor) - 100, 2)}%)\n"
-                            f"Model {item['model']}%\n"
-                            f"Symbol {item['symbol']}%\n"
-                            f"Backdrop {item['backdrop']}%\n"
-                            f"Buy: @Tonnel_Network_bot"
-                        )
-                        GIFTS_FOUND.add(gift_id)
-                        await send_telegram_message(message)
-
-                    elif (
-                        i == 2
-                        and floor * 1.15 < item["price"]
-                        and first["gift_id"] not in GIFTS_FOUND
-                    ):
-                        message = (
-                            f"Дешевый предмет (дешевле на {round(100 * (item['price'] / floor) - 100, 2)}%)\n"
-                            f"Name: {first['name']} (gift_num: {first['gift_num']})\n"
-                            f"price: {round(first['price'], 3)}\n"
-                            f"Model {first['model']}\n"
-                            f"Symbol {first['symbol']}\n"
-                            f"Backdrop {first['backdrop']}\n"
-                            f"Buy: @Tonnel_Network_bot"
-                        )
-                        GIFTS_FOUND.add(first["gift_id"])
-                        await send_telegram_message(message)
+            with SNAPSHOT_DURATION.time():
+                await snapshot.build(GIFTS)
+            _report_snapshot(snapshot)
         except Exception as e:
-            logger.error(f"ERROR: {e}")
+            logger.error("Snapshot failed: {}", e)
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SEC)
+
+
+async def main():
+    setup_logging("tg-gifts")
+    start_http_server(8002)
+    await NOTIFIER.start()
+    snapshots = None
+    if SNAPSHOT_INTERVAL_SEC > 0:
+        snapshots = asyncio.create_task(snapshot_forever())
+
+    try:
+        while True:
+            started = time.monotonic()
+            await sweep(GIFTS)
+            logger.info(
+                "Swept {} gifts in {:.1f}s", len(GIFTS), time.monotonic() - started
+            )
+            await asyncio.sleep(SWEEP_PAUSE_SEC)
+    finally:
+        if snapshots is not None:
+            snapshots.cancel()
+        await NOTIFIER.stop()
 
 
 if __name__ == "__main__":
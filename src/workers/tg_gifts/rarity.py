@@ -0,0 +1,144 @@
+"""
+Редкость атрибутов подарков (model / symbol / backdrop).
+
+Редкость атрибута — процент из строки вида "Plush (0.5%)"; чем меньше,
+тем реже. Ранг лота по атрибуту — доля известных лотов с процентом не больше
+его (bisect_right по отсортированной колонке), т.е. ранг <= 0.01 — лот
+среди 1% самых редких.
+Колонки сортируются один раз на обновление распределения, ранги всей
+страницы считаются бинпоиском. RarityBook держит скользящее распределение
+по каждому подарку: лоты копятся между страницами и проходами (каждый лот —
+один раз, по gift_num), так что редкость оценивается по рынку, а не только
+по 30 самым дешёвым объявлениям текущей страницы. Если есть снапшот рынка,
+распределение подарка — отсортированные array("d") колонки из его лотов
+(COLUMN_BYTES_PER_LISTING на лот, в бюджете снапшота); скользящее окно
+для такого подарка не ведётся.
+"""
+
+import math
+import re
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+
+ATTRIBUTES = ("model", "symbol", "backdrop")
+# сколько последних лотов подарка держать в распределении
+MAX_LISTINGS = 5000
+# колонки снапшота: по double на атрибут лота
+COLUMN_BYTES_PER_LISTING = 8 * len(ATTRIBUTES)
+
+
+def parse_percentage(s: str) -> float | None:
+    m = re.search(r"\(([\d.]+)%\)", s)
+    return float(m.group(1)) if m else None
+
+
+def sorted_column(values: Iterable[float | None]) -> array:
+    return array("d", sorted(v for v in values if v is not None))
+
+
+def percentile_ranks(
+    column: Sequence[float], values: Iterable[float | None]
+) -> list[float]:
+    """
+    Ранги значений по отсортированной колонке. Неизвестный процент
+    (None) и пустая колонка дают 1.0 — «не редкий».
+    """
+    n = len(column)
+    return [
+        bisect_right(column, v) / n if v is not None and n else 1.0 for v in values
+    ]
+
+
+def item_percentages(item: dict) -> tuple[float | None, ...]:
+    return tuple(parse_percentage(item[attr]) for attr in ATTRIBUTES)
+
+
+def _ranks(
+    columns: Sequence[array], percents: Sequence[tuple[float | None, ...]]
+) -> list[tuple[float, ...]]:
+    per_attribute = [
+        percentile_ranks(column, (p[i] for p in percents))
+        for i, column in enumerate(columns)
+    ]
+    return list(zip(*per_attribute))
+
+
+def page_ranks(items: Sequence[dict]) -> list[tuple[float, ...]]:
+    """Ранги (model, symbol, backdrop) лотов относительно самой страницы."""
+    percents = [item_percentages(item) for item in items]
+    columns = [
+        sorted_column(p[i] for p in percents) for i in range(len(ATTRIBUTES))
+    ]
+    return _ranks(columns, percents)
+
+
+class RarityBook:
+    """Скользящие распределения атрибутов по подаркам."""
+
+    def __init__(self, max_listings: int = MAX_LISTINGS):
+        self.max_listings = max_listings
+        # gift -> {gift_num: (model%, symbol%, backdrop%)} в порядке обновления
+        self._listings: dict[str, OrderedDict] = {}
+        self._columns: dict[str, list[array]] = {}
+        # gift -> колонки последнего снапшота рынка
+        self._snapshots: dict[str, list[array]] = {}
+
+    @property
+    def nbytes(self) -> int:
+        """Память колонок снапшотов."""
+        return sum(
+            column.itemsize * len(column)
+            for columns in self._snapshots.values()
+            for column in columns
+        )
+
+    def load_snapshot(self, gift: str, attrs: array) -> None:
+        """
+        Распределение подарка из снапшота: attrs — плоский array("d")
+        процентов, len(ATTRIBUTES) на лот (NaN — неизвестен). Колонки
+        сортируются один раз и заменяют скользящее окно подарка.
+        """
+        width = len(ATTRIBUTES)
+        self._snapshots[gift] = [
+            array("d", sorted(p for p in attrs[i::width] if not math.isnan(p)))
+            for i in range(width)
+        ]
+        self._listings.pop(gift, None)
+        self._columns.pop(gift, None)
+
+    def observe(self, gift: str, items: Iterable[dict]) -> None:
+        self.observe_rows(
+            gift, ((item["gift_num"], item_percentages(item)) for item in items)
+        )
+
+    def observe_rows(
+        self, gift: str, rows: Iterable[tuple[int, tuple[float | None, ...]]]
+    ) -> None:
+        """Добавить лоты (gift_num, проценты); при снапшоте подарка — no-op."""
+        if gift in self._snapshots:
+            return
+        listings = self._listings.setdefault(gift, OrderedDict())
+        for gift_num, percents in rows:
+            listings[gift_num] = percents
+            listings.move_to_end(gift_num)
+        while len(listings) > self.max_listings:
+            listings.popitem(last=False)
+        self._columns.pop(gift, None)
+
+    def columns(self, gift: str) -> list[array]:
+        """Отсортированные колонки подарка; пересобираются после observe."""
+        columns = self._snapshots.get(gift) or self._columns.get(gift)
+        if columns is None:
+            listings = self._listings.get(gift, {})
+            columns = [
+                sorted_column(p[i] for p in listings.values())
+                for i in range(len(ATTRIBUTES))
+            ]
+            self._columns[gift] = columns
+        return columns
+
+    def ranks(self, gift: str, items: Sequence[dict]) -> list[tuple[float, ...]]:
+        """Ранги (model, symbol, backdrop) лотов по распределению подарка."""
+        return _ranks(self.columns(gift), [item_percentages(i) for i in items])
@@ -0,0 +1,136 @@
+"""
+Снапшот всего рынка Tonnel по подаркам (глубокая пагинация).
+
+Для каждого подарка страницы pageGifts (по цене, по возрастанию) читаются
+окнами по PAGES_PER_GIFT, всего в полёте не больше pages_in_flight страниц.
+Лоты хранятся в плоских array: цена (d), gift_num (q) и три процента
+атрибутов (d, NaN — неизвестен) — 40 байт на лот. Проценты хранятся в
+double, как и колонки RarityBook: во float32 0.3 становится 0.30000001 и
+ранг такого лота по распределению занижается. Отсортированные колонки
+редкости (RarityBook.load_snapshot, ещё 24 байта) живут рядом со снапшотом
+и входят в BYTES_PER_LISTING.
+Память ограничена бюджетом: каждому подарку достаётся равная доля
+budget_bytes / BYTES_PER_LISTING лотов (самые дешёвые), пагинация
+останавливается, как только доля набрана; предыдущий снапшот сбрасывается
+до начала сборки следующего.
+"""
+
+import asyncio
+import math
+from array import array
+from collections.abc import Awaitable, Callable, Iterable, Sequence
+from typing import Optional
+
+from loguru import logger
+
+from src.workers.tg_gifts.rarity import (
+    ATTRIBUTES,
+    COLUMN_BYTES_PER_LISTING,
+    item_percentages,
+)
+
+BYTES_PER_LISTING = 8 + 8 + 8 * len(ATTRIBUTES) + COLUMN_BYTES_PER_LISTING
+PAGES_PER_GIFT = 4
+QUANTILES = {"p1": 0.01, "p5": 0.05, "p25": 0.25, "p50": 0.5}
+
+FetchPage = Callable[[str, int, int], Awaitable[Optional[list[dict]]]]
+
+
+class GiftListings:
+    """Лоты одного подарка в плоских массивах."""
+
+    __slots__ = ("prices", "nums", "attrs")
+
+    def __init__(self):
+        self.prices = array("d")
+        self.nums = array("q")
+        self.attrs = array("d")  # len(ATTRIBUTES) значений на лот
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.prices, self.nums, self.attrs))
+
+    def extend(self, items: Iterable[dict]) -> None:
+        for item in items:
+            self.prices.append(float(item["price"]))
+            self.nums.append(int(item["gift_num"]))
+            self.attrs.extend(
+                math.nan if p is None else p for p in item_percentages(item)
+            )
+
+    def price_percentiles(
+        self, quantiles: dict[str, float] = QUANTILES
+    ) -> dict[str, float]:
+        """Перцентили цены (nearest-rank); пустой подарок — пустой dict."""
+        n = len(self.prices)
+        if not n:
+            return {}
+        prices = sorted(self.prices)
+        return {
+            name: prices[max(math.ceil(q * n), 1) - 1]
+            for name, q in quantiles.items()
+        }
+
+
+class MarketSnapshot:
+    def __init__(
+        self,
+        fetch_page: FetchPage,
+        budget_bytes: int,
+        page_size: int = 30,
+        pages_in_flight: int = 8,
+    ):
+        self.fetch_page = fetch_page
+        self.budget_bytes = budget_bytes
+        self.page_size = page_size
+        self.pages_in_flight = pages_in_flight
+        self.gifts: dict[str, GiftListings] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(listings.nbytes for listings in self.gifts.values())
+
+    def per_gift_cap(self, gift_count: int) -> int:
+        return max(
+            self.page_size, self.budget_bytes // BYTES_PER_LISTING // max(gift_count, 1)
+        )
+
+    async def build(self, gifts: Sequence[str]) -> dict[str, GiftListings]:
+        self.gifts = {}  # старый снапшот не живёт одновременно с новым
+        cap = self.per_gift_cap(len(gifts))
+        semaphore = asyncio.Semaphore(self.pages_in_flight)
+        results = await asyncio.gather(
+            *(self._gift(gift, cap, semaphore) for gift in gifts)
+        )
+        self.gifts = dict(zip(gifts, results))
+        return self.gifts
+
+    async def _page(
+        self, gift: str, page: int, semaphore: asyncio.Semaphore
+    ) -> Optional[list[dict]]:
+        async with semaphore:
+            return await self.fetch_page(gift, page, self.page_size)
+
+    async def _gift(
+        self, gift: str, cap: int, semaphore: asyncio.Semaphore
+    ) -> GiftListings:
+        listings = GiftListings()
+        max_pages = math.ceil(cap / self.page_size)
+        page = 1
+        while page <= max_pages:
+            window = range(page, min(page + PAGES_PER_GIFT, max_pages + 1))
+            bodies = await asyncio.gather(
+                *(self._page(gift, p, semaphore) for p in window)
+            )
+            for number, body in zip(window, bodies):  # страницы по порядку цены
+                if body is None:
+                    logger.warning("{}: snapshot page {} failed", gift, number)
+                    return listings
+                listings.extend(body[: cap - len(listings)])
+                if len(body) < self.page_size or len(listings) >= cap:
+                    return listings
+            page += len(window)
+        return listings
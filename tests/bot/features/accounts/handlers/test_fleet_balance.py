@@ -0,0 +1,63 @@
+import asyncio
+
+from src.bot.features.accounts.handlers import fleet_balance
+
+# aiogram при импорте ставит политику uvloop — остальные тесты ждут стандартный цикл
+asyncio.set_event_loop_policy(None)
+
+
+class _Client:
+    def __init__(self, account_id, active, delay=0.01, error=None):
+        self.account_id = account_id
+        self.active = active
+        self.delay = delay
+        self.error = error
+
+    async def get_total_token_quantities(self):
+        self.active["now"] += 1
+        self.active["peak"] = max(self.active["peak"], self.active["now"])
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return type("Totals", (), {"totals": {"SOL": self.account_id}})()
+        finally:
+            self.active["now"] -= 1
+
+
+def test_fetch_totals_caps_concurrency_and_reports_progress(monkeypatch):
+    monkeypatch.setattr(fleet_balance, "CONCURRENCY", 3)
+    active = {"now": 0, "peak": 0}
+    clients = {i: _Client(i, active) for i in range(1, 10)}
+    clients[5].error = ConnectionError("timeout")
+    reports = []
+
+    async def progress(done, errors):
+        reports.append((done, errors))
+
+    quantities, failed = asyncio.run(fleet_balance._fetch_totals(clients, progress))
+
+    assert active["peak"] == 3
+    assert quantities == {i: {"SOL": i} for i in clients if i != 5}
+    assert failed == {5: "timeout"}
+    assert [done for done, _ in reports] == list(range(1, 10))
+    assert reports[-1] == (9, 1)
+
+
+def test_fetch_totals_cancels_pending_requests():
+    active = {"now": 0, "peak": 0}
+    clients = {i: _Client(i, active, delay=10) for i in range(1, 4)}
+
+    async def progress(done, errors):
+        pass
+
+    async def scenario():
+        fetch = asyncio.create_task(fleet_balance._fetch_totals(clients, progress))
+        await asyncio.sleep(0.01)
+        assert active["now"] == 3
+        fetch.cancel()
+        await asyncio.gather(fetch, return_exceptions=True)
+        await asyncio.sleep(0)
+        return active["now"]
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.core.clients.exchanges.backpack import cache
+from src.core.clients.exchanges.backpack.cache import ClientCache, clients
+from src.core.models import Account, FakeHeader, Proxy
+from src.core.repositories import accounts as accounts_repo
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = ClientCache(maxsize=2, ttl=10)
+
+    lru.put(1, "c1")
+    lru.put(2, "c2")
+    assert lru.get(1) == "c1"  # 1 становится самым свежим
+    lru.put(3, "c3")  # вытесняет 2
+    assert lru.get(2) is None
+    assert (lru.get(1), lru.get(3)) == ("c1", "c3")
+
+    now[0] = 10.5
+    assert lru.get(1) is None and lru.get(3) is None
+
+
+def _fire(model, event_name, target):
+    mapper = inspect(model)
+    getattr(mapper.dispatch, event_name)(mapper, None, inspect(target))
+
+
+def test_orm_updates_invalidate_account_clients():
+    clients.clear()
+    for account_id in (1, 2, 3, 4):
+        clients.put(account_id, f"client-{account_id}")
+
+    proxy = Proxy()
+    set_committed_value(proxy, "account_id", 1)
+    proxy.account_id = 2  # прокси переехал: сбрасываются оба аккаунта
+    _fire(Proxy, "after_update", proxy)
+    assert clients.get(1) is None and clients.get(2) is None
+
+    header = FakeHeader()
+    set_committed_value(header, "account_id", 3)
+    _fire(FakeHeader, "after_update", header)
+    assert clients.get(3) is None
+
+    account = Account()
+    set_committed_value(account, "id", 4)
+    _fire(Account, "after_update", account)
+    assert clients.get(4) is None
+
+
+def test_get_client_by_account_id_is_served_from_cache(monkeypatch):
+    def no_db():
+        raise AssertionError("cache hit must not touch the database")
+
+    monkeypatch.setattr(accounts_repo.pg, "session_maker", no_db)
+    cached = SimpleNamespace(api_key="k")
+    clients.put(42, cached)
+
+    assert asyncio.run(accounts_repo.get_backpack_client_by_account_id(42)) is cached
+    clients.invalidate(42)
+
+
+class _Session:
+    """Сессия-заглушка: execute отдаёт заранее заданные строки."""
+
+    def __init__(self, rows, statements):
+        self.rows = rows
+        self.statements = statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return iter(self.rows)
+
+
+def test_get_backpack_clients_loads_cache_misses_in_one_query(monkeypatch):
+    clients.clear()
+    clients.put(1, "cached-1")
+    statements = []
+    account2, account3 = SimpleNamespace(id=2), SimpleNamespace(id=3)
+    # у аккаунта 2 два набора заголовков — берётся первая строка
+    rows = [
+        (account2, "proxy-2", "h1"),
+        (account2, "proxy-2", "h2"),
+        (account3, None, None),
+    ]
+    monkeypatch.setattr(
+        accounts_repo.pg, "session_maker", lambda: _Session(rows, statements)
+    )
+    monkeypatch.setattr(
+        accounts_repo,
+        "build_backpack_client",
+        lambda account, proxy, header: (account.id, proxy, header),
+    )
+
+    found = asyncio.run(accounts_repo.get_backpack_clients([1, 2, 3, 4]))
+
+    assert found == {1: "cached-1", 2: (2, "proxy-2", "h1"), 3: (3, None, None)}
+    assert len(statements) == 1
+    assert [2, 3, 4] in statements[0].compile().params.values()
+
+    # второй раз всё из кэша, без запроса
+    again = asyncio.run(accounts_repo.get_backpack_clients([2, 3]))
+    assert again == {2: found[2], 3: found[3]}
+    assert len(statements) == 1
+    clients.clear()
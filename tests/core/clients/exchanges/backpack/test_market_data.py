@@ -0,0 +1,43 @@
+import asyncio
+
+from src.core.clients.exchanges.backpack.market_data import MarketDataCache
+
+
+def test_concurrent_misses_are_coalesced():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"asks": [["1", "1"]], "bids": []}
+
+    async def scenario():
+        cache = MarketDataCache(default_ttl=60)
+        results = await asyncio.gather(
+            *(cache.get("depth", "SOL_USDC", fetch) for _ in range(20))
+        )
+        again = await cache.get("depth", "SOL_USDC", fetch)
+        return results, again
+
+    results, again = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert again is results[0]
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"error": "proxy_failure"}
+
+    async def scenario():
+        cache = MarketDataCache(default_ttl=60)
+        await cache.get("depth", "SOL_USDC", fetch)
+        await cache.get("depth", "SOL_USDC", fetch)
+
+    asyncio.run(scenario())
+
+    assert len(calls) == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+from src.core.clients.exchanges.backpack import orders
+from src.core.clients.exchanges.backpack.orders import client_id_for, submit_order
+from src.core.repositories.orders import LedgerWriter
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+        self.history = []
+
+    async def create_order(self, **params):
+        self.sent.append(params)
+        return self.responses.pop(0)
+
+    async def get_order_history(self, symbol=None, limit=100):
+        return self.history
+
+
+def test_client_id_is_deterministic_uint32():
+    cid = client_id_for(1, "pool:1:w5:buy:SOL_USDC")
+    assert cid == client_id_for(1, "pool:1:w5:buy:SOL_USDC")
+    assert cid != client_id_for(2, "pool:1:w5:buy:SOL_USDC")
+    assert 0 <= cid < 2**32
+
+
+def test_timeout_then_retry_does_not_duplicate(monkeypatch):
+    async def no_entry(account_id, client_id):
+        return None
+
+    ledger = LedgerWriter(load=no_entry)
+    monkeypatch.setattr(orders, "ledger", ledger)
+    client = FakeClient([{"error": "proxy_failure", "message": "timeout"}])
+    kwargs = dict(
+        account_id=1, intent="i1", symbol="SOL_USDC", side="Bid", quantity="1"
+    )
+
+    async def scenario():
+        first = await submit_order(client, **kwargs)
+        cid = client.sent[0]["clientId"]
+        pending = await ledger.find(1, cid)
+        # ордер всё-таки дошёл до биржи — повтор должен его найти
+        client.history = [{"id": "42", "clientId": cid, "status": "Filled"}]
+        second = await submit_order(client, **kwargs)
+        third = await submit_order(client, **kwargs)
+        return first, pending, second, third, await ledger.find(1, cid)
+
+    first, pending, second, third, entry = asyncio.run(scenario())
+
+    assert first["error"] == "proxy_failure"
+    assert pending["status"] == "pending"
+    assert second["id"] == "42"
+    assert third["duplicate"] is True
+    assert len(client.sent) == 1
+    assert entry["status"] == "Filled" and entry["order_id"] == "42"
+
+
+def test_failed_lookup_leaves_pending_order_unsent(monkeypatch):
+    async def no_entry(account_id, client_id):
+        return None
+
+    ledger = LedgerWriter(load=no_entry)
+    monkeypatch.setattr(orders, "ledger", ledger)
+    client = FakeClient(
+        [{"error": "proxy_failure", "message": "timeout"}, {"id": "7", "status": "New"}]
+    )
+    kwargs = dict(
+        account_id=1, intent="i2", symbol="SOL_USDC", side="Ask", quantity="1"
+    )
+
+    async def scenario():
+        await submit_order(client, **kwargs)
+        cid = client.sent[0]["clientId"]
+        client.history = None  # история недоступна: неизвестно, дошёл ли ордер
+        unknown = await submit_order(client, **kwargs)
+        pending = dict(await ledger.find(1, cid))
+        client.history = []  # история получена, ордера в ней нет — повтор
+        resent = await submit_order(client, **kwargs)
+        return cid, unknown, pending, resent, await ledger.find(1, cid)
+
+    cid, unknown, pending, resent, entry = asyncio.run(scenario())
+
+    assert unknown["error"] == "order_status_unknown"
+    assert pending["status"] == "pending"
+    assert resent["id"] == "7"
+    assert [sent["clientId"] for sent in client.sent] == [cid, cid]
+    assert entry["status"] == "New" and entry["order_id"] == "7"
+
+
+def test_client_id_collision_with_older_intent_is_rehashed(monkeypatch):
+    taken = client_id_for(1, "i3")
+
+    async def load(account_id, client_id):
+        return None
+
+    ledger = LedgerWriter(load=load)
+    # старое намерение с тем же clientId (коллизия 32-битного хеша)
+    ledger.record(
+        {"account_id": 1, "client_id": taken, "intent": "old", "status": "Filled"}
+    )
+    monkeypatch.setattr(orders, "ledger", ledger)
+    client = FakeClient([{"id": "9", "status": "New"}])
+    kwargs = dict(
+        account_id=1, intent="i3", symbol="SOL_USDC", side="Bid", quantity="1"
+    )
+
+    async def scenario():
+        placed = await submit_order(client, **kwargs)
+        again = await submit_order(client, **kwargs)
+        return placed, again, await ledger.find(1, taken)
+
+    placed, again, old = asyncio.run(scenario())
+
+    assert placed["id"] == "9" and again["duplicate"] is True
+    assert client.sent[0]["clientId"] == client_id_for(1, "i3", salt=1) != taken
+    assert old["intent"] == "old" and old["status"] == "Filled"
@@ -0,0 +1,75 @@
+import asyncio
+import base64
+
+from aiohttp import web
+
+from src.core.clients.exchanges.backpack.backpack import (
+    BackpackExchangeClient,
+    order_params,
+)
+from src.core.clients.exchanges.backpack.sessions import sessions
+from src.core.clients.exchanges.backpack.signing import private_key, sign_string
+
+API_KEY = "orders-test"
+API_SECRET = "hq16awOPV0b7gIzwfKgoSreihtjaaBqbbhrsbl966Fs="
+
+
+def test_batch_sign_string_repeats_instruction():
+    orders = [
+        {"symbol": "SOL_USDC", "side": "Ask", "quantity": "1"},
+        {"symbol": "ETH_USDC", "side": "Ask", "quantity": "2"},
+    ]
+
+    assert sign_string("orderExecute", 1, orders) == (
+        "instruction=orderExecute&quantity=1&side=Ask&symbol=SOL_USDC"
+        "&instruction=orderExecute&quantity=2&side=Ask&symbol=ETH_USDC"
+        "&timestamp=1&window=60000"
+    )
+
+
+def test_create_orders_batch_single_round_trip():
+    requests = []
+
+    async def handler(request):
+        body = await request.json()
+        payload = sign_string(
+            "orderExecute", int(request.headers["X-Timestamp"]), body
+        )
+        private_key(API_KEY, API_SECRET).public_key().verify(
+            base64.b64decode(request.headers["X-Signature"]), payload.encode()
+        )
+        requests.append(body)
+        return web.json_response(
+            [{"id": "1", "symbol": body[0]["symbol"]}, {"code": "INVALID_ORDER"}]
+        )
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/api/v1/orders", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        client = BackpackExchangeClient(
+            api_key=API_KEY,
+            api_secret=API_SECRET,
+            base_url=f"http://127.0.0.1:{port}/",
+        )
+        try:
+            return await client.create_orders_batch(
+                [
+                    order_params("SOL_USDC", "Ask", "1"),
+                    order_params("ETH_USDC", "Ask", "0.5"),
+                ]
+            )
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    response = asyncio.run(scenario())
+
+    assert len(requests) == 1 and len(requests[0]) == 2
+    assert [r.success for r in response.results] == [True, False]
+    assert response.results[0].order["symbol"] == "SOL_USDC"
+    assert "INVALID_ORDER" in response.results[1].error
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.clients.exchanges.backpack.ratelimit import (
+    ORDER,
+    PRIVATE_READ,
+    PUBLIC,
+    RateLimiter,
+    TokenBucket,
+    endpoint_class,
+    parse_retry_after,
+)
+from src.core.clients.exchanges.backpack.sessions import sessions
+
+API_SECRET = "hq16awOPV0b7gIzwfKgoSreihtjaaBqbbhrsbl966Fs="
+
+
+def test_endpoint_class():
+    assert endpoint_class("GET", "public") == PUBLIC
+    assert endpoint_class("GET", "balanceQuery") == PRIVATE_READ
+    assert endpoint_class("POST", "orderExecute") == ORDER
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) == 1.0
+    assert parse_retry_after("garbage", default=3) == 3
+    assert parse_retry_after("100000") == 60.0
+
+
+def test_token_bucket_throttles_after_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=20, burst=2)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+        return time.monotonic() - started
+
+    # 2 токена из запаса, ещё 2 по 50 мс
+    assert 0.08 <= asyncio.run(scenario()) < 0.5
+
+
+def test_buckets_are_per_key_and_class():
+    limiter = RateLimiter({PUBLIC: 1, PRIVATE_READ: 1, ORDER: 1})
+    assert limiter.bucket("a", ORDER) is limiter.bucket("a", ORDER)
+    assert limiter.bucket("a", ORDER) is not limiter.bucket("b", ORDER)
+    assert limiter.bucket("a", ORDER) is not limiter.bucket("a", PUBLIC)
+
+
+def test_429_honours_retry_after():
+    calls = []
+
+    async def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return web.json_response({}, status=429, headers={"Retry-After": "0.3"})
+        return web.json_response({"ok": True})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/api/v1/status", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        client = BackpackExchangeClient(
+            api_key="ratelimit-test",
+            api_secret=API_SECRET,
+            base_url=f"http://127.0.0.1:{port}/",
+        )
+        try:
+            return await client.send_public_request("GET", "api/v1/status")
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    assert asyncio.run(scenario()) == {"ok": True}
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.25
+
+
+def test_disconnect_after_send_retries_reads_but_not_orders():
+    calls = []
+
+    async def drop(reader, writer):
+        calls.append(await reader.readline())
+        writer.close()  # запрос дошёл, ответа нет: ServerDisconnectedError
+
+    async def no_proxy_change():
+        return None
+
+    async def scenario():
+        server = await asyncio.start_server(drop, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = BackpackExchangeClient(
+            api_key="disconnect-test",
+            api_secret=API_SECRET,
+            base_url=f"http://127.0.0.1:{port}/",
+        )
+        client.change_proxy = no_proxy_change
+        try:
+            order = await client._send_request(
+                "POST", "api/v1/order", "orderExecute", {"symbol": "SOL_USDC"}
+            )
+            order_calls = len(calls)
+            read = await client._send_request(
+                "GET", "api/v1/capital", "balanceQuery"
+            )
+            return order, order_calls, read
+        finally:
+            await sessions.close()
+            server.close()
+            await server.wait_closed()
+
+    order, order_calls, read = asyncio.run(scenario())
+
+    assert order["error"] == "proxy_failure"
+    assert order_calls == 1
+    assert read["error"] == "proxy_failure"
+    assert len(calls) == 1 + 3
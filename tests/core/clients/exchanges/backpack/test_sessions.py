@@ -0,0 +1,39 @@
+import asyncio
+
+from aiohttp import web
+
+from src.core.clients.exchanges.backpack.sessions import SessionPool
+
+
+def test_pooled_session_does_not_share_response_cookies():
+    async def login(request):
+        response = web.Response(text="ok")
+        response.set_cookie("session", "account-1")
+        return response
+
+    async def echo(request):
+        return web.Response(text=request.headers.get("Cookie", ""))
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/login", login)
+        app.router.add_get("/echo", echo)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        pool = SessionPool()
+        try:
+            session = await pool.get(None)
+            url = f"http://localhost:{port}"  # куки IP-хостов aiohttp не хранит
+            async with session.get(f"{url}/login"):
+                pass
+            # другой аккаунт на той же сессии шлёт только свои cookies
+            async with session.get(f"{url}/echo", cookies={"own": "2"}) as resp:
+                return await resp.text()
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    assert asyncio.run(scenario()) == "own=2"
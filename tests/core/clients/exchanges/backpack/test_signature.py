@@ -1,21 +1,54 @@
+import base64
+
 from src.core.clients.exchanges.backpack.backpack import BackpackExchangeClient
+from src.core.clients.exchanges.backpack.signing import private_key, sign_string
 
+API_KEY = "aapsz3keT9b74txaecFeMInpc4gs5bm2XfRgMjMgOlf="
+API_SECRET = "hq16awOPV0b7gIzwfKgoSreihtjaaBqbbhrsbl966Fs="
 
-def test_signature():
-    client = BackpackExchangeClient(
+
+def _client() -> BackpackExchangeClient:
+    return BackpackExchangeClient(
         base_url="https://api.backpack.exchange",
-        api_key="aapsz3keT9b74txaecFeMInpc4gs5bm2XfRgMjMgOlf=",
-        api_secret="hq16awOPV0b7gIzwfKgoSreihtjaaBqbbhrsbl966Fs=",
+        api_key=API_KEY,
+        api_secret=API_SECRET,
     )
 
-    signature = client._generate_signature(action="buy", timestamp=12345)
+
+def _verify(signature: str, payload: str) -> None:
+    public_key = private_key(API_KEY, API_SECRET).public_key()
+    public_key.verify(base64.b64decode(signature), payload.encode())
+
+
+def test_signature():
+    signature = _client()._generate_signature(instruction="buy", timestamp=12345)
 
     assert (
         signature
-        == "fAcpXXOmq8i4SbBFgeqIUgKxYSHXTsJmBX96HsWfs9uFsLKTXzk7x5iZGVq06v8n2Ptk3zU1BxnYy/RHsaEYDg=="
+        == "/2oNjqSd7pGpmxdCuCV1ryHEI9ilObtNwxTKwehm4opVHjwVfCCXg1h+mX5sBFotUjCGT6FuANPJPzWZX2IRAA=="
     )
+    _verify(signature, "instruction=buy&timestamp=12345&window=60000")
 
 
 def test_signature_with_optional_fields():
-    # TODO
-    pass
+    params = {"symbol": "SOL_USDC", "quantity": "1", "postOnly": True}
+    payload = sign_string("orderExecute", 12345, params)
+
+    assert payload == (
+        "instruction=orderExecute&postOnly=true&quantity=1&symbol=SOL_USDC"
+        "&timestamp=12345&window=60000"
+    )
+    _verify(_client()._generate_signature("orderExecute", 12345, params), payload)
+
+
+def test_headers_reuse_cached_key():
+    client = _client()
+    headers = client.signer.headers("balanceQuery")
+
+    assert private_key(API_KEY, API_SECRET) is client.private_key_obj
+    assert headers["X-API-Key"] == API_KEY
+    assert headers["X-Window"] == "60000"
+    _verify(
+        headers["X-Signature"],
+        f"instruction=balanceQuery&timestamp={headers['X-Timestamp']}&window=60000",
+    )
@@ -0,0 +1,111 @@
+import asyncio
+
+from aiohttp import web
+
+from src.core.clients.exchanges.backpack.stream import BackpackMarketStream, OrderBook
+
+SNAPSHOT = {
+    "asks": [["101", "1"], ["102", "2"]],
+    "bids": [["99", "1"], ["100", "3"]],
+    "lastUpdateId": "10",
+}
+
+
+def _depth(first, last, asks=(), bids=()):
+    return {
+        "stream": "depth.SOL_USDC",
+        "data": {
+            "e": "depth",
+            "s": "SOL_USDC",
+            "U": first,
+            "u": last,
+            "a": list(asks),
+            "b": list(bids),
+        },
+    }
+
+
+def test_order_book_applies_buffered_diffs_after_snapshot():
+    book = OrderBook("SOL_USDC")
+    book.apply(_depth(9, 10, asks=[["101", "5"]])["data"])  # старее снапшота
+    book.apply(_depth(11, 11, asks=[["101", "0"]], bids=[["100.5", "1"]])["data"])
+
+    assert book.load_snapshot(SNAPSHOT)
+    depth = book.depth()
+    assert depth["asks"] == [["102", "2"]]
+    assert depth["bids"] == [["99", "1"], ["100", "3"], ["100.5", "1"]]
+    assert depth["lastUpdateId"] == "11"
+
+
+def test_order_book_detects_sequence_gap():
+    book = OrderBook("SOL_USDC")
+    book.load_snapshot(SNAPSHOT)
+
+    assert not book.apply(_depth(13, 14, asks=[["103", "1"]])["data"])
+    assert not book.synced
+
+
+def test_stream_against_local_server():
+    async def ws_handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        subscribe = await ws.receive_json()
+        assert "depth.SOL_USDC" in subscribe["params"]
+        await ws.send_json(_depth(11, 12, bids=[["100", "0"]]))
+        await ws.send_json(
+            {
+                "stream": "ticker.SOL_USDC",
+                "data": {
+                    "e": "ticker",
+                    "s": "SOL_USDC",
+                    "o": "100",
+                    "c": "110",
+                    "h": "111",
+                    "l": "99",
+                    "v": "10",
+                    "V": "1050",
+                    "n": 7,
+                },
+            }
+        )
+        async for _ in ws:
+            pass
+        return ws
+
+    async def depth_handler(request):
+        await asyncio.sleep(0.05)  # diff'ы приходят раньше снапшота
+        return web.json_response(SNAPSHOT)
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/ws", ws_handler)
+        app.router.add_get("/api/v1/depth", depth_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        stream = BackpackMarketStream(
+            ["SOL_USDC"],
+            ws_url=f"http://127.0.0.1:{port}/ws",
+            rest_url=f"http://127.0.0.1:{port}/",
+        )
+        await stream.start()
+        try:
+            for _ in range(100):
+                depth = stream.get_order_book_depth("SOL_USDC")
+                if depth is not None and stream.get_ticker("SOL_USDC"):
+                    break
+                await asyncio.sleep(0.01)
+            return depth, stream.get_ticker("SOL_USDC")
+        finally:
+            await stream.stop()
+            await runner.cleanup()
+
+    depth, ticker = asyncio.run(scenario())
+
+    assert depth["bids"] == [["99", "1"]]
+    assert depth["lastUpdateId"] == "12"
+    assert ticker["lastPrice"] == "110"
+    assert ticker["priceChangePercent"] == "10.00"
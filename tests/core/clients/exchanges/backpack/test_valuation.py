@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from src.core.clients.exchanges.backpack.schemas import (
+    BalancesResponse,
+    BorrowLendPositionsResponse,
+    TickersResponse,
+)
+from src.core.clients.exchanges.backpack.valuation import (
+    exact_prices,
+    exact_total,
+    holdings,
+    usd_prices,
+    value_portfolios,
+)
+
+
+def _ticker(symbol, price):
+    return {
+        "symbol": symbol,
+        "lastPrice": price,
+        "firstPrice": price,
+        "high": price,
+        "low": price,
+        "priceChange": "0",
+        "priceChangePercent": "0",
+        "quoteVolume": "0",
+        "trades": "0",
+        "volume": "0",
+    }
+
+
+def test_value_many_accounts_in_one_pass():
+    tickers = TickersResponse(
+        tickers=[
+            _ticker("SOL_USDC", "150"),
+            _ticker("SOL_USDC_PERP", "151"),
+            _ticker("ETH_USDC_PERP", "3000"),
+        ]
+    )
+    balances = BalancesResponse(
+        balances={
+            "SOL": {"available": "2", "locked": "1", "staked": "0"},
+            "USDC": {"available": "10", "locked": "0", "staked": "0"},
+            "JUNK": {"available": "5", "locked": "0", "staked": "0"},
+        }
+    )
+    lend = BorrowLendPositionsResponse(
+        positions=[
+            {
+                "symbol": "ETH",
+                "netExposureQuantity": "0.5",
+                "netExposureNotional": "1500",
+            }
+        ]
+    )
+    first = holdings(balances, lend)
+    assert first["SOL"] == Decimal("2") and first["ETH"] == Decimal("0.5")
+    assert holdings(balances, include_locked=True)["SOL"] == Decimal("3")
+
+    valuation = value_portfolios(
+        {1: first, 2: {"SOL": Decimal("-1")}}, usd_prices(tickers)
+    )
+
+    assert valuation.account_total(1) == 300 + 10 + 1500
+    assert valuation.positions(1) == [
+        ("ETH", 0.5, 1500.0),
+        ("SOL", 2.0, 300.0),
+        ("USDC", 10.0, 10.0),
+    ]
+    assert valuation.positions(1, exclude=["USDC"])[-1][0] == "SOL"
+    assert valuation.positions(2) == []
+    assert valuation.positions(2, include_negative=True) == [("SOL", -1.0, -150.0)]
+    assert valuation.token_totals()["SOL"] == 150.0
+
+
+def test_exact_total_is_decimal_and_skips_borrowed():
+    tickers = TickersResponse(
+        tickers=[_ticker("SOL_USDC", "150.1"), _ticker("ETH_USDC_PERP", "0.3")]
+    )
+    quantities = {
+        "SOL": Decimal("0.1"),
+        "ETH": Decimal("0.1"),
+        "USDC": Decimal("-5"),  # заём
+        "XYZ": Decimal("10"),  # без цены
+    }
+
+    total = exact_total(quantities, exact_prices(tickers))
+
+    assert total == Decimal("15.04")
+    assert isinstance(total, Decimal)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from src.core.clients.telegram.notifier import TelegramNotifier, compose_digest
+
+
+async def _telegram(rate_limit_first: bool, reject: str | None = None):
+    calls = []
+
+    async def handler(request):
+        payload = await request.json()
+        calls.append((request.match_info["method"], payload, time.monotonic()))
+        if rate_limit_first and len(calls) == 1:
+            return web.json_response(
+                {"ok": False, "parameters": {"retry_after": 0.2}}, status=429
+            )
+        if reject and reject in payload.get("text", ""):
+            return web.json_response(
+                {"ok": False, "description": "can't parse entities"}, status=400
+            )
+        return web.json_response({"ok": True, "result": {}})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, calls, f"http://127.0.0.1:{port}/bot{{token}}/{{method}}"
+
+
+def test_burst_after_429_is_sent_as_one_digest(tmp_path):
+    async def scenario():
+        runner, calls, url = await _telegram(rate_limit_first=True)
+        notifier = TelegramNotifier(
+            "T", spool_path=str(tmp_path / "n.jsonl"), chat_interval=0, api_url=url
+        )
+        await notifier.start()
+        notifier.notify(1, "first")
+        await asyncio.sleep(0.05)  # первая попытка получила 429
+        notifier.notify(1, "second")
+        notifier.notify(1, "third", photo_url="https://img/3.png")
+        await notifier.stop(drain_timeout=2)
+        await runner.cleanup()
+        return calls
+
+    calls = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert calls[1][2] - calls[0][2] >= 0.2  # retry_after соблюдён
+    method, payload, _ = calls[1]
+    assert method == "sendMessage" and payload["chat_id"] == 1
+    assert payload["text"].startswith("🔔 3 уведомлений")
+    assert "first" in payload["text"] and "https://img/3.png" in payload["text"]
+
+
+def test_unsent_notifications_survive_restart(tmp_path):
+    spool = str(tmp_path / "n.jsonl")
+
+    async def scenario():
+        # процесс «упал» до отправки: notify без start
+        TelegramNotifier("T", spool_path=spool).notify(7, "alert", "https://img/1")
+
+        runner, calls, url = await _telegram(rate_limit_first=False)
+        restarted = TelegramNotifier("T", spool_path=spool, api_url=url)
+        await restarted.start()
+        await restarted.stop(drain_timeout=2)
+
+        again = TelegramNotifier("T", spool_path=spool, api_url=url)
+        await again.start()
+        await again.stop(drain_timeout=0.2)
+        await runner.cleanup()
+        return calls
+
+    calls = asyncio.run(scenario())
+
+    assert [(m, p["chat_id"], p["photo"]) for m, p, _ in calls] == [
+        ("sendPhoto", 7, "https://img/1")
+    ]
+
+
+def test_digest_respects_message_limit():
+    batch = [{"text": "x" * 3000}, {"text": "y" * 3000}]
+    text, used = compose_digest(batch)
+    assert used == 1 and text == "x" * 3000
+
+
+def test_rejected_digest_is_resent_item_by_item(tmp_path):
+    async def scenario():
+        runner, calls, url = await _telegram(rate_limit_first=False, reject="<b")
+        notifier = TelegramNotifier("T", chat_interval=0, api_url=url)
+        for text in ("one", "broken <b", "three"):
+            notifier.notify(1, text)
+        await notifier.start()
+        await notifier.stop(drain_timeout=2)
+        await runner.cleanup()
+        return calls
+
+    calls = asyncio.run(scenario())
+
+    texts = [p["text"] for _, p, _ in calls]
+    assert texts[0].startswith("🔔 3 уведомлений")
+    assert texts[1:] == ["one", "broken <b", "three"]
@@ -0,0 +1,57 @@
+from src.core.repositories.accounts import (
+    AccountImportRow,
+    _duplicate_errors,
+    _ident_map,
+    _import_depths,
+)
+
+
+def _row(line, name, parent=None, api_key=None, address=None):
+    return AccountImportRow(
+        line=line,
+        name=name,
+        api_key=api_key or f"key-{name}",
+        api_secret="secret",
+        country="DE",
+        deposit_address=address or f"addr-{name}",
+        parent=parent,
+    )
+
+
+def test_depths_follow_parents_inside_file():
+    rows = [
+        _row(1, "grandchild", parent="child"),
+        _row(2, "child", parent="key-root"),  # ссылка по api_key
+        _row(3, "root"),
+        _row(4, "orphan", parent="in-database"),
+    ]
+    assert _import_depths(rows) == {1: 2, 2: 1, 3: 0, 4: 0}
+
+
+def test_cycles_get_negative_depth():
+    rows = [
+        _row(1, "a", parent="b"),
+        _row(2, "b", parent="a"),
+        _row(3, "c", parent="a"),  # ребёнок цикла
+        _row(4, "self", parent="self"),
+    ]
+    assert _import_depths(rows) == {1: -1, 2: -1, 3: -1, 4: -1}
+
+
+def test_duplicates_keep_first_row_everywhere():
+    rows = [
+        _row(1, "main"),
+        _row(2, "main", parent="other"),
+        _row(3, "copy", api_key="key-main"),
+        _row(4, "addr", address="addr-main"),
+        _row(5, "child", parent="main"),
+    ]
+    assert _duplicate_errors(rows) == {
+        2: "имя повторяется в файле",
+        3: "API-ключ повторяется в файле",
+        4: "адрес депозита повторяется в файле",
+    }
+    assert _ident_map(rows)["main"].line == 1
+    assert _ident_map(rows)["key-main"].line == 1
+    # ребёнок идёт за первой строкой, а не за отклонённым повтором
+    assert _import_depths(rows)[5] == 1
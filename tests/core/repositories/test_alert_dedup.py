@@ -0,0 +1,54 @@
+import asyncio
+
+import fakeredis
+
+from src.core.repositories.alert_dedup import AlertDedup
+
+
+def test_claim_survives_restart_and_is_scoped_by_marketplace():
+    server = fakeredis.FakeServer()
+
+    def client():
+        return fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+    async def scenario():
+        tonnel = AlertDedup("tonnel", ttl=60, client=client())
+        first = [await tonnel.claim(42), await tonnel.claim(42)]
+        # «рестарт»: новый процесс с пустым LRU, тот же Redis
+        restarted = AlertDedup("tonnel", ttl=60, client=client())
+        portals = AlertDedup("portals", ttl=60, client=client())
+        return first, await restarted.claim(42), await portals.claim(42)
+
+    first, after_restart, other_market = asyncio.run(scenario())
+
+    assert first == [True, False]
+    assert after_restart is False
+    assert other_market is True
+
+
+def test_local_front_is_bounded_and_expires():
+    now = [0.0]
+
+    class DownRedis:
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis down")
+
+    dedup = AlertDedup(
+        "tonnel", ttl=10, lru_size=2, client=DownRedis(), clock=lambda: now[0]
+    )
+
+    async def scenario():
+        claims = [await dedup.claim(i) for i in (1, 2, 3)]
+        evicted = await dedup.claim(1)  # вытеснен из LRU размером 2
+        repeated = await dedup.claim(3)
+        now[0] = 11
+        expired = await dedup.claim(3)
+        return claims, evicted, repeated, expired
+
+    claims, evicted, repeated, expired = asyncio.run(scenario())
+
+    assert claims == [True, True, True]
+    assert evicted is True
+    assert repeated is False
+    assert expired is True
+    assert len(dedup._local) <= 2
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from src.core.repositories.balances import EMPTY_SYMBOL, SnapshotWriter, snapshot_rows
+
+
+def test_writer_batches_and_keeps_rows_on_failure():
+    saved: list[list[dict]] = []
+    fail = {"now": True}
+
+    async def save(rows):
+        if fail["now"]:
+            raise ConnectionError("db down")
+        saved.append(rows)
+
+    async def scenario():
+        writer = SnapshotWriter(flush_rows=3, flush_interval=10, save=save)
+        task = asyncio.create_task(writer.run())
+        writer.add(1, [("SOL", Decimal("2"), 300.0)])
+        writer.add(2, [("SOL", Decimal("1"), 150.0), ("USDC", Decimal("5"), 5.0)])
+        await asyncio.sleep(0.01)  # порог достигнут, но БД недоступна
+        fail["now"] = False
+        writer.add(3, [("ETH", Decimal("1"), 3000.0)])
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert len(saved) == 1
+    assert [(r["account_id"], r["symbol"]) for r in saved[0]] == [
+        (1, "SOL"),
+        (2, "SOL"),
+        (2, "USDC"),
+        (3, "ETH"),
+    ]
+    assert len({r["taken_at"] for r in saved[0] if r["account_id"] == 2}) == 1
+
+
+def test_empty_pass_writes_marker_row():
+    rows = snapshot_rows(7, [])
+
+    assert [(r["symbol"], r["quantity"], r["usd_value"]) for r in rows] == [
+        (EMPTY_SYMBOL, 0, 0.0)
+    ]
+    assert rows[0]["account_id"] == 7
+    assert [r["symbol"] for r in snapshot_rows(7, iter([("SOL", 1, 150.0)]))] == [
+        "SOL"
+    ]
+
+
+def test_writer_prunes_old_snapshots_once_per_interval():
+    now = [0.0]
+    pruned = []
+
+    async def prune(before):
+        pruned.append(before)
+        return 3
+
+    async def save(rows):
+        pass
+
+    writer = SnapshotWriter(
+        save=save,
+        retention_days=30,
+        prune_interval=3600,
+        prune=prune,
+        clock=lambda: now[0],
+    )
+
+    async def scenario():
+        await writer.prune_if_due()
+        now[0] = 1800
+        await writer.prune_if_due()  # интервал не прошёл
+        now[0] = 3600
+        await writer.prune_if_due()
+
+    asyncio.run(scenario())
+
+    assert len(pruned) == 2
+    age = datetime.now(timezone.utc) - pruned[0]
+    assert timedelta(days=30) <= age < timedelta(days=30, minutes=1)
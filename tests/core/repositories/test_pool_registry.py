@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.core.clients.exchanges.backpack.cache import clients
+from src.core.repositories.pool_registry import PoolRegistry
+
+API_SECRET = "hq16awOPV0b7gIzwfKgoSreihtjaaBqbbhrsbl966Fs="
+
+
+def _account(account_id):
+    return SimpleNamespace(
+        id=account_id, api_key=f"key-{account_id}", api_secret=API_SECRET
+    )
+
+
+def test_partial_apply_replaces_only_changed_pools():
+    registry = PoolRegistry()
+    pool1, pool2 = SimpleNamespace(id=1), SimpleNamespace(id=2)
+    registry.apply(
+        [
+            (pool1, _account(10), None, None),
+            (pool1, _account(11), None, None),
+            (pool2, None, None, None),
+        ]
+    )
+    assert [a.id for a in registry.accounts[1]] == [10, 11]
+    assert registry.accounts[2] == []
+    assert clients.get(10).api_key == "key-10"
+
+    # pool 1 выключен (строк нет), в pool 2 добавили аккаунт
+    registry.apply([(pool2, _account(20), None, None)], pool_ids={1, 2})
+
+    assert set(registry.pools) == {2}
+    assert [a.id for a in registry.accounts[2]] == [20]
+    assert registry.version == 2
+
+
+def test_notifications_are_coalesced():
+    registry = PoolRegistry()
+    loaded = []
+
+    async def fake_load(pool_ids=None):
+        loaded.append(set(pool_ids))
+
+    registry.load = fake_load
+
+    async def scenario():
+        task = asyncio.create_task(registry._apply_changes())
+        for payload in (
+            '{"table": "pools", "op": "UPDATE", "pool_id": 3}',
+            '{"table": "pool_account_link", "op": "INSERT", "pool_id": 4}',
+            '{"table": "pools", "op": "UPDATE", "pool_id": 3}',
+            "garbage",
+        ):
+            registry.handle_notification(payload)
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert loaded == [{3, 4}]
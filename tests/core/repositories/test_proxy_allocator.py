@@ -0,0 +1,35 @@
+import asyncio
+
+import fakeredis
+
+from src.core.repositories.proxy_allocator import RedisFreeList
+
+
+def test_free_list_pops_fastest_first():
+    async def scenario():
+        free = RedisFreeList(fakeredis.FakeAsyncRedis(decode_responses=True))
+        await free.push("DE", {1: 250.0, 2: 40.0, 3: 120.0})
+        await free.replace("US", {7: 10.0})
+        order = [await free.pop("DE") for _ in range(4)]
+        await free.replace("US", {})
+        return order, await free.countries(), await free.pop("US")
+
+    order, countries, us = asyncio.run(scenario())
+
+    assert order == [2, 3, 1, None]
+    assert countries == set()
+    assert us is None
+
+
+def test_excluded_proxies_stay_in_free_list():
+    async def scenario():
+        free = RedisFreeList(fakeredis.FakeAsyncRedis(decode_responses=True))
+        await free.push("DE", {1: 10.0, 2: 20.0, 3: 30.0})
+        chosen = await free.pop("DE", exclude=[1, 5])
+        rest = [await free.pop("DE") for _ in range(3)]
+        return chosen, rest
+
+    chosen, rest = asyncio.run(scenario())
+
+    assert chosen == 2
+    assert rest == [1, 3, None]
@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+
+import fakeredis
+
+from src.workers.exchanges.leases import PoolLeases
+
+
+POOLS = list(range(1, 11))
+TTL = 0.6
+
+
+def _replica(url: str, worker_id: str, run_for: float, crash: bool, results) -> None:
+    import redis.asyncio as aioredis
+
+    async def scenario():
+        client = aioredis.from_url(url, decode_responses=True)
+        leases = PoolLeases(worker_id=worker_id, ttl=TTL, client=client)
+        deadline = time.monotonic() + run_for
+        while time.monotonic() < deadline:
+            await leases.maintain(POOLS)
+            await asyncio.sleep(TTL / 3)
+        results.put((worker_id, sorted(leases.owned)))
+        if not crash:
+            await leases.release_all()
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_replicas_split_pools_and_take_over_crashed_peer():
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    url = f"redis://{host}:{port}/0"
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    plan = {"a": (4.0, False), "b": (4.0, False), "c": (1.5, True)}
+    procs = [
+        ctx.Process(target=_replica, args=(url, wid, run_for, crash, results))
+        for wid, (run_for, crash) in plan.items()
+    ]
+    try:
+        for proc in procs:
+            proc.start()
+        owned = dict(results.get(timeout=30) for _ in procs)
+        for proc in procs:
+            proc.join(timeout=10)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # пока c был жив, пулы делились на троих
+    assert len(owned["c"]) <= 4
+    # после падения c (аренды не отпущены) a и b забрали все пулы, без пересечений
+    assert not set(owned["a"]) & set(owned["b"])
+    assert set(owned["a"]) | set(owned["b"]) == set(POOLS)
+    assert len(owned["a"]) == len(owned["b"]) == 5
+
+
+def test_lease_of_running_pool_is_held_until_run_finishes():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        a = PoolLeases(worker_id="a", ttl=30, client=client)
+        b = PoolLeases(worker_id="b", ttl=30, client=client)
+        pools = [1, 2, 3, 4]
+
+        assert await a.maintain(pools) == {1, 2, 3, 4}
+        assert await b.maintain(pools) == set()  # доля b — 2, но всё занято
+
+        # ребаланс: у a идут запуски 1..3 — отдаётся только свободный 4
+        assert await a.maintain(pools, busy={1, 2, 3}) == {1, 2}
+        assert a.draining == {3}
+        assert await client.get("pool:lease:3") == "a"
+        assert await b.maintain(pools) == {4}
+
+        # выключенный пул с идущим запуском тоже держится
+        assert await a.maintain([1, 3, 4], busy={2}) == {1, 3}
+        assert a.draining == {2}
+        assert await client.get("pool:lease:2") == "a"
+
+        # запуск закончился — аренда отпущена
+        assert await a.maintain([1, 3, 4]) == {1, 3}
+        assert a.draining == set()
+        return await client.get("pool:lease:2")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_taken_over_lease_is_reported_lost():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        a = PoolLeases(worker_id="a", ttl=30, client=client)
+
+        assert await a.maintain([1, 2]) == {1, 2}
+        assert a.lost == set()
+        # аренда истекла, и пул забрала другая реплика
+        await client.set("pool:lease:2", "b")
+        assert await a.maintain([1, 2]) == {1}
+        assert a.lost == {2}
+
+        assert a.forget() == {1}
+        return a.owned, a.draining
+
+    assert asyncio.run(scenario()) == (set(), set())
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from src.core.clients.exchanges.backpack import orders
+from src.core.repositories.orders import LedgerWriter
+from src.workers.exchanges import backpack as worker
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    async def create_order(self, **params):
+        self.sent.append(params)
+        return self.responses.pop(0)
+
+    async def get_order_history(self, symbol=None, limit=100):
+        return []
+
+
+def _placed(pool_id: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "pool_orders_executed_total", {"pool_id": pool_id, "action": "buy"}
+        )
+        or 0
+    )
+
+
+def test_runs_of_one_pool_place_separate_orders(monkeypatch):
+    async def no_entry(account_id, client_id):
+        return None
+
+    async def no_sleep(delay):
+        return None
+
+    monkeypatch.setattr(orders, "ledger", LedgerWriter(load=no_entry))
+    monkeypatch.setattr(worker.asyncio, "sleep", no_sleep)
+    pool = SimpleNamespace(id=901)
+    client = FakeClient(
+        [
+            {"error": "proxy_failure", "message": "timeout"},
+            {"id": "1", "status": "Filled"},
+            {"id": "2", "status": "Filled"},
+        ]
+    )
+    before = _placed("901")
+
+    async def place(tick):
+        return await worker._place_order(
+            client,
+            pool,
+            "buy",
+            account_id=1,
+            intent=worker._intent(pool, tick, "buy", "SOL_USDC"),
+            symbol="SOL_USDC",
+            side="Bid",
+            quantity="1",
+        )
+
+    async def scenario():
+        # запуск 1: таймаут, повтор с тем же clientId; запуск 2 — новый ордер
+        first = await place(1_000)
+        repeat = await place(1_000)
+        second = await place(1_950)
+        return first, repeat, second
+
+    first, repeat, second = asyncio.run(scenario())
+
+    cids = [sent["clientId"] for sent in client.sent]
+    assert cids[0] == cids[1] != cids[2]
+    assert (first["id"], second["id"]) == ("1", "2")
+    assert repeat["duplicate"] is True
+    assert _placed("901") - before == 2  # дубликат не считается ордером
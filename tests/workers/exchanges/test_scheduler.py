@@ -0,0 +1,167 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from src.workers.exchanges.scheduler import AccountJob, AccountScheduler, PoolTimers
+
+
+def _jobs(n, peak, proxy_url=lambda i: f"socks5://p{i % 2}", delay=0.01):
+    active = {"now": 0}
+    per_proxy: dict[str, int] = {}
+
+    def make(i):
+        async def run():
+            url = proxy_url(i)
+            active["now"] += 1
+            per_proxy[url] = per_proxy.get(url, 0) + 1
+            peak["global"] = max(peak["global"], active["now"])
+            peak["proxy"] = max(peak["proxy"], per_proxy[url])
+            await asyncio.sleep(delay)
+            per_proxy[url] -= 1
+            active["now"] -= 1
+
+        return AccountJob(
+            pool_id=1,
+            account_id=i,
+            api_key=f"key{i}",
+            proxy_url=proxy_url(i),
+            run=run,
+        )
+
+    return [make(i) for i in range(n)]
+
+
+def test_limits_are_respected():
+    peak = {"global": 0, "proxy": 0}
+    scheduler = AccountScheduler(max_concurrency=3, per_proxy=1)
+    asyncio.run(scheduler.run(_jobs(10, peak)))
+
+    assert peak["global"] <= 2  # два прокси по одному аккаунту
+    assert peak["proxy"] == 1
+
+
+def test_timeout_does_not_break_other_accounts():
+    done = []
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def fast():
+        done.append(True)
+
+    jobs = [
+        AccountJob(pool_id=1, account_id=1, api_key="a", run=slow),
+        AccountJob(pool_id=1, account_id=2, api_key="b", run=fast),
+    ]
+    scheduler = AccountScheduler(timeout=0.05)
+    asyncio.run(scheduler.run(jobs))
+
+    assert done == [True]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_pool_timers_run_each_pool_on_its_interval():
+    ticks: dict[int, list[int]] = {1: [], 2: []}
+
+    async def run_pool(pool_id: int, tick: int) -> None:
+        ticks[pool_id].append(tick)
+
+    async def scenario():
+        clock = FakeClock()
+        timers = PoolTimers(run_pool, jitter=0, clock=clock, wall_clock=clock)
+        timers.sync({1: 1, 2: 4})
+        for now in range(10):
+            clock.now = now
+            timers.fire_due()
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    # pool 2 — в 0, 4, 8; pool 1 — на каждом тике
+    assert ticks[2] == [0, 4000, 8000]
+    assert ticks[1] == [1000 * now for now in range(10)]
+
+
+def test_pool_timers_tick_is_the_schedule_not_the_jittered_start():
+    ticks = []
+
+    async def run_pool(pool_id: int, tick: int) -> None:
+        ticks.append(tick)
+
+    async def scenario():
+        clock = FakeClock()
+        timers = PoolTimers(run_pool, jitter=0.5, clock=clock, wall_clock=clock)
+        timers.schedule(3, 4)
+        for step in range(48):
+            clock.now = step / 4
+            timers.fire_due()
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    assert ticks == [0, 4000, 8000]
+
+
+def test_pool_timers_skip_overlapping_runs():
+    started = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def run_pool(pool_id: int, tick: int) -> None:
+            started.append(pool_id)
+            await release.wait()
+
+        clock = FakeClock()
+        timers = PoolTimers(run_pool, jitter=0, clock=clock)
+        timers.schedule(7, 1)
+        for tick in range(6):
+            clock.now = tick
+            if tick == 3:
+                release.set()  # первый запуск закончился между тиками 2 и 3
+                await asyncio.sleep(0)
+            if tick == 4:
+                timers.remove(7)
+            timers.fire_due()
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0)
+
+    missed = REGISTRY.get_sample_value(
+        "pool_missed_deadlines_total", {"pool_id": "7"}
+    ) or 0
+    asyncio.run(scenario())
+
+    # запуски в 0 и 3; тики 1 и 2 пропущены, после remove — тишина
+    assert started == [7, 7]
+    assert REGISTRY.get_sample_value(
+        "pool_missed_deadlines_total", {"pool_id": "7"}
+    ) - missed == 2
+
+
+def test_pool_timers_cancel_running_run():
+    async def scenario():
+        finished = []
+
+        async def run_pool(pool_id: int, tick: int) -> None:
+            await asyncio.sleep(10)
+            finished.append(pool_id)
+
+        timers = PoolTimers(run_pool, jitter=0, clock=FakeClock())
+        timers.schedule(7, 1)
+        timers.fire_due()
+        await asyncio.sleep(0)
+        assert timers.running == {7}
+
+        assert timers.cancel(7)
+        await asyncio.sleep(0)
+        return finished, timers.running, timers.cancel(7)
+
+    assert asyncio.run(scenario()) == ([], set(), False)
@@ -0,0 +1,51 @@
+import asyncio
+import socket
+
+import pytest
+from aiohttp import web
+
+from src.core.models import Proxy
+from src.workers.proxy.prober import ewma, health_update, probe
+
+
+def test_health_update():
+    proxy = Proxy(id=1, fails=2, latency_ms=100.0, error_rate=0.5)
+
+    ok = health_update(proxy, 0.2)
+    failed = health_update(proxy, None)
+
+    assert ok["fails"] == 0
+    assert ok["latency_ms"] == pytest.approx(ewma(100.0, 200.0))
+    assert ok["error_rate"] < 0.5
+    assert failed["fails"] == 3
+    assert "latency_ms" not in failed
+    assert failed["error_rate"] > 0.5
+
+
+def test_probe_against_local_target():
+    async def status(request):
+        return web.Response(text="ok")
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/status", status)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            latency = await probe(None, f"http://127.0.0.1:{port}/status")
+        finally:
+            await runner.cleanup()
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            closed_port = s.getsockname()[1]
+        with pytest.raises(Exception):
+            await probe(None, f"http://127.0.0.1:{closed_port}/status", timeout=1)
+        return latency
+
+    latency = asyncio.run(scenario())
+
+    assert 0 < latency < 1
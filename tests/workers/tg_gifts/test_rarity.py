@@ -0,0 +1,75 @@
+import random
+from array import array
+
+from src.workers.tg_gifts.rarity import RarityBook, page_ranks, percentile_ranks
+
+
+def _calc_top(l: list[float], value: float) -> float:
+    # прежняя реализация из tg_gifts/main.py — эталон для percentile_ranks
+    l.sort()
+    for i in range(len(l) - 1):
+        if l[i] == value and l[i] != l[i + 1]:
+            return round((i + 1) / len(l), 2)
+        elif value < l[i]:
+            return round((i) / len(l), 2)
+        elif value < l[i + 1]:
+            return round((i + 1) / len(l), 2)
+    return 1.0
+
+
+def _item(gift_id, model, symbol, backdrop):
+    return {
+        "gift_id": gift_id,
+        "gift_num": gift_id,
+        "model": f"M ({model}%)",
+        "symbol": f"S ({symbol}%)",
+        "backdrop": f"B ({backdrop}%)",
+    }
+
+
+def test_percentile_ranks_match_previous_calc_top():
+    rng = random.Random(1)
+    values = [rng.choice([0.5, 1.0, 1.5, 2.0, 3.0]) for _ in range(30)]
+    column = sorted(values)
+    ranks = percentile_ranks(column, values)
+    assert [round(r, 2) for r in ranks] == [_calc_top(values[:], v) for v in values]
+
+
+def test_each_attribute_is_ranked_against_its_own_column():
+    page = [_item(1, 1.0, 9.0, 5.0), _item(2, 2.0, 0.1, 5.0)]
+    (model1, symbol1, _), (model2, symbol2, _) = page_ranks(page)
+    assert (model1, model2) == (0.5, 1.0)
+    assert (symbol1, symbol2) == (1.0, 0.5)
+
+
+def test_rolling_distribution_counts_listings_once_and_evicts_oldest():
+    book = RarityBook(max_listings=100)
+    common = [_item(i, 2.0, 2.0, 2.0) for i in range(99)]
+    book.observe("Cap", common)
+    book.observe("Cap", common)  # тот же лот в следующем проходе — не дубль
+    rare = _item(1000, 0.5, 0.5, 0.5)
+    book.observe("Cap", [rare])
+
+    assert book.ranks("Cap", [rare]) == [(0.01, 0.01, 0.01)]
+    assert page_ranks([rare, *common[:29]])[0] == (1 / 30,) * 3
+
+    book.observe("Cap", [_item(2000, 3.0, 3.0, 3.0)])  # вытесняет лот 0
+    assert len(book.columns("Cap")[0]) == 100
+    assert book.columns("Other")[0].tolist() == []
+
+
+def test_snapshot_columns_replace_rolling_window():
+    book = RarityBook()
+    book.observe("Cap", [_item(1, 9.0, 9.0, 9.0)])
+    nan = float("nan")
+    attrs = array("d", [2.0, 1.0, nan, 0.5, 3.0, nan, 1.0, 2.0, 4.0])
+    book.load_snapshot("Cap", attrs)
+
+    assert [c.tolist() for c in book.columns("Cap")] == [
+        [0.5, 1.0, 2.0],
+        [1.0, 2.0, 3.0],
+        [4.0],
+    ]
+    assert book.nbytes == 7 * 8
+    book.observe("Cap", [_item(2, 0.1, 0.1, 0.1)])  # до следующего снапшота
+    assert book.ranks("Cap", [_item(3, 1.0, 0.1, 4.0)]) == [(2 / 3, 0.0, 1.0)]
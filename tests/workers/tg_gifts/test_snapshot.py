@@ -0,0 +1,82 @@
+import asyncio
+import math
+
+from src.workers.tg_gifts.rarity import RarityBook
+from src.workers.tg_gifts.snapshot import (
+    BYTES_PER_LISTING,
+    GiftListings,
+    MarketSnapshot,
+)
+
+
+def _listing(num: int) -> dict:
+    return {
+        "price": float(num),
+        "gift_num": num,
+        "model": f"M ({num % 7 + 0.5}%)",
+        "symbol": "S (1%)",
+        "backdrop": "no percent",
+    }
+
+
+def _market(sizes: dict[str, int]):
+    in_flight = {"now": 0, "max": 0}
+    pages = []
+
+    async def fetch_page(gift, page, limit):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.001)
+        in_flight["now"] -= 1
+        pages.append((gift, page))
+        start = (page - 1) * limit
+        return [_listing(n) for n in range(start, min(start + limit, sizes[gift]))]
+
+    return fetch_page, in_flight, pages
+
+
+def test_snapshot_pages_until_the_end_with_bounded_concurrency():
+    fetch_page, in_flight, pages = _market({"Cap": 95, "Pepe": 10})
+    snapshot = MarketSnapshot(
+        fetch_page, budget_bytes=10**6, page_size=10, pages_in_flight=3
+    )
+
+    gifts = asyncio.run(snapshot.build(["Cap", "Pepe"]))
+
+    assert len(gifts["Cap"]) == 95 and len(gifts["Pepe"]) == 10
+    assert in_flight["max"] <= 3
+    assert max(p for g, p in pages if g == "Cap") <= 12  # окно из 4 страниц
+    assert gifts["Cap"].price_percentiles() == {
+        "p1": 0.0,
+        "p5": 4.0,
+        "p25": 23.0,
+        "p50": 47.0,
+    }
+    model, symbol, backdrop = gifts["Cap"].attrs[:3]
+    assert gifts["Cap"].nums[0] == 0
+    assert (model, symbol, math.isnan(backdrop)) == (0.5, 1.0, True)
+
+
+def test_snapshot_stays_within_memory_budget():
+    fetch_page, _, pages = _market({"Cap": 10_000, "Pepe": 10_000})
+    budget = 100 * BYTES_PER_LISTING
+    snapshot = MarketSnapshot(fetch_page, budget_bytes=budget, page_size=10)
+
+    gifts = asyncio.run(snapshot.build(["Cap", "Pepe"]))
+
+    assert len(gifts["Cap"]) == len(gifts["Pepe"]) == 50
+    assert gifts["Cap"].prices.tolist() == [float(n) for n in range(50)]
+    assert snapshot.nbytes <= budget
+    assert len(pages) <= 2 * 8  # дальше доли бюджета не листаем
+
+
+def test_snapshot_percentages_rank_like_page_percentages():
+    listing = {**_listing(0), "model": "M (0.3%)"}
+    listings = GiftListings()
+    listings.extend({**listing, "gift_num": n} for n in range(200))
+    book = RarityBook()
+    book.load_snapshot("Cap", listings.attrs)
+
+    # тот же 0.3% со страницы не должен выглядеть реже лотов снапшота
+    [(model_rank, _, _)] = book.ranks("Cap", [{**listing, "gift_num": 999}])
+    assert model_rank == 1.0